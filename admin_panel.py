@@ -3,8 +3,11 @@ import streamlit as st
 import pandas as pd
 import datetime
 import shutil
-from logger import get_stats, get_top_queries, get_recent_queries
+from logger import get_stats, get_top_queries, get_recent_queries, format_unique_queries
 from build_vectorstore import build_vector_store
+from index_versions import IndexValidationError, list_versions, activate_version
+from answer_cache import load_answer_cache_stats
+from metrics import load_metrics, summarize, METRICS_PERCENTILES
 
 st.set_page_config(
     page_title="Адмін-панель | Салон краси AI",
@@ -73,8 +76,14 @@ def update_price_list():
             # Пропонуємо оновити векторну базу
             if st.button("Оновити векторну базу даних"):
                 with st.spinner("Оновлення векторної бази..."):
-                    build_vector_store()
-                st.success("✅ Векторну базу успішно оновлено!")
+                    report = build_vector_store()
+                st.success(f"✅ Векторну базу успішно оновлено (версія {report['version']})!")
+                st.info(
+                    f"Нових чанків: {report['added']}, видалено: {report['deleted']}, "
+                    f"без змін (ембеддинги не перераховувались): {report['skipped']}"
+                )
+        except IndexValidationError as e:
+            st.error(f"Нова версія бази не пройшла перевірку, бот працює з попередньою: {e}")
         except Exception as e:
             st.error(f"Помилка при оновленні прайс-листа: {e}")
 
@@ -97,6 +106,27 @@ def update_price_list():
     else:
         st.info("Резервних копій не знайдено")
 
+    # Версії векторної бази: бот перемикається на активовану версію без перезапуску
+    st.subheader("Версії векторної бази")
+    versions = list_versions()
+
+    if versions:
+        for version in versions:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                mark = "✅ " if version["is_current"] else "🗂 "
+                st.write(
+                    f"{mark}{version['version']} — чанків: {version['total']}, "
+                    f"позицій у прайсі: {version['price_items']}"
+                )
+            with col2:
+                if not version["is_current"] and st.button("Активувати", key=f"activate_{version['version']}"):
+                    activate_version(version["version"])
+                    st.success(f"✅ Активовано версію бази {version['version']}")
+                    st.rerun()
+    else:
+        st.info("Версій бази ще немає: вони з'являться після першого оновлення")
+
 
 def view_statistics():
     """Сторінка перегляду статистики"""
@@ -117,7 +147,12 @@ def view_statistics():
         st.metric("Усього запитів", stats["total_queries"])
 
     with col2:
-        st.metric("Унікальних запитів", stats["unique_queries"])
+        st.metric(
+            "Унікальних запитів",
+            format_unique_queries(stats),
+            help="Оцінка зверху: рідкісні запити витісняються з лічильників (QUERY_COUNTS_CAPACITY)"
+            if stats["unique_queries_approximate"] else None,
+        )
 
     with col3:
         st.metric("Користувачів", stats["users"])
@@ -145,6 +180,88 @@ def view_statistics():
     else:
         st.info("Поки немає даних про запити")
 
+    # Показуємо ефективність кешу відповідей
+    st.subheader("Кеш відповідей")
+
+    cache_stats = load_answer_cache_stats()
+    if cache_stats:
+        for cache in cache_stats:
+            st.write(f"**{cache['name']}**")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Влучань", f"{cache['hits']} / {cache['hits'] + cache['misses']}")
+            with col2:
+                st.metric("Частка влучань", f"{cache['hit_rate'] * 100:.1f}%")
+            with col3:
+                st.metric("Зекономлено часу", f"{cache['saved_seconds']:.1f} с")
+    else:
+        st.info("Кеш відповідей ще не використовувався")
+
+
+@st.cache_data(ttl=60)
+def load_recent_metrics(hours: int):
+    """Записи метрик за останні hours годин (кешуються на хвилину між перезапусками сторінки)"""
+    return load_metrics(since=datetime.datetime.now() - datetime.timedelta(hours=hours))
+
+
+def view_performance():
+    """Сторінка затримок обробки запитів за стадіями"""
+    # Додаткова перевірка авторизації
+    if not st.session_state.get("authenticated", False):
+        st.error("❌ Необхідна авторизація для доступу до цієї сторінки")
+        st.stop()
+
+    st.title("⏱️ Продуктивність")
+
+    periods = {"Остання година": 1, "Остання доба": 24, "Останній тиждень": 24 * 7}
+    period = st.selectbox("Період", list(periods), index=1)
+    records = load_recent_metrics(periods[period])
+
+    if not records:
+        st.info("За цей період немає вимірів (logs/metrics.jsonl)")
+        return
+
+    summary = summarize(records)
+    for name, stages in summary.items():
+        st.subheader(f"Джерело: {name}")
+
+        total = stages["total"]
+        columns = st.columns(len(METRICS_PERCENTILES) + 1)
+        columns[0].metric("Запитів", total["count"])
+        for column, p in zip(columns[1:], METRICS_PERCENTILES):
+            column.metric(f"p{p}, мс", f"{total[f'p{p}']:.0f}")
+
+        # Які шляхи обробки обслуговували запити (ціна, кеш, BM25, гібридний пошук)
+        paths = pd.Series([record.get("path") for record in records if record.get("trace") == name]).dropna()
+        if not paths.empty:
+            st.write("Шляхи обробки: " + ", ".join(f"{path}: {count}" for path, count in paths.value_counts().items()))
+
+        df_stages = pd.DataFrame([
+            {"стадія": stage, **stats} for stage, stats in stages.items() if stage != "total"
+        ])
+        if not df_stages.empty:
+            df_stages = df_stages.sort_values("p50", ascending=False)
+            st.bar_chart(df_stages.set_index("стадія")[["p50", "p95"]])
+            st.dataframe(df_stages, use_container_width=True, hide_index=True)
+
+    # Вибір моделі (model_router): скільки запитів обслужила кожна модель і з якою затримкою
+    routed = [record for record in records if record.get("route")]
+    if routed:
+        st.subheader("Вибір моделі")
+        df_routes = pd.DataFrame([
+            {
+                "маршрут": name,
+                "запитів": stages["total"]["count"],
+                "p50, мс": stages["total"]["p50"],
+                "p95, мс": stages["total"]["p95"],
+                "перший токен p50, мс": stages.get("llm_first_token", {}).get("p50"),
+            }
+            for name, stages in summarize(routed, group_by="route").items()
+        ])
+        st.dataframe(df_routes, use_container_width=True, hide_index=True)
+        reasons = pd.Series([record.get("route_reason") for record in routed]).dropna()
+        st.write("Причини вибору: " + ", ".join(f"{reason}: {count}" for reason, count in reasons.value_counts().items()))
+
 
 def main():
     # Перевіряємо авторизацію
@@ -163,7 +280,7 @@ def main():
     # Навігаційне меню
     page = st.sidebar.radio(
         "Оберіть розділ:",
-        ["Статистика", "Оновлення прайс-листа"]
+        ["Статистика", "Продуктивність", "Оновлення прайс-листа"]
     )
 
     # Кнопка виходу
@@ -175,6 +292,8 @@ def main():
     # Відображаємо обрану сторінку
     if page == "Статистика":
         view_statistics()
+    elif page == "Продуктивність":
+        view_performance()
     elif page == "Оновлення прайс-листа":
         update_price_list()
 
@@ -0,0 +1,192 @@
+import os
+import json
+import glob
+import time
+import tempfile
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+# Мінімальна косинусна схожість запитів, за якої повертається збережена відповідь
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+# Максимальна кількість збережених відповідей (найдавніші витісняються)
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+
+# Чи увімкнено кеш відповідей
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+
+# Директорія, куди кожен кеш скидає свою статистику (для /stats і адмін-панелі)
+ANSWER_CACHE_STATS_DIR = "logs"
+
+# Як часто (секунд) статистика кешу записується на диск
+ANSWER_CACHE_STATS_INTERVAL = float(os.getenv("ANSWER_CACHE_STATS_INTERVAL", "10"))
+
+
+class SemanticAnswerCache:
+    """Кеш відповідей, що зіставляє нові запити зі старими за схожістю ембеддингів
+
+    Кеш прив'язаний до версії індексу: після перебудови векторної бази всі
+    збережені відповіді скидаються.
+    """
+
+    def __init__(self, name: str, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES, enabled: bool = ANSWER_CACHE_ENABLED):
+        self.name = name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.stats_file = os.path.join(ANSWER_CACHE_STATS_DIR, f"answer_cache_{name}.json")
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 0
+        self._matrix = None
+        self._matrix_ids: List[int] = []
+        self._index_version = None
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.invalidations = 0
+        self._stats_saved_at = 0.0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _check_version(self, index_version: Optional[str]):
+        if index_version != self._index_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self._matrix_ids = []
+            self._index_version = index_version
+
+    def lookup(self, query_vector: List[float], index_version: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Шукає збережену відповідь на схожий запит
+
+        Args:
+            query_vector: ембеддинг нового запиту
+            index_version: поточна версія векторної бази
+
+        Returns:
+            Словник {query, answer, contexts, similarity} або None
+        """
+        if not self.enabled:
+            return None
+
+        started = time.time()
+        with self._lock:
+            self._check_version(index_version)
+            entry = None
+            if self._entries:
+                if self._matrix is None:
+                    self._matrix_ids = list(self._entries.keys())
+                    self._matrix = np.stack([e["vector"] for e in self._entries.values()])
+                similarities = self._matrix @ self._normalize(query_vector)
+                best = int(np.argmax(similarities))
+                similarity = float(similarities[best])
+                if similarity >= self.threshold:
+                    entry_id = self._matrix_ids[best]
+                    entry = self._entries[entry_id]
+                    self._entries.move_to_end(entry_id)
+
+            if entry is None:
+                self.misses += 1
+                result = None
+            else:
+                self.hits += 1
+                self.saved_seconds += max(entry["latency"] - (time.time() - started), 0.0)
+                result = {
+                    "query": entry["query"],
+                    "answer": entry["answer"],
+                    "contexts": list(entry["contexts"]),
+                    "similarity": similarity,
+                }
+            self._save_stats()
+        return result
+
+    def store(self, query: str, query_vector: List[float], answer: str, contexts: List[str],
+              latency: float, index_version: Optional[str]):
+        """Зберігає відповідь на запит
+
+        Args:
+            latency: скільки секунд зайняло отримання відповіді (для оцінки економії)
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._check_version(index_version)
+            self._entries[self._next_id] = {
+                "query": query,
+                "vector": self._normalize(query_vector),
+                "answer": answer,
+                "contexts": list(contexts),
+                "latency": latency,
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self):
+        """Скидає всі збережені відповіді"""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self._matrix_ids = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика кешу: влучання, промахи, зекономлений час"""
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+            "threshold": self.threshold,
+            "updated_at": time.time(),
+        }
+
+    def _save_stats(self):
+        """Записує статистику не частіше ніж раз на ANSWER_CACHE_STATS_INTERVAL секунд
+
+        Викликається під self._lock: паралельні воркери не пишуть файл одночасно,
+        а тимчасовий файл унікальний, тож os.replace завжди підміняє цілий JSON.
+        """
+        now = time.time()
+        if now - self._stats_saved_at < ANSWER_CACHE_STATS_INTERVAL:
+            return
+        self._stats_saved_at = now
+        tmp_path = None
+        try:
+            os.makedirs(ANSWER_CACHE_STATS_DIR, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=ANSWER_CACHE_STATS_DIR,
+                                             prefix=f".answer_cache_{self.name}.", suffix=".tmp",
+                                             delete=False) as f:
+                tmp_path = f.name
+                json.dump(self.stats(), f, ensure_ascii=False)
+            os.replace(tmp_path, self.stats_file)
+        except OSError as e:
+            print(f"Не вдалося зберегти статистику кешу відповідей: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def load_answer_cache_stats() -> List[Dict[str, Any]]:
+    """Читає збережену статистику всіх кешів відповідей (з усіх процесів)"""
+    stats = []
+    for path in sorted(glob.glob(os.path.join(ANSWER_CACHE_STATS_DIR, "answer_cache_*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stats.append(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return stats
@@ -1,9 +1,11 @@
 import os
 from dotenv import load_dotenv
-from query_rag import query_bot
+from query_rag import query_bot_stream
 from build_vectorstore import build_vector_store
-from logger import log_query, get_stats, get_top_queries
-from ragas_evaluator import evaluate_rag_response
+from logger import log_query, get_stats, get_top_queries, format_unique_queries
+from evaluation_queue import get_evaluation_queue
+from rag_service import get_rag_service
+import metrics
 
 load_dotenv()
 
@@ -17,7 +19,7 @@ def print_stats():
     print("📊 СТАТИСТИКА ЗАПИТІВ")
     print("="*50)
     print(f"Загальна кількість запитів: {stats['total_queries']}")
-    print(f"Унікальних запитів: {stats['unique_queries']}")
+    print(f"Унікальних запитів: {format_unique_queries(stats)}")
     print(f"Користувачів: {stats['users']}")
     
     if 'sources' in stats:
@@ -38,6 +40,9 @@ def main():
         print("Створення векторної бази...")
         build_vector_store()
 
+    # Відкриваємо базу і з'єднання з API один раз на весь сеанс
+    get_rag_service().warm_up()
+
     print("\nBeauty Salon AI Consultant")
     print("Введіть ваше питання. Напишіть 'вихід' для завершення.")
     print("Напишіть 'статистика' для перегляду статистики запитів.\n")
@@ -47,6 +52,8 @@ def main():
         
         if user_input.lower() in ["вихід", "exit"]:
             print("До зустрічі!")
+            # Дочікуємось оцінок, які ще виконуються у фоні
+            get_evaluation_queue().shutdown()
             break
             
         if user_input.lower() == "статистика":
@@ -56,15 +63,18 @@ def main():
         # Логуємо запит
         log_query(user_input, source="app")
         
-        # Отримуємо відповідь та контекст
-        answer, retrieved_contexts = query_bot(user_input)
-        print("Бот:", answer, "\n")
+        # Отримуємо відповідь потоком: текст з'являється по мірі генерації
+        with metrics.trace("app"):
+            tokens, retrieved_contexts = query_bot_stream(user_input)
+            print("Бот: ", end="", flush=True)
+            answer = ""
+            for token in tokens:
+                answer += token
+                print(token, end="", flush=True)
+            print("\n")
         
-        # Оцінюємо відповідь за допомогою RAGAS
-        try:
-            evaluate_rag_response(user_input, answer, retrieved_contexts)
-        except Exception as e:
-            print(f"Помилка при оцінці RAGAS: {e}")
+        # Оцінюємо відповідь за допомогою RAGAS у фоні, не затримуючи наступне питання
+        get_evaluation_queue().submit(user_input, answer, retrieved_contexts, source="app")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional, Tuple, Union
+from dotenv import load_dotenv
+from openai import RateLimitError
+from ragas_evaluator import evaluate_rag_response_timed
+from query_rag import query_bot
+
+load_dotenv()
+
+# Скільки запитів обробляється одночасно
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# Обмеження частоти звернень до моделі (0 — без обмеження)
+BATCH_REQUESTS_PER_MINUTE = int(os.getenv("BATCH_REQUESTS_PER_MINUTE", "0"))
+
+# Повторні спроби при перевищенні ліміту API
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "5"))
+BATCH_BACKOFF_SECONDS = float(os.getenv("BATCH_BACKOFF_SECONDS", "2"))
+
+# Фрази, за якими відповідь вважається відмовою
+APOLOGY_MARKERS = ["На жаль", "наразі недоступна", "інформація відсутня"]
+
+
+class RateLimiter:
+    """Спільний для всіх воркерів обмежувач частоти запитів
+
+    Рівномірно розподіляє запити в межах ліміту на хвилину, а після помилки
+    RateLimitError ставить усі воркери на паузу.
+    """
+
+    def __init__(self, requests_per_minute: int = BATCH_REQUESTS_PER_MINUTE):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+
+    def acquire(self):
+        """Чекає, доки можна надіслати наступний запит"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._paused_until)
+            self._next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Призупиняє всі запити на задану кількість секунд"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def contains_apology(answer: str) -> bool:
+    """Чи є відповідь відмовою через відсутність інформації"""
+    return any(marker in answer for marker in APOLOGY_MARKERS)
+
+
+def _call_with_retries(func: Callable, limiter: RateLimiter, *args):
+    """Викликає функцію з урахуванням ліміту та повторами при RateLimitError"""
+    for attempt in range(BATCH_MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            return func(*args)
+        except RateLimitError:
+            if attempt == BATCH_MAX_RETRIES:
+                raise
+            delay = BATCH_BACKOFF_SECONDS * 2 ** attempt
+            print(f"⚠️ Перевищено ліміт API, пауза {delay:.0f} с")
+            limiter.pause(delay)
+
+
+def _normalize_item(item: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    return {"query": item} if isinstance(item, str) else dict(item)
+
+
+def evaluate_single(index: int, item: Dict[str, Any], query_fn: Callable, evaluate: bool,
+                    limiter: RateLimiter) -> Optional[Dict[str, Any]]:
+    """Обробляє один запит: пошук, генерація, RAGAS-оцінка"""
+    query = item["query"]
+    try:
+        start_time = time.time()
+        answer, retrieved_contexts = _call_with_retries(query_fn, limiter, query)
+        response_time = time.time() - start_time
+    except Exception as e:
+        print(f"❌ Помилка в запиті \"{query}\": {e}")
+        return None
+
+    ragas_metrics = None
+    ragas_time = 0
+    if evaluate:
+        ragas_start = time.time()
+        limiter.acquire()
+        ragas_metrics, _ = evaluate_rag_response_timed(query, answer, retrieved_contexts)
+        ragas_time = time.time() - ragas_start
+
+    apology = contains_apology(answer)
+    result = {
+        "index": index,
+        "query": query,
+        "answer": answer,
+        "retrieved_contexts": retrieved_contexts,
+        "ragas_metrics": ragas_metrics,
+        "contains_apology": apology,
+        "has_meaningful_answer": not apology and len(answer.strip()) > 20,
+        "answer_length": len(answer),
+        "response_time": response_time,
+        "ragas_time": ragas_time,
+        "total_time": response_time + ragas_time,
+        "timestamp": datetime.now().isoformat()
+    }
+
+    # Для запитів з мітками present/absent перевіряємо, чи очікувана поведінка
+    if "expected" in item:
+        result["expected"] = item["expected"]
+        result["is_correct"] = (item["expected"] == "present") != apology
+    if "category" in item:
+        result["category"] = item["category"]
+
+    status = "✅" if result.get("is_correct", result["has_meaningful_answer"]) else "❌"
+    print(f"{status} [{index}] {query} ({response_time:.2f} с + RAGAS {ragas_time:.2f} с)")
+    return result
+
+
+def query_without_cache(query: str) -> Tuple[str, List[str]]:
+    """query_rag.query_bot без кешу відповідей: повтори та перефразування оцінюються й вимірюються чесно"""
+    return query_bot(query, use_cache=False)
+
+
+def run_batch(items: List[Union[str, Dict[str, Any]]], query_fn: Callable = query_without_cache,
+              concurrency: int = BATCH_CONCURRENCY, evaluate: bool = True,
+              requests_per_minute: int = BATCH_REQUESTS_PER_MINUTE) -> List[Dict[str, Any]]:
+    """Пакетно обробляє та оцінює список запитів з обмеженою паралельністю
+
+    Args:
+        items: запити — рядки або словники {query, expected?, category?},
+            де expected — "present" або "absent"
+        query_fn: функція (запит) -> (відповідь, контексти), за замовчуванням query_rag.query_bot без кешу відповідей
+        concurrency: скільки запитів обробляється одночасно
+        evaluate: чи рахувати RAGAS метрики
+        requests_per_minute: обмеження частоти звернень до API (0 — без обмеження)
+
+    Returns:
+        Результати у форматі comprehensive_research_*.json, впорядковані за index
+    """
+    limiter = RateLimiter(requests_per_minute)
+    normalized = [_normalize_item(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [
+            executor.submit(evaluate_single, index, item, query_fn, evaluate, limiter)
+            for index, item in enumerate(normalized, 1)
+        ]
+        results = [future.result() for future in futures]
+
+    return [result for result in results if result is not None]
+
+
+def save_results(results: List[Dict[str, Any]], prefix: str = "comprehensive_research") -> str:
+    """Зберігає результати у JSON-файл з часовою міткою в назві"""
+    filename = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return filename
+
+
+if __name__ == "__main__":
+    # Використання: python batch_evaluation.py queries.json
+    # queries.json — список рядків або словників {query, expected, category}
+    if len(sys.argv) != 2:
+        print("Використання: python batch_evaluation.py queries.json")
+        sys.exit(1)
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        queries = json.load(f)
+
+    start = time.time()
+    batch_results = run_batch(queries)
+    print(f"\n⏱️ Оброблено {len(batch_results)} запитів за {time.time() - start:.2f} с")
+    print(f"💾 Результати збережено: {save_results(batch_results)}")
@@ -0,0 +1,374 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Callable
+
+# Кратність синтетичного корпусу відносно вмісту data/ (1× — сам data/)
+BENCHMARK_SCALES = [int(scale) for scale in os.getenv("BENCHMARK_SCALES", "1,100").split(",") if scale.strip()]
+
+# Скільки разів проганяється набір запитів на кожному масштабі
+BENCHMARK_REPEATS = int(os.getenv("BENCHMARK_REPEATS", "3"))
+
+# Інтервал вимірювання пам'яті під час стадії, секунд
+MEMORY_SAMPLE_INTERVAL = 0.01
+
+# Директорія з результатами (JSON, один файл на запуск)
+BENCHMARK_OUTPUT_DIR = "benchmarks"
+
+# Типові запити клієнтів: ціни (індекс цін), FAQ, точні назви процедур (BM25) і загальні питання
+BENCHMARK_QUERIES = [
+    "Скільки коштує манікюр?",
+    "Яка ціна педикюру?",
+    "Скільки коштує піти у інфрачервону сауну?",
+    "Чи є знижки для нових клієнтів?",
+    "Які послуги входять у догляд за обличчям?",
+    "Скільки триває процедура ламінування вій?",
+    "Чи потрібно записуватись заздалегідь?",
+    "Чи можна оплатити картою?",
+    "Який у вас графік роботи?",
+    "Чи підходить кислотний пілінг для чутливої шкіри?",
+    "Який догляд рекомендуєте після пілінгу?",
+    "Скільки триває ефект біоревіталізації?",
+    "Парафінотерапія",
+    "Чи робите ви стрижки?",
+]
+
+
+def make_corpus(source_dir: str, target_dir: str, scale: int) -> int:
+    """Створює синтетичний корпус: scale копій кожного файлу з source_dir
+
+    Текстові копії отримують позначку філії в кожному блоці, тож їхні чанки
+    (і ембеддинги) відрізняються; PDF-файли копіюються як є (жорсткими
+    посиланнями, де це можливо), тож розбір прайс-листа теж масштабується.
+
+    Returns:
+        Кількість файлів у корпусі
+    """
+    from load_docs import list_files
+
+    os.makedirs(target_dir, exist_ok=True)
+    count = 0
+    for source in list_files(source_dir):
+        name, extension = os.path.splitext(os.path.basename(source))
+        if extension == ".txt":
+            with open(source, "r", encoding="utf-8") as f:
+                blocks = f.read().strip().split("\n\n")
+        for replica in range(scale):
+            target = os.path.join(target_dir, f"{name}{extension}" if replica == 0 else f"{name}_{replica:05d}{extension}")
+            if extension == ".txt":
+                text = "\n\n".join(blocks if replica == 0 else [f"{block} (філія {replica})" for block in blocks])
+                with open(target, "w", encoding="utf-8") as f:
+                    f.write(text + "\n")
+            else:
+                try:
+                    os.link(source, target)
+                except OSError:
+                    shutil.copy2(source, target)
+            count += 1
+    return count
+
+
+def current_rss_mb() -> Optional[float]:
+    """Поточна резидентна пам'ять процесу, МБ (psutil або /proc; None, якщо недоступно)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@contextmanager
+def stage_memory():
+    """Вимірює пам'ять однієї стадії: фонова вибірка RSS кожні MEMORY_SAMPLE_INTERVAL секунд
+
+    Повертає словник, що заповнюється після виходу з блоку:
+    rss_start_mb, rss_peak_mb (пік під час стадії), rss_delta_mb (наскільки стадія
+    підняла пам'ять понад стартову) і process_peak_so_far_mb — пік процесу з
+    його запуску (накопичувальний, ru_maxrss).
+    """
+    stats: Dict[str, Optional[float]] = {}
+    start = current_rss_mb()
+    peak = [start]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(MEMORY_SAMPLE_INTERVAL):
+            rss = current_rss_mb()
+            if rss is not None and (peak[0] is None or rss > peak[0]):
+                peak[0] = rss
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield stats
+    finally:
+        done.set()
+        sampler.join()
+        end = current_rss_mb()
+        if end is not None and (peak[0] is None or end > peak[0]):
+            peak[0] = end
+        stats.update({
+            "rss_start_mb": None if start is None else round(start, 1),
+            "rss_peak_mb": None if peak[0] is None else round(peak[0], 1),
+            "rss_delta_mb": None if start is None or peak[0] is None else round(peak[0] - start, 1),
+            "process_peak_so_far_mb": peak_rss_mb(),
+        })
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """Пікова резидентна пам'ять процесу з його запуску (або завершених дочірніх процесів), МБ"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Linux повертає кілобайти, macOS — байти
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+
+def latency_stats(seconds: List[float]) -> Dict[str, float]:
+    """Середнє і перцентилі затримки, мс"""
+    from metrics import percentile
+
+    values = sorted(value * 1000 for value in seconds)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 2),
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "max_ms": round(values[-1], 2),
+    }
+
+
+def timed_calls(fn: Callable, items: List[Any]) -> List[float]:
+    """Викликає fn для кожного елемента і повертає тривалості викликів, секунд"""
+    durations = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def run_scale(scale: int, source_dir: str, options: argparse.Namespace) -> Dict[str, Any]:
+    """Проганяє всі стадії на одному масштабі корпусу в поточній (тимчасовій) директорії
+
+    Модулі бота імпортуються тут, після переходу в тимчасову директорію:
+    база, кеші й логи бенчмарку створюються в ній і не зачіпають робочі.
+    """
+    from load_docs import iter_documents
+    from build_vectorstore import build_vector_store
+    from embedding_cache import CachedEmbeddings
+    from fake_models import FakeEmbeddings, FakeChatModel, FAKE_EMBEDDING_MODEL
+    from logger import log_query, get_stats, get_top_queries, get_recent_queries
+    import metrics
+    import query_rag
+    import rag_service
+
+    embeddings = FakeEmbeddings(
+        call_latency=options.embed_latency_ms / 1000,
+        text_latency=options.embed_text_latency_ms / 1000,
+    )
+    result: Dict[str, Any] = {"scale": scale, "stages": {}}
+    stages = result["stages"]
+
+    files = make_corpus(source_dir, "data", scale)
+    result["files"] = files
+
+    # Розбір і розбиття на чанки (пул процесів, як у build_vector_store)
+    started = time.perf_counter()
+    chunks = 0
+    with stage_memory() as memory:
+        for _, file_chunks in iter_documents("data", options.workers):
+            chunks += len(file_chunks or [])
+    seconds = time.perf_counter() - started
+    result["chunks"] = chunks
+    stages["ingest"] = {
+        "seconds": round(seconds, 3),
+        "files_per_second": round(files / seconds, 1),
+        "chunks_per_second": round(chunks / seconds, 1),
+        "memory": memory,
+        "workers_peak_rss_mb": peak_rss_mb(children=True),
+    }
+
+    # Повна побудова бази: ембеддинги, Chroma, BM25, NumPy-матриця, перевірка версії
+    started = time.perf_counter()
+    with stage_memory() as memory:
+        report = build_vector_store(workers=options.workers, embeddings=embeddings)
+    seconds = time.perf_counter() - started
+    stages["build"] = {
+        "seconds": round(seconds, 3),
+        "chunks_per_second": round(report["total"] / seconds, 1),
+        "total_chunks": report["total"],
+        "price_items": report["price_items"],
+        "memory": memory,
+    }
+
+    # Повторна побудова без змін у data/ (інкрементальний шлях)
+    started = time.perf_counter()
+    with stage_memory() as memory:
+        build_vector_store(workers=options.workers, embeddings=embeddings)
+    stages["rebuild_unchanged"] = {"seconds": round(time.perf_counter() - started, 3), "memory": memory}
+
+    # Повний шлях запиту: індекс цін, BM25, ембеддинг, пошук, переранжування, промпт, потік LLM
+    queries = BENCHMARK_QUERIES * options.repeats
+    for backend in options.backends:
+        rag_service.VECTOR_STORE_BACKEND = backend
+        service = rag_service.RAGService(
+            embeddings=CachedEmbeddings(embeddings, model_name=FAKE_EMBEDDING_MODEL),
+            chat_factory=lambda model_name, temperature: FakeChatModel(
+                model_name,
+                first_token_latency=options.llm_first_token_ms / 1000,
+                token_latency=options.llm_token_ms / 1000,
+            ),
+        )
+        rag_service.set_rag_service(service)
+        records_before = len(metrics.load_metrics())
+
+        def ask(query: str):
+            # Без кешу відповідей, інакше повтори вимірювали б лише кеш
+            query_rag.query_bot(query, use_cache=False)
+
+        with stage_memory() as memory:
+            started = time.perf_counter()
+            service.warm_up(embed=False)
+            warm_up_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            durations = timed_calls(ask, queries)
+            seconds = time.perf_counter() - started
+        records = metrics.load_metrics()[records_before:]
+        stages[f"query_{backend}"] = {
+            "warm_up_seconds": round(warm_up_seconds, 3),
+            "queries": len(queries),
+            "throughput_qps": round(len(queries) / seconds, 2),
+            "latency": latency_stats(durations),
+            "spans": metrics.summarize(records).get("query_rag", {}),
+            "paths": {
+                path: sum(1 for record in records if record.get("path") == path)
+                for path in sorted({record.get("path") for record in records if record.get("path")})
+            },
+            "memory": memory,
+        }
+
+    # Логування запитів і статистика
+    with stage_memory() as memory:
+        log_durations = timed_calls(lambda query: log_query(query, user_id="benchmark", source="benchmark"), queries)
+        stages["logging"] = {
+            "log_query": latency_stats(log_durations),
+            "get_stats": latency_stats(timed_calls(lambda _: get_stats(), range(options.repeats))),
+            "get_top_queries": latency_stats(timed_calls(lambda _: get_top_queries(20), range(options.repeats))),
+            "get_recent_queries": latency_stats(timed_calls(lambda _: get_recent_queries(50), range(options.repeats))),
+        }
+    stages["logging"]["memory"] = memory
+    return result
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк індексації та обробки запитів з фейковими моделями")
+    parser.add_argument("--scales", default=",".join(map(str, BENCHMARK_SCALES)),
+                        help="кратності корпусу через кому, наприклад 1,100,10000")
+    parser.add_argument("--repeats", type=int, default=BENCHMARK_REPEATS, help="проходів по набору запитів")
+    parser.add_argument("--workers", type=int, default=0, help="процесів для розбору файлів (0 — кількість ядер)")
+    parser.add_argument("--backends", default="chroma,numpy", help="векторні сховища для запитів через кому")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="затримка виклику ембеддингів")
+    parser.add_argument("--embed-text-latency-ms", type=float, default=0.0, help="затримка на кожен текст")
+    parser.add_argument("--llm-first-token-ms", type=float, default=0.0, help="затримка до першого токена LLM")
+    parser.add_argument("--llm-token-ms", type=float, default=0.0, help="затримка між токенами LLM")
+    parser.add_argument("--data", default="data", help="вихідний корпус")
+    parser.add_argument("--output", default=None, help="файл результатів (за замовчуванням benchmarks/benchmark_<час>.json)")
+    parser.add_argument("--keep", action="store_true", help="не видаляти тимчасові директорії масштабів")
+    # Внутрішній режим: один масштаб в окремому процесі
+    parser.add_argument("--run-scale", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--result", default=None, help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+    options.backends = [backend.strip() for backend in options.backends.split(",") if backend.strip()]
+    return options
+
+
+def main(argv: Optional[List[str]] = None):
+    options = parse_args(argv)
+
+    if options.run_scale is not None:
+        # Дочірній процес: поточна директорія — тимчасова, результат — у файл
+        result = run_scale(options.run_scale, options.data, options)
+        with open(options.result, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        return
+
+    source_dir = os.path.abspath(options.data)
+    output = options.output or os.path.join(
+        BENCHMARK_OUTPUT_DIR, f"benchmark_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    results: Dict[str, Any] = {
+        "started_at": datetime.datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            key: value for key, value in vars(options).items() if key not in ("run_scale", "result", "output", "keep")
+        },
+        "scales": [],
+    }
+
+    for scale in [int(scale) for scale in options.scales.split(",") if scale.strip()]:
+        # Кожен масштаб — в окремому процесі: чисті синглтони і власний пік пам'яті
+        workdir = tempfile.mkdtemp(prefix=f"benchmark_{scale}x_")
+        result_path = os.path.join(workdir, "result.json")
+        print(f"Масштаб {scale}×: {workdir}")
+        command = [
+            sys.executable, os.path.abspath(__file__),
+            "--run-scale", str(scale), "--result", result_path, "--data", source_dir,
+            "--repeats", str(options.repeats), "--workers", str(options.workers),
+            "--backends", ",".join(options.backends),
+            "--embed-latency-ms", str(options.embed_latency_ms),
+            "--embed-text-latency-ms", str(options.embed_text_latency_ms),
+            "--llm-first-token-ms", str(options.llm_first_token_ms),
+            "--llm-token-ms", str(options.llm_token_ms),
+        ]
+        try:
+            completed = subprocess.run(command, cwd=workdir)
+            if completed.returncode != 0:
+                results["scales"].append({"scale": scale, "error": f"код завершення {completed.returncode}"})
+                continue
+            with open(result_path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            results["scales"].append(result)
+            for stage, stats in result["stages"].items():
+                summary = stats.get("latency", {}).get("p50_ms")
+                print(f"  {stage}: " + (f"p50 {summary} мс" if summary is not None else f"{stats.get('seconds')} с"))
+        finally:
+            if not options.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Результати збережено у {output}")
+
+
+if __name__ == "__main__":
+    main()
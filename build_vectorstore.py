@@ -1,17 +1,307 @@
+import os
+import json
+from typing import Dict, Any, List, Optional, Callable
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import OpenAIEmbeddings
-from load_docs import load_documents
+from load_docs import iter_documents, list_files, INGEST_WORKERS
+from langchain_core.embeddings import Embeddings
+from embedding_cache import get_embeddings
+from embedding_backends import embedding_model_tag
+from index_versions import (
+    DB_DIR, EMBEDDING_MODEL_FILE, IndexValidationError, create_staging, discard_staging, publish_version,
+    current_version, read_index_embedding_model, chunk_hash, vector_id,
+)
+from price_index import (
+    load_price_entries, load_price_notes, save_price_index, make_entry, note_text, is_backup_source,
+)
+from lexical_index import LexicalIndex, index_terms
+from numpy_vectorstore import NumpyVectorStore, export_from_chroma, NUMPY_INDEX_FILE
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Маніфест індексу: файл -> хеш чанка -> ID вектора у Chroma
+MANIFEST_FILE = "manifest.json"
 
-def build_vector_store():
-    documents = load_documents("data")
-    embeddings = OpenAIEmbeddings()
-    vectorstore = Chroma.from_documents(documents, embedding=embeddings, persist_directory="db")
+# Скільки чанків відправляється на обчислення ембеддингів і записується в базу за один раз
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Додаткові контрольні запити (через кому), на які нова версія індексу має знаходити чанки перед активацією.
+# Типово порожньо: словник залежить від даних (заголовки прайсу на кшталт «Ціна» в чанки не потрапляють)
+INDEX_SMOKE_QUERIES = [
+    query.strip() for query in os.getenv("INDEX_SMOKE_QUERIES", "").split(",") if query.strip()
+]
+
+# Скільки збережених чанків перевіряється пошуком самих себе (за текстом у BM25 і за вектором)
+INDEX_SMOKE_VECTORS = int(os.getenv("INDEX_SMOKE_VECTORS", "3"))
+
+
+def write_embedding_model(model_tag: str, persist_directory: str = DB_DIR):
+    """Позначає індекс моделлю ембеддингів, якою він зібраний"""
+    marker_path = os.path.join(persist_directory, EMBEDDING_MODEL_FILE)
+    tmp_path = marker_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(model_tag)
+    os.replace(tmp_path, marker_path)
+
+
+def load_manifest(persist_directory: str = DB_DIR) -> Optional[Dict[str, Dict[str, str]]]:
+    """Завантажує маніфест індексу або повертає None, якщо його ще немає"""
+    try:
+        with open(os.path.join(persist_directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)["files"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def save_manifest(files: Dict[str, Dict[str, str]], persist_directory: str = DB_DIR):
+    """Атомарно зберігає маніфест індексу"""
+    os.makedirs(persist_directory, exist_ok=True)
+    manifest_path = os.path.join(persist_directory, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"files": files}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def _update_index(persist_directory: str, report_progress: Callable[[str], None],
+                  workers: int, embeddings: Embeddings) -> Dict[str, Any]:
+    """Інкрементально оновлює індекс у директорії persist_directory за вмістом data/
+
+    Returns:
+        Статистика (див. build_vector_store) з полем changed — чи змінився індекс
+    """
+    report_progress("Завантаження документів...")
+    vectorstore = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
+
+    manifest = load_manifest(persist_directory)
+    model_tag = embedding_model_tag()
+    index_model = read_index_embedding_model(persist_directory)
+    # BM25-індекс над тими самими чанками оновлюється разом з векторною базою
+    lexical_index = LexicalIndex.load(persist_directory)
+    lexical_restored = 0
+    added = deleted = skipped = 0
+    if manifest is None or index_model != model_tag:
+        # База, зібрана до появи маніфесту, могла накопичити дублікати, а вектори іншої моделі
+        # несумісні з новими (інша розмірність) — перезбираємо колекцію з нуля.
+        # Для бази без позначки моделі вектори OpenAI беруться з кешу ембеддингів без звернень до API.
+        stale_count = vectorstore._collection.count()
+        if stale_count:
+            report_progress(f"Перезбирання бази з моделлю {model_tag}: видалення {stale_count} чанків")
+            vectorstore.delete_collection()
+            vectorstore = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
+            deleted += stale_count
+        lexical_index.clear()
+        manifest = {}
+
+    new_manifest: Dict[str, Dict[str, str]] = {}
+    # Індекс цін (послуга -> ціна) збирається з тих самих чанків прайс-листів
+    old_prices = load_price_entries(persist_directory)
+    old_notes = load_price_notes(persist_directory)
+    prices: Dict[str, List[Dict[str, Any]]] = {}
+    notes: Dict[str, Dict[str, List[str]]] = {}
+    batch_docs, batch_ids = [], []
+
+    def flush_batch():
+        nonlocal added
+        if batch_docs:
+            vectorstore.add_documents(batch_docs, ids=batch_ids)
+            added += len(batch_ids)
+            batch_docs.clear()
+            batch_ids.clear()
+
+    total_files = len(list_files("data"))
+    for processed, (full_path, chunks) in enumerate(iter_documents("data", workers), 1):
+        if chunks is None:
+            # Файл не вдалося розібрати — залишаємо його попередні вектори без змін
+            if full_path in manifest:
+                new_manifest[full_path] = manifest[full_path]
+            if full_path in old_prices:
+                prices[full_path] = old_prices[full_path]
+            if full_path in old_notes:
+                notes[full_path] = old_notes[full_path]
+            continue
+
+        # Групуємо чанки за джерелом, однакові чанки в межах файлу зберігаємо один раз
+        current: Dict[str, Dict[str, Any]] = {}
+        for doc in chunks:
+            source = doc.metadata.get("source", "")
+            current.setdefault(source, {}).setdefault(chunk_hash(doc.page_content), doc)
+            chunk_type = doc.metadata.get("chunk_type")
+            # Резервні копії старих прайсів не потрапляють в індекс цін
+            if chunk_type == "price" and not is_backup_source(source):
+                prices.setdefault(source, []).append(make_entry(doc.metadata))
+            elif chunk_type == "price_note" and not is_backup_source(source):
+                notes.setdefault(source, {}).setdefault(doc.metadata.get("category", ""), []).append(
+                    note_text(doc.page_content)
+                )
+
+        ids_to_delete = []
+        for source, file_chunks in current.items():
+            old_chunks = manifest.get(source, {})
+            new_manifest[source] = {}
+            for content_hash, doc in file_chunks.items():
+                if content_hash in old_chunks:
+                    doc_id = old_chunks[content_hash]
+                    new_manifest[source][content_hash] = doc_id
+                    skipped += 1
+                    # Чанки бази, зібраної до появи BM25-індексу, додаються без перерахунку ембеддингів
+                    if doc_id not in lexical_index:
+                        lexical_index.add(doc_id, doc.page_content, doc.metadata)
+                        lexical_restored += 1
+                    continue
+                doc_id = vector_id(source, content_hash)
+                new_manifest[source][content_hash] = doc_id
+                lexical_index.add(doc_id, doc.page_content, doc.metadata)
+                batch_docs.append(doc)
+                batch_ids.append(doc_id)
+                if len(batch_docs) >= EMBED_BATCH_SIZE:
+                    flush_batch()
+            ids_to_delete.extend(
+                doc_id for content_hash, doc_id in old_chunks.items() if content_hash not in file_chunks
+            )
+
+        if ids_to_delete:
+            vectorstore.delete(ids=ids_to_delete)
+            lexical_index.remove(ids_to_delete)
+            deleted += len(ids_to_delete)
+        report_progress(f"Оброблено файлів: {processed}/{total_files}, додано чанків: {added + len(batch_ids)}")
+
+    flush_batch()
+
+    # Файли, яких більше немає в data/
+    removed_ids = [
+        doc_id
+        for source, old_chunks in manifest.items() if source not in new_manifest
+        for doc_id in old_chunks.values()
+    ]
+    if removed_ids:
+        report_progress(f"Видалення застарілих чанків: {len(removed_ids)}")
+        vectorstore.delete(ids=removed_ids)
+        lexical_index.remove(removed_ids)
+        deleted += len(removed_ids)
     vectorstore.persist()
-    print("Векторна база створена і збережена")
+
+    save_manifest(new_manifest, persist_directory)
+    save_price_index(prices, persist_directory, notes)
+    lexical_index.save(persist_directory)
+    # Копія векторів у вигляді матриці NumPy для VECTOR_STORE_BACKEND=numpy
+    numpy_missing = not os.path.exists(os.path.join(persist_directory, NUMPY_INDEX_FILE))
+    if added or deleted or numpy_missing:
+        report_progress("Оновлення NumPy-індексу...")
+        export_from_chroma(vectorstore, persist_directory)
+    if index_model != model_tag:
+        write_embedding_model(model_tag, persist_directory)
+
+    return {
+        "added": added,
+        "deleted": deleted,
+        "skipped": skipped,
+        "total": sum(len(chunks) for chunks in new_manifest.values()),
+        "price_items": sum(len(entries) for entries in prices.values()),
+        # Примітки прайсу з'явилися в індексі цін пізніше за позиції — індекс без них теж оновлюється
+        "changed": bool(added or deleted or lexical_restored or numpy_missing or index_model != model_tag
+                        or notes != old_notes),
+    }
+
+
+def validate_index(persist_directory: str, report: Dict[str, Any], embeddings: Optional[Embeddings] = None):
+    """Перевіряє зібрану версію індексу перед активацією
+
+    Кількість чанків у маніфесті, Chroma, BM25- і NumPy-індексах має
+    збігатися, а кілька збережених чанків — знаходитися за власним текстом
+    у BM25-індексі і за власним вектором в обох векторних сховищах.
+    Додаткові контрольні запити INDEX_SMOKE_QUERIES мають знаходити чанки.
+
+    Raises:
+        IndexValidationError: якщо версія неповна або пошук у ній не працює
+    """
+    total = report["total"]
+    if not total:
+        raise IndexValidationError("Індекс порожній: у data/ не знайдено жодного чанка")
+
+    vectorstore = Chroma(persist_directory=persist_directory, embedding_function=embeddings or get_embeddings())
+    lexical_index = LexicalIndex.load(persist_directory)
+    try:
+        numpy_store = NumpyVectorStore.load(persist_directory)
+    except RuntimeError as e:
+        raise IndexValidationError(str(e)) from e
+    counts = {
+        "Chroma": vectorstore._collection.count(),
+        "BM25": len(lexical_index),
+        "NumPy": len(numpy_store),
+    }
+    for name, count in counts.items():
+        if count != total:
+            raise IndexValidationError(f"{name}-індекс містить {count} чанків замість {total}")
+
+    for query in INDEX_SMOKE_QUERIES:
+        if not lexical_index.search(query, 1):
+            raise IndexValidationError(f"Контрольний запит «{query}» нічого не знаходить")
+
+    # Пошук за текстом і збереженим вектором чанка має повертати той самий чанк (без звернень до API ембеддингів)
+    sample = vectorstore.get(include=["embeddings", "documents"], limit=INDEX_SMOKE_VECTORS)
+    for doc_id, embedding, text in zip(sample["ids"], sample["embeddings"], sample["documents"]):
+        if doc_id not in lexical_index:
+            raise IndexValidationError("BM25-індекс не містить чанк, який є у Chroma")
+        # Однакові чанки з різних файлів мають рівні оцінки, тому порівнюється текст, а не ID
+        found = [lexical_index.get_document(hit_id).page_content for hit_id, _ in lexical_index.search(text, 3)]
+        if index_terms(text) and text not in found:
+            raise IndexValidationError("BM25-індекс не знаходить власний чанк за його текстом")
+        for name, store in (("Chroma", vectorstore), ("NumPy", numpy_store)):
+            found = [doc.page_content for doc in store.similarity_search_by_vector(list(embedding), k=3)]
+            if text not in found:
+                raise IndexValidationError(f"{name}-індекс не знаходить власний чанк за його вектором")
+
+
+def build_vector_store(progress: Optional[Callable[[str], None]] = None,
+                       workers: int = INGEST_WORKERS, embeddings: Optional[Embeddings] = None) -> Dict[str, Any]:
+    """Збирає нову версію векторної бази за вмістом data/ без зупинки бота
+
+    Версія збирається в окремій директорії db/versions/<версія>/ як
+    інкрементальне оновлення копії активної: файли розбираються паралельно в
+    пулі процесів, ембеддинги рахуються лише для нових або змінених чанків.
+    Після перевірки (validate_index) вказівник db/CURRENT атомарно
+    перемикається на нову версію, і запущені процеси перевідкривають базу.
+    Попередні версії зберігаються для відкату (index_versions.activate_version).
+    Якщо перебудова впала або не пройшла перевірку, активна версія не змінюється.
+
+    Args:
+        progress: функція, яка отримує текстові повідомлення про хід перебудови
+        workers: кількість процесів для розбору файлів
+        embeddings: модель ембеддингів замість налаштованої з кешем (наприклад, фейкова в бенчмарку)
+
+    Returns:
+        Словник зі статистикою: added, deleted, skipped, total, price_items, version
+
+    Raises:
+        IndexValidationError: якщо нова версія не пройшла перевірку
+    """
+    report_progress = progress or (lambda text: None)
+    embeddings = embeddings or get_embeddings()
+
+    version, staging = create_staging(DB_DIR)
+    try:
+        report = _update_index(staging, report_progress, workers, embeddings)
+        changed = report.pop("changed")
+        if not changed and current_version(DB_DIR) is not None:
+            # Нічого не змінилося — залишаємо активну версію
+            discard_staging(staging)
+            report["version"] = current_version(DB_DIR)
+        else:
+            report_progress("Перевірка нової версії індексу...")
+            validate_index(staging, report, embeddings)
+            publish_version(version, report, DB_DIR)
+            report["version"] = version
+    except BaseException:
+        discard_staging(staging)
+        raise
+
+    print(
+        f"Векторна база оновлена (версія {report['version']}): додано {report['added']}, "
+        f"видалено {report['deleted']}, пропущено без перерахунку ембеддингів {report['skipped']} "
+        f"(усього чанків: {report['total']}, позицій у прайсі: {report['price_items']})"
+    )
+    return report
 
 
 if __name__ == "__main__":
@@ -0,0 +1,213 @@
+import os
+import re
+from typing import Callable, Iterable, List, Dict, Any, Optional, Tuple
+from langchain.schema import Document
+from langchain.text_splitter import CharacterTextSplitter
+
+# Параметри запасного розбиття для документів без спеціального чанкера
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_CHUNK_OVERLAP = 50
+
+# Рядок, що містить лише ціну: "600", "800 / 1000", "від 50", "50+50", "2200-2500", "+200/300"
+PRICE_LINE = re.compile(r"^(?:від\s*)?\+?\d[\d\s]*(?:[-–/+]\s*\d[\d\s]*)*(?:грн\.?)?$", re.IGNORECASE)
+
+# Назва і ціна в одному рядку: "Комплекс Гель-лак (...)  800 / 1000", "1 година/1 людина -   500 грн"
+INLINE_PRICE = re.compile(
+    r"^(?P<name>.*?[^\d\s/+–-])\s*[-–]?\s{2,}(?P<price>(?:від\s*)?\d[\d\s]*(?:[-–/+]\s*\d[\d\s]*)*)\s*(?:грн\.?)?$",
+    re.IGNORECASE,
+)
+
+# Одиниця послуги перед ціною: "1 хвилина", "1 година"
+UNIT_LINE = re.compile(r"^\d+\s*(?:хв|хвилин|годин)\w*\.?$", re.IGNORECASE)
+
+# Контакти салону (адреса, телефони), що повторюються на кожній сторінці
+CONTACT_LINE = re.compile(r"^(?:вул\.|тел\.)", re.IGNORECASE)
+
+# Службові рядки, що не несуть інформації про послуги
+SKIP_LINE = re.compile(r"^(?:№|ціна\b.*|салон краси|«?esthe.*|затверджую\b.*)$", re.IGNORECASE)
+
+# Ознака розділу верхнього рівня (назва сторінки прайсу)
+TOP_LEVEL_MARKER = "ПОСЛУГ"
+
+# Чанкер отримує сторінки файлу (можливо, генератор) і повертає чанки
+ChunkerFunc = Callable[[Iterable[Document]], List[Document]]
+
+# Зареєстровані чанкери: (перевірка назви файлу, функція розбиття)
+CHUNKERS: List[Tuple[Callable[[str], bool], ChunkerFunc]] = []
+
+
+def register_chunker(matcher: Callable[[str], bool]):
+    """Реєструє чанкер для файлів, назва яких задовольняє matcher"""
+    def decorator(func: ChunkerFunc) -> ChunkerFunc:
+        CHUNKERS.append((matcher, func))
+        return func
+    return decorator
+
+
+def default_chunker(docs: Iterable[Document]) -> List[Document]:
+    """Запасне розбиття на шматки фіксованого розміру"""
+    splitter = CharacterTextSplitter(chunk_size=DEFAULT_CHUNK_SIZE, chunk_overlap=DEFAULT_CHUNK_OVERLAP)
+    return splitter.split_documents(docs)
+
+
+def get_chunker(filename: str) -> ChunkerFunc:
+    """Повертає чанкер для файлу (перший зареєстрований, що підходить)"""
+    name = os.path.basename(filename).lower()
+    for matcher, func in CHUNKERS:
+        if matcher(name):
+            return func
+    return default_chunker
+
+
+def split_documents(docs: Iterable[Document], filename: str) -> List[Document]:
+    """Розбиває документи одного файлу на чанки відповідним чанкером"""
+    return get_chunker(filename)(docs)
+
+
+@register_chunker(lambda name: name.endswith(".txt") and "faq" in name)
+def faq_chunker(docs: Iterable[Document]) -> List[Document]:
+    """Одна пара питання-відповідь на чанк"""
+    chunks = []
+    for doc in docs:
+        for block in re.split(r"\n\s*\n", doc.page_content):
+            lines = [line.strip() for line in block.strip().splitlines() if line.strip()]
+            if not lines:
+                continue
+            metadata = dict(doc.metadata)
+            metadata.update({"chunk_type": "faq", "category": "FAQ", "question": lines[0]})
+            chunks.append(Document(page_content="\n".join(lines), metadata=metadata))
+    return chunks
+
+
+def _is_header(line: str, next_line: Optional[str]) -> bool:
+    """Заголовок розділу: перше слово великими літерами і далі не йде ціна"""
+    first_word = re.sub(r"[^\w]", "", line.split()[0]) if line.split() else ""
+    letters = re.sub(r"[\d_]", "", first_word)
+    if len(letters) < 3 or not letters.isupper():
+        return False
+    return next_line is None or not (PRICE_LINE.match(next_line) or UNIT_LINE.match(next_line))
+
+
+def parse_price_page(text: str) -> Dict[str, Any]:
+    """Розбирає текст сторінки прайс-листа (вивід PyMuPDF) на позиції
+
+    Returns:
+        {"items": [{category, service, price}], "notes": {категорія: [рядки]}, "contacts": [рядки]}
+    """
+    contacts: List[str] = []
+    # Пари (нормалізований рядок, рядок з початковими пробілами) — пробіли відділяють ціну в рядку
+    meaningful: List[Tuple[str, str]] = []
+    for raw in text.splitlines():
+        raw = raw.strip()
+        line = re.sub(r"\s+", " ", raw)
+        if not line:
+            continue
+        if CONTACT_LINE.match(line):
+            contacts.append(line)
+        elif not SKIP_LINE.match(line):
+            meaningful.append((line, raw))
+
+    items: List[Dict[str, str]] = []
+    notes: Dict[str, List[str]] = {}
+    top_level = ""
+    section = ""
+    pending: List[str] = []
+    last_item: Optional[Dict[str, str]] = None
+
+    def category() -> str:
+        if top_level and section and section != top_level:
+            return f"{top_level} / {section}"
+        return top_level or section
+
+    def flush_notes():
+        if pending:
+            notes.setdefault(category(), []).extend(pending)
+            pending.clear()
+
+    for i, (line, raw) in enumerate(meaningful):
+        next_line = meaningful[i + 1][0] if i + 1 < len(meaningful) else None
+
+        if PRICE_LINE.match(line):
+            price = re.sub(r"\s*грн\.?$", "", line, flags=re.IGNORECASE).strip()
+            if pending:
+                # Назва може займати кілька рядків; довший набір — це шапка таблиці (колонки цін),
+                # яка зберігається як примітка розділу
+                if len(pending) > 2:
+                    notes.setdefault(category(), []).append(" ".join(pending[:-1]))
+                    del pending[:-1]
+                name = " ".join(pending)
+                last_item = {"category": category(), "service": name, "price": price}
+                items.append(last_item)
+                pending.clear()
+            elif last_item is not None:
+                # Кілька цін поспіль — ціни для різних варіантів (довжина волосся, доплати)
+                last_item["price"] += f" / {price}"
+            continue
+
+        inline = INLINE_PRICE.match(raw)
+        if inline:
+            flush_notes()
+            last_item = {"category": category(),
+                         "service": re.sub(r"\s+", " ", inline.group("name")).strip(" -–"),
+                         "price": re.sub(r"\s+", " ", inline.group("price")).strip()}
+            items.append(last_item)
+            continue
+
+        if _is_header(line, next_line):
+            flush_notes()
+            if TOP_LEVEL_MARKER in line.upper() or not top_level:
+                top_level = line
+                section = ""
+            else:
+                section = line
+            last_item = None
+            continue
+
+        pending.append(line)
+
+    flush_notes()
+    return {"items": items, "notes": notes, "contacts": contacts}
+
+
+def _price_text(price: str) -> str:
+    return price if re.search(r"грн", price, re.IGNORECASE) else f"{price} грн"
+
+
+@register_chunker(lambda name: name.endswith(".pdf"))
+def price_list_chunker(docs: Iterable[Document]) -> List[Document]:
+    """Одна позиція прайс-листа (послуга та ціна) на чанк
+
+    Додатково створює чанки з примітками розділів і контактами салону.
+    Якщо розпізнати позиції не вдалося, документ розбивається звичайним способом.
+    """
+    chunks = []
+    contacts: List[str] = []
+    file_metadata: Dict[str, Any] = {}
+    for doc in docs:
+        file_metadata = file_metadata or dict(doc.metadata)
+        parsed = parse_price_page(doc.page_content)
+        if not parsed["items"]:
+            chunks.extend(default_chunker([doc]))
+            continue
+
+        for item in parsed["items"]:
+            metadata = dict(doc.metadata)
+            metadata.update({"chunk_type": "price", **item})
+            text = f"{item['category']}\n{item['service']}: {_price_text(item['price'])}"
+            chunks.append(Document(page_content=text, metadata=metadata))
+
+        for category, lines in parsed["notes"].items():
+            metadata = dict(doc.metadata)
+            metadata.update({"chunk_type": "price_note", "category": category})
+            chunks.append(Document(page_content=f"{category}\n" + "\n".join(lines), metadata=metadata))
+
+        for line in parsed["contacts"]:
+            if line not in contacts:
+                contacts.append(line)
+
+    if contacts:
+        metadata = dict(file_metadata)
+        metadata.update({"chunk_type": "contacts", "category": "Контакти"})
+        chunks.append(Document(page_content="Контакти салону краси «ESTHEIQUE»:\n" + "\n".join(contacts),
+                               metadata=metadata))
+    return chunks
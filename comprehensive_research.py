@@ -6,8 +6,7 @@ import numpy as np
 import time
 from datetime import datetime
 from dotenv import load_dotenv
-from query_rag import query_bot
-from ragas_evaluator import evaluate_rag_response
+from batch_evaluation import run_batch, BATCH_CONCURRENCY
 
 load_dotenv()
 
@@ -38,67 +37,17 @@ class ComprehensiveBeautySalonResearch:
             "Яка ціна солярію?"
         ]
 
-    def run_single_test(self, query, index):
-        print(f"\n{'='*80}")
-        print(f"🔍 Запит {index}/20: {query}")
-        print('='*80)
-        
-        try:
-            start_time = time.time()
-            answer, retrieved_contexts = query_bot(query)
-            response_time = time.time() - start_time
-            
-            print(f"💬 Відповідь: {answer}")
-            print(f"⏱️ Час відповіді: {response_time:.2f} секунд")
-            
-            ragas_metrics = None
-            ragas_time = 0
-            try:
-                ragas_start = time.time()
-                ragas_metrics = evaluate_rag_response(query, answer, retrieved_contexts)
-                ragas_time = time.time() - ragas_start
-            except Exception as e:
-                print(f"⚠️ Помилка RAGAS: {e}")
-                ragas_metrics = {"response_relevancy": 0.0, "faithfulness": 0.0, "context_precision": 0.0}
-            
-            contains_apology = "На жаль" in answer or "наразі недоступна" in answer or "інформація відсутня" in answer
-            has_meaningful_answer = not contains_apology and len(answer.strip()) > 20
-            
-            result = {
-                "index": index,
-                "query": query,
-                "answer": answer,
-                "retrieved_contexts": retrieved_contexts,
-                "ragas_metrics": ragas_metrics,
-                "contains_apology": contains_apology,
-                "has_meaningful_answer": has_meaningful_answer,
-                "answer_length": len(answer),
-                "response_time": response_time,
-                "ragas_time": ragas_time,
-                "total_time": response_time + ragas_time,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            status = "✅ ВІДПОВІВ" if has_meaningful_answer else "❌ НЕ ВІДПОВІВ"
-            print(f"📊 Результат: {status}")
-            
-            self.results.append(result)
-            return result
-            
-        except Exception as e:
-            print(f"❌ Помилка: {e}")
-            return None
-
     def run_research(self):
         print("🚀 КОМПЛЕКСНЕ ДОСЛІДЖЕННЯ AI-КОНСУЛЬТАНТА САЛОНУ КРАСИ")
         print("="*90)
         print(f"📝 Всього запитів: {len(self.test_queries)}")
         print(f"🎯 Мета: Оцінити якість відповідей системи на типові запити клієнтів")
         
+        print(f"⚡ Паралельних запитів: {BATCH_CONCURRENCY}")
+        
         total_start_time = time.time()
         
-        for i, query in enumerate(self.test_queries, 1):
-            self.run_single_test(query, i)
+        self.results = run_batch(self.test_queries, concurrency=BATCH_CONCURRENCY)
         
         total_research_time = time.time() - total_start_time
         print(f"\n⏱️ Загальний час дослідження: {total_research_time:.2f} секунд")
@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+from langchain.schema import HumanMessage, SystemMessage, AIMessage, BaseMessage
+from token_counter import count_tokens, truncate_to_tokens
+
+# Скільки користувачів тримати в пам'яті (решта — лише на диску)
+CONVERSATION_MAX_USERS = int(os.getenv("CONVERSATION_MAX_USERS", "1000"))
+
+# Через скільки секунд неактивності історія користувача видаляється
+CONVERSATION_TTL_SECONDS = float(os.getenv("CONVERSATION_TTL_SECONDS", str(24 * 60 * 60)))
+
+# Максимальна кількість токенів історії, що потрапляє у промпт
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "1000"))
+
+# Скільки токенів може займати стислий підсумок старих повідомлень
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "150"))
+
+# Зберігання історії між перезапусками (порожній шлях — лише в пам'яті)
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", "logs/conversations.sqlite3")
+
+
+class ConversationStore:
+    """Обмежене сховище історії діалогів
+
+    Тримає в пам'яті не більше max_users користувачів (LRU), видаляє історію
+    після ttl секунд неактивності, обмежує історію кожного користувача за
+    кількістю повідомлень і токенів, а старі повідомлення згортає у короткий
+    підсумок. За наявності шляху до SQLite історія переживає перезапуск.
+    """
+
+    def __init__(self, max_messages: int = 20, max_users: int = CONVERSATION_MAX_USERS,
+                 ttl: float = CONVERSATION_TTL_SECONDS, token_budget: int = CONVERSATION_TOKEN_BUDGET,
+                 summary_tokens: int = CONVERSATION_SUMMARY_TOKENS, db_path: Optional[str] = CONVERSATION_DB_PATH):
+        self.max_messages = max_messages
+        self.max_users = max_users
+        self.ttl = ttl
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self._lock = threading.RLock()
+        # user_id -> {"summary": str, "messages": [{"role", "content", "tokens"}], "updated_at": float}
+        self._conversations: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._conn = None
+        self._writes = 0
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Повертає історію з пам'яті або з диска, видаляючи прострочену"""
+        conversation = self._conversations.get(user_id)
+        if conversation is None and self._conn is not None:
+            row = self._conn.execute(
+                "SELECT data FROM conversations WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if row:
+                conversation = json.loads(row[0])
+
+        if conversation is None:
+            return None
+        if time.time() - conversation["updated_at"] > self.ttl:
+            self._delete(user_id)
+            return None
+
+        self._conversations[user_id] = conversation
+        self._conversations.move_to_end(user_id)
+        self._evict()
+        return conversation
+
+    def _evict(self):
+        # Найдовше неактивні користувачі витісняються з пам'яті (на диску історія залишається)
+        while len(self._conversations) > self.max_users:
+            self._conversations.popitem(last=False)
+
+    def _delete(self, user_id: str):
+        self._conversations.pop(user_id, None)
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM conversations WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+
+    def _save(self, user_id: str, conversation: Dict[str, Any]):
+        if self._conn is None:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO conversations (user_id, data, updated_at) VALUES (?, ?, ?)",
+            (user_id, json.dumps(conversation, ensure_ascii=False), conversation["updated_at"]),
+        )
+        self._writes += 1
+        # Періодично прибираємо прострочені історії з диска
+        if self._writes % 100 == 0:
+            self._conn.execute("DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.ttl,))
+        self._conn.commit()
+
+    def _summarize(self, summary: str, dropped: List[Dict[str, Any]]) -> str:
+        """Згортає витіснені повідомлення у короткий підсумок з питань клієнта"""
+        questions = [message["content"].strip() for message in dropped if message["role"] == "human"]
+        if not questions:
+            return summary
+        previous = summary[len("Раніше клієнт питав: "):] if summary else ""
+        joined = "; ".join(filter(None, [previous] + questions))
+        # Залишаємо найновіші питання, якщо підсумок перевищує ліміт
+        while count_tokens(joined) > self.summary_tokens and "; " in joined:
+            joined = joined.split("; ", 1)[1]
+        return "Раніше клієнт питав: " + truncate_to_tokens(joined, self.summary_tokens)
+
+    def _trim(self, conversation: Dict[str, Any]):
+        messages = conversation["messages"]
+        budget = self.token_budget - count_tokens(conversation["summary"])
+        dropped = []
+        # Видаляємо найстаріші обміни (по 2 повідомлення), доки історія не вкладеться в ліміти
+        while messages and (
+            len(messages) > self.max_messages or sum(message["tokens"] for message in messages) > budget
+        ):
+            dropped.extend(messages[:2])
+            del messages[:2]
+        if dropped:
+            conversation["summary"] = self._summarize(conversation["summary"], dropped)
+
+    def append(self, user_id: str, user_query: str, answer: str):
+        """Додає обмін повідомленнями до історії користувача"""
+        if not user_id:
+            return
+        with self._lock:
+            conversation = self._load(user_id) or {"summary": "", "messages": [], "updated_at": 0}
+            conversation["messages"].extend([
+                {"role": "human", "content": user_query, "tokens": count_tokens(user_query)},
+                {"role": "ai", "content": answer, "tokens": count_tokens(answer)},
+            ])
+            conversation["updated_at"] = time.time()
+            self._trim(conversation)
+            self._conversations[user_id] = conversation
+            self._conversations.move_to_end(user_id)
+            self._evict()
+            self._save(user_id, conversation)
+
+    def get_messages(self, user_id: str) -> List[BaseMessage]:
+        """Повертає історію користувача у вигляді повідомлень LangChain для промпту"""
+        if not user_id:
+            return []
+        with self._lock:
+            conversation = self._load(user_id)
+            if conversation is None:
+                return []
+            messages: List[BaseMessage] = []
+            if conversation["summary"]:
+                messages.append(SystemMessage(content=conversation["summary"]))
+            for message in conversation["messages"]:
+                if message["role"] == "human":
+                    messages.append(HumanMessage(content=message["content"]))
+                else:
+                    messages.append(AIMessage(content=message["content"]))
+            return messages
+
+    def clear(self, user_id: str) -> bool:
+        """Видаляє історію користувача
+
+        Returns:
+            True, якщо історія існувала
+        """
+        with self._lock:
+            existed = self._load(user_id) is not None
+            self._delete(user_id)
+            return existed
+
+    def stats(self) -> Dict[str, Any]:
+        """Кількість користувачів в пам'яті та на диску"""
+        with self._lock:
+            stored = None
+            if self._conn is not None:
+                stored = self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+            return {"in_memory": len(self._conversations), "stored": stored}
@@ -0,0 +1,126 @@
+import os
+import threading
+from typing import List, Optional
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+load_dotenv()
+
+# Джерело ембеддингів: "openai" (API) або "local" (модель sentence-transformers на CPU)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+
+# Модель OpenAI (за замовчуванням — та сама, що й у OpenAIEmbeddings, якою зібрано наявну базу)
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+
+# Локальна багатомовна модель (підтримує українську, 384 виміри)
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+
+# Динамічна int8-квантизація лінійних шарів локальної моделі (швидше на CPU, трохи менша точність)
+LOCAL_EMBEDDING_QUANTIZE = os.getenv("LOCAL_EMBEDDING_QUANTIZE", "0") == "1"
+
+# Розмір пакета текстів для локальної моделі
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+
+# Кількість потоків PyTorch (0 — за замовчуванням PyTorch)
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))
+
+
+class LocalEmbeddings(Embeddings):
+    """Ембеддинги локальною моделлю sentence-transformers на CPU
+
+    Модель завантажується при першому зверненні. Потрібен пакет
+    sentence-transformers (pip install sentence-transformers).
+    """
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL, quantize: bool = LOCAL_EMBEDDING_QUANTIZE,
+                 batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE, threads: int = LOCAL_EMBEDDING_THREADS):
+        self.model_name = model_name
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.threads = threads
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "Для EMBEDDING_BACKEND=local встановіть sentence-transformers: pip install sentence-transformers"
+            ) from e
+
+        if self.threads > 0:
+            torch.set_num_threads(self.threads)
+        model = SentenceTransformer(self.model_name, device="cpu")
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.eval()
+        return model
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts) if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+
+_local_models = {}
+_local_models_lock = threading.Lock()
+
+
+def get_local_embeddings() -> LocalEmbeddings:
+    """Спільна для процесу локальна модель (завантажується один раз)"""
+    key = (LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_QUANTIZE)
+    with _local_models_lock:
+        if key not in _local_models:
+            _local_models[key] = LocalEmbeddings(LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_QUANTIZE)
+        return _local_models[key]
+
+
+def embedding_model_tag(backend: Optional[str] = None) -> str:
+    """Назва моделі ембеддингів, якою позначається індекс і ключі кешу
+
+    Для OpenAI — назва моделі без префікса (сумісно з наявним кешем),
+    для локальної моделі — "local:<модель>" з позначкою квантизації.
+    """
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "local":
+        return f"local:{LOCAL_EMBEDDING_MODEL}" + (":int8" if LOCAL_EMBEDDING_QUANTIZE else "")
+    if backend == "openai":
+        return OPENAI_EMBEDDING_MODEL
+    raise ValueError(f"Невідомий EMBEDDING_BACKEND: {backend} (доступні: openai, local)")
+
+
+def create_embeddings(backend: Optional[str] = None, **kwargs) -> Embeddings:
+    """Створює модель ембеддингів вибраного бекенду
+
+    Args:
+        backend: "openai" або "local" (за замовчуванням — EMBEDDING_BACKEND)
+        **kwargs: параметри для OpenAIEmbeddings (наприклад, http_client); локальна модель їх ігнорує
+    """
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "local":
+        return get_local_embeddings()
+    if backend == "openai":
+        return OpenAIEmbeddings(model=OPENAI_EMBEDDING_MODEL, **kwargs)
+    raise ValueError(f"Невідомий EMBEDDING_BACKEND: {backend} (доступні: openai, local)")
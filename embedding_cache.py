@@ -0,0 +1,185 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from array import array
+from typing import List, Dict, Any, Optional
+from langchain_core.embeddings import Embeddings
+from embedding_backends import create_embeddings, embedding_model_tag
+
+# Шлях до файлу кешу ембеддингів
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite3")
+
+# Максимальна кількість векторів у кеші (старі витісняються за LRU)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+
+
+def normalize_text(text: str) -> str:
+    """Нормалізує текст для ключа кешу: Unicode NFC, без зайвих пробілів"""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(model_name: str, text: str) -> str:
+    """Ключ кешу: хеш пари (модель, нормалізований текст)"""
+    return hashlib.sha256(f"{model_name}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCacheStore:
+    """Сховище ембеддингів у SQLite з LRU-витісненням"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Повертає знайдені вектори та оновлює час останнього використання"""
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            # SQLite обмежує кількість параметрів у запиті, тож читаємо частинами
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model_name: str, items: Dict[str, List[float]]):
+        """Зберігає вектори та витісняє найдавніше використані при переповненні"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(key, model_name, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def size(self) -> int:
+        """Кількість векторів у кеші"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """Обгортка над будь-якою моделлю ембеддингів з постійним кешем на диску
+
+    Вектор для тексту, який уже рахувався тією ж моделлю, береться з кешу
+    без звернення до API.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: Optional[str] = None,
+                 store: Optional[EmbeddingCacheStore] = None):
+        self.underlying = underlying
+        self.model_name = model_name or getattr(underlying, "model", None) or type(underlying).__name__
+        self.store = store or get_cache_store()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _record(self, hits: int, misses: int):
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model_name, text) for text in texts]
+        cached = self.store.get_many(list(set(keys)))
+
+        # Рахуємо ембеддинги лише для відсутніх у кеші текстів (кожен унікальний — один раз)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.store.put_many(self.model_name, computed)
+            cached.update(computed)
+
+        self._record(len(texts) - len(missing), len(missing))
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = cache_key(self.model_name, text)
+        cached = self.store.get_many([key])
+        if key in cached:
+            self._record(1, 0)
+            return cached[key]
+
+        vector = self.underlying.embed_query(text)
+        self.store.put_many(self.model_name, {key: vector})
+        self._record(0, 1)
+        return vector
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика звернень до кешу"""
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": self.store.size(),
+        }
+
+
+_store: Optional[EmbeddingCacheStore] = None
+_store_lock = threading.Lock()
+
+
+def get_cache_store() -> EmbeddingCacheStore:
+    """Повертає спільне для процесу сховище кешу ембеддингів"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EmbeddingCacheStore()
+    return _store
+
+
+def get_embeddings(**kwargs) -> CachedEmbeddings:
+    """Створює ембеддинги налаштованого бекенду (EMBEDDING_BACKEND), обгорнуті постійним кешем
+
+    Args:
+        **kwargs: параметри для OpenAIEmbeddings (наприклад, http_client)
+    """
+    return CachedEmbeddings(create_embeddings(**kwargs), model_name=embedding_model_tag())
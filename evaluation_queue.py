@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import queue
+import random
+import datetime
+import threading
+from typing import List, Dict, Any, Optional
+from ragas_evaluator import evaluate_rag_response_timed
+import metrics
+
+# Частка відповідей, які оцінюються RAGAS (1.0 — всі, 0.1 — кожна десята в середньому)
+RAGAS_SAMPLE_RATE = float(os.getenv("RAGAS_SAMPLE_RATE", "1.0"))
+
+# Кількість фонових воркерів оцінки
+RAGAS_WORKERS = int(os.getenv("RAGAS_WORKERS", "2"))
+
+# Максимальна довжина черги; при переповненні нові завдання відкидаються
+RAGAS_QUEUE_SIZE = int(os.getenv("RAGAS_QUEUE_SIZE", "100"))
+
+# Файл з результатами оцінок (поруч із логом запитів)
+EVALUATION_LOG_FILE = "logs/evaluations.jsonl"
+
+
+class EvaluationQueue:
+    """Фонова черга RAGAS-оцінок
+
+    Відповідь клієнту надсилається одразу, а оцінка виконується пулом
+    воркерів поза потоком обробки повідомлень. Результати дописуються у
+    logs/evaluations.jsonl.
+    """
+
+    def __init__(self, workers: int = RAGAS_WORKERS, max_queue: int = RAGAS_QUEUE_SIZE,
+                 sample_rate: float = RAGAS_SAMPLE_RATE, log_file: str = EVALUATION_LOG_FILE):
+        self.workers = workers
+        self.sample_rate = sample_rate
+        self.log_file = log_file
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.submitted = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        """Запускає воркери (викликається автоматично при першому submit)"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"ragas-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, user_input: str, response: str, retrieved_contexts: List[str], **metadata) -> bool:
+        """Ставить відповідь у чергу на оцінку
+
+        Args:
+            user_input: запит користувача
+            response: відповідь бота
+            retrieved_contexts: контекст, на основі якого згенеровано відповідь
+            **metadata: додаткові поля для запису (user_id, source тощо)
+
+        Returns:
+            True, якщо завдання поставлено в чергу
+        """
+        if random.random() >= self.sample_rate:
+            with self._lock:
+                self.sampled_out += 1
+            return False
+
+        self.start()
+        task = {
+            "user_input": user_input,
+            "response": response,
+            "retrieved_contexts": list(retrieved_contexts),
+            "metadata": metadata,
+            "enqueued_at": time.time(),
+        }
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            # Зворотний тиск: краще пропустити оцінку, ніж затримати клієнта
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _worker(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                self._queue.task_done()
+                break
+            started = time.time()
+            ragas_metrics, latencies = evaluate_rag_response_timed(
+                task["user_input"], task["response"], task["retrieved_contexts"]
+            )
+            finished = time.time()
+
+            with self._lock:
+                if ragas_metrics is None:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+            # Затримки RAGAS — окремим записом, бо оцінка виконується після відповіді клієнту
+            metrics.record_trace(
+                "ragas",
+                {"ragas_queue": started - task["enqueued_at"], "ragas": finished - started,
+                 **{f"ragas_{name}": value for name, value in (latencies or {}).items()}},
+                total_seconds=finished - task["enqueued_at"],
+                source=task["metadata"].get("source"),
+                failed=ragas_metrics is None,
+            )
+
+            self._persist({
+                "timestamp": datetime.datetime.now().isoformat(),
+                "query": task["user_input"],
+                "answer": task["response"],
+                "retrieved_contexts": task["retrieved_contexts"],
+                "ragas_metrics": ragas_metrics,
+                "queue_seconds": round(started - task["enqueued_at"], 3),
+                "evaluation_seconds": round(finished - started, 3),
+                "metric_seconds": {name: round(value, 3) for name, value in latencies.items()} if latencies else None,
+                **task["metadata"],
+            })
+            self._queue.task_done()
+
+    def _persist(self, record: Dict[str, Any]):
+        try:
+            os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+            with self._write_lock:
+                with open(self.log_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Не вдалося зберегти результат оцінки: {e}")
+
+    def join(self):
+        """Чекає, доки всі поставлені в чергу оцінки будуть виконані"""
+        self._queue.join()
+
+    def shutdown(self, wait: bool = True):
+        """Зупиняє воркери після обробки вже поставлених завдань"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика черги оцінок"""
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "sampled_out": self.sampled_out,
+                "dropped": self.dropped,
+                "completed": self.completed,
+                "failed": self.failed,
+                "pending": self._queue.qsize(),
+                "sample_rate": self.sample_rate,
+            }
+
+
+_evaluation_queue: Optional[EvaluationQueue] = None
+_evaluation_queue_lock = threading.Lock()
+
+
+def get_evaluation_queue() -> EvaluationQueue:
+    """Повертає спільну для процесу чергу оцінок"""
+    global _evaluation_queue
+    if _evaluation_queue is None:
+        with _evaluation_queue_lock:
+            if _evaluation_queue is None:
+                _evaluation_queue = EvaluationQueue()
+    return _evaluation_queue
+
@@ -0,0 +1,90 @@
+import math
+import time
+import hashlib
+from typing import List, Iterator, Sequence
+from langchain.schema import AIMessage, BaseMessage, SystemMessage
+from langchain_core.embeddings import Embeddings
+from text_utils import tokenize
+
+# Назва фейкової моделі ембеддингів (ключ кешу ембеддингів не перетинається з реальними моделями)
+FAKE_EMBEDDING_MODEL = "fake:hashing"
+
+
+class FakeEmbeddings(Embeddings):
+    """Детерміновані ембеддинги без мережі для бенчмарків і навантажувальних тестів
+
+    Вектор — хешований мішок основ слів (hashing trick), нормалізований до
+    одиничної довжини: тексти зі спільними словами мають ненульову
+    косинусну схожість, тож пошук поводиться правдоподібно. Затримка API
+    імітується паузою на кожен виклик і на кожен текст.
+    """
+
+    def __init__(self, dimensions: int = 256, call_latency: float = 0.0, text_latency: float = 0.0):
+        """
+        Args:
+            dimensions: розмірність векторів
+            call_latency: пауза на кожен виклик, секунд
+            text_latency: додаткова пауза на кожен текст у виклику, секунд
+        """
+        self.dimensions = dimensions
+        self.call_latency = call_latency
+        self.text_latency = text_latency
+        self.model = FAKE_EMBEDDING_MODEL
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for token in tokenize(text):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector))
+        if not norm:
+            # Текст без слів — фіксований одиничний вектор
+            vector[0] = norm = 1.0
+        return [value / norm for value in vector]
+
+    def _sleep(self, texts: int):
+        delay = self.call_latency + self.text_latency * texts
+        if delay > 0:
+            time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._sleep(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._sleep(1)
+        return self._vector(text)
+
+
+class FakeChatModel:
+    """Детермінована чат-модель без мережі з інтерфейсом stream/invoke як у ChatOpenAI
+
+    Відповідь — перші answer_tokens слів контексту з системного промпту;
+    затримка до першого токена і між токенами задається явно.
+    """
+
+    def __init__(self, model_name: str = "fake-chat", first_token_latency: float = 0.0,
+                 token_latency: float = 0.0, answer_tokens: int = 40):
+        self.model_name = model_name
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+
+    def _answer_words(self, messages: Sequence[BaseMessage]) -> List[str]:
+        system = next((message.content for message in messages if isinstance(message, SystemMessage)), "")
+        context = system.split("Контекст:", 1)[-1]
+        answer = context.split()[:self.answer_tokens]
+        return answer or ["На", "жаль,", "ця", "інформація", "наразі", "недоступна."]
+
+    def stream(self, messages: Sequence[BaseMessage]) -> Iterator[AIMessage]:
+        words = self._answer_words(messages)
+        if self.first_token_latency > 0:
+            time.sleep(self.first_token_latency)
+        for i, word in enumerate(words):
+            if i and self.token_latency > 0:
+                time.sleep(self.token_latency)
+            yield AIMessage(content=word if i == 0 else " " + word)
+
+    def invoke(self, messages: Sequence[BaseMessage]) -> AIMessage:
+        return AIMessage(content="".join(chunk.content for chunk in self.stream(messages)))
@@ -0,0 +1,218 @@
+import os
+import json
+import shutil
+import hashlib
+import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from embedding_backends import embedding_model_tag
+
+# Коренева директорія векторної бази
+DB_DIR = "db"
+
+# Піддиректорія з версіями індексу: db/versions/<версія>/
+INDEX_VERSIONS_DIR = "versions"
+
+# Вказівник на активну версію (замінюється атомарно)
+CURRENT_FILE = "CURRENT"
+
+# Файл з описом зібраної версії; версія без нього вважається незавершеною
+BUILD_INFO_FILE = "build_info.json"
+
+# Скільки версій зберігати для відкату (активна версія не видаляється ніколи)
+INDEX_RETAIN_VERSIONS = int(os.getenv("INDEX_RETAIN_VERSIONS", "3"))
+
+# Маркер версії бази, зібраної до появи версій (файли лежать прямо у db/)
+LEGACY_INDEX_VERSION_FILE = ".index_version"
+
+# Файл з назвою моделі ембеддингів, якою зібрано індекс
+EMBEDDING_MODEL_FILE = ".embedding_model"
+
+
+class IndexValidationError(Exception):
+    """Нова версія індексу не пройшла перевірку і не була активована"""
+
+
+def versions_root(root: str = DB_DIR) -> str:
+    return os.path.join(root, INDEX_VERSIONS_DIR)
+
+
+def version_dir(version: str, root: str = DB_DIR) -> str:
+    """Директорія версії індексу"""
+    return os.path.join(versions_root(root), version)
+
+
+def current_version(root: str = DB_DIR) -> Optional[str]:
+    """Активна версія індексу або None, якщо база ще у старому форматі чи порожня"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def chunk_hash(text: str) -> str:
+    """Хеш вмісту чанка"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def vector_id(source: str, content_hash: str) -> str:
+    """Стабільний ID вектора: однаковий чанк з одного файлу завжди має той самий ID"""
+    return hashlib.sha256(f"{source}\n{content_hash}".encode("utf-8")).hexdigest()
+
+
+def read_index_embedding_model(persist_directory: str = DB_DIR) -> Optional[str]:
+    """Повертає модель ембеддингів, якою зібрано індекс, або None для бази без позначки"""
+    try:
+        with open(os.path.join(persist_directory, EMBEDDING_MODEL_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_index_version(root: str = DB_DIR) -> Optional[str]:
+    """Версія індексу, з якою мають працювати процеси
+
+    Для бази у старому форматі — вміст маркера db/.index_version.
+    """
+    version = current_version(root)
+    if version is not None:
+        return version
+    try:
+        with open(os.path.join(root, LEGACY_INDEX_VERSION_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def index_dir(root: str = DB_DIR, version: Optional[str] = None) -> str:
+    """Директорія з файлами індексу заданої (або активної) версії
+
+    Raises:
+        RuntimeError: якщо db/CURRENT вказує на версію, директорії якої немає, —
+            файли старого формату в корені db/ могли б бути застарілими
+    """
+    version = version or current_version(root)
+    if version is None:
+        # База у старому форматі або ще не зібрана
+        return root
+    path = version_dir(version, root)
+    if not os.path.isdir(path):
+        raise RuntimeError(
+            f"Версію векторної бази {version} не знайдено ({path}). "
+            "Активуйте іншу версію в адмін-панелі або перебудуйте базу: python build_vectorstore.py"
+        )
+    return path
+
+
+def load_build_info(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(path, BUILD_INFO_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def create_staging(root: str = DB_DIR) -> Tuple[str, str]:
+    """Створює директорію нової версії як копію активної
+
+    Копія дозволяє оновлювати індекс інкрементально, не торкаючись файлів,
+    які зараз читають бот і адмін-панель.
+
+    Returns:
+        (назва версії, шлях до директорії)
+    """
+    version = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    staging = version_dir(version, root)
+    try:
+        source = index_dir(root)
+    except RuntimeError:
+        # Активна версія зникла — збираємо з нуля, а не з застарілих файлів у корені
+        source = None
+    os.makedirs(versions_root(root), exist_ok=True)
+
+    if source is None:
+        os.makedirs(staging)
+    elif os.path.isdir(source) and source != root:
+        shutil.copytree(source, staging, ignore=shutil.ignore_patterns(BUILD_INFO_FILE))
+    elif os.path.isdir(root):
+        # Перехід зі старого формату: копіюємо все, крім службових файлів версій
+        shutil.copytree(root, staging, ignore=shutil.ignore_patterns(
+            INDEX_VERSIONS_DIR, CURRENT_FILE, CURRENT_FILE + ".tmp", LEGACY_INDEX_VERSION_FILE
+        ))
+    else:
+        os.makedirs(staging)
+    return version, staging
+
+
+def discard_staging(staging: str):
+    """Видаляє незавершену версію (після помилки або якщо змін немає)"""
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+def activate_version(version: str, root: str = DB_DIR):
+    """Атомарно робить версію активною; запущені процеси перевідкриють базу
+
+    Використовується і для публікації нової версії, і для відкату.
+
+    Raises:
+        IndexValidationError: якщо версія не завершена або зібрана іншою моделлю
+            ембеддингів, ніж налаштована (пошук у ній не працюватиме)
+    """
+    path = version_dir(version, root)
+    if load_build_info(path) is None:
+        raise IndexValidationError(f"Версія {version} не знайдена або не завершена")
+    index_model = read_index_embedding_model(path)
+    if index_model is not None and index_model != embedding_model_tag():
+        raise IndexValidationError(
+            f"Версію {version} зібрано моделлю ембеддингів {index_model}, а налаштовано {embedding_model_tag()}"
+        )
+    pointer = os.path.join(root, CURRENT_FILE)
+    tmp_path = pointer + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, pointer)
+
+
+def publish_version(version: str, report: Dict[str, Any], root: str = DB_DIR):
+    """Позначає перевірену версію завершеною, активує її і прибирає старі версії"""
+    info = dict(report, version=version, created_at=datetime.datetime.now().isoformat())
+    path = os.path.join(version_dir(version, root), BUILD_INFO_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    activate_version(version, root)
+    prune_versions(root)
+
+
+def list_versions(root: str = DB_DIR) -> List[Dict[str, Any]]:
+    """Завершені версії індексу, від найновішої
+
+    Returns:
+        Описи версій (build_info) з полем is_current
+    """
+    if not os.path.isdir(versions_root(root)):
+        return []
+    current = current_version(root)
+    versions = []
+    for name in sorted(os.listdir(versions_root(root)), reverse=True):
+        info = load_build_info(version_dir(name, root))
+        if info is not None:
+            versions.append(dict(info, version=name, is_current=name == current))
+    return versions
+
+
+def prune_versions(root: str = DB_DIR, keep: int = INDEX_RETAIN_VERSIONS):
+    """Видаляє найстаріші версії понад keep, а також незавершені збирання"""
+    if not os.path.isdir(versions_root(root)):
+        return
+    current = current_version(root)
+    complete = [version["version"] for version in list_versions(root)]
+    retained = set(complete[:max(keep, 1)]) | {current}
+    newest = max(complete) if complete else ""
+    for name in os.listdir(versions_root(root)):
+        # Незавершені версії, новіші за останню завершену, можуть ще збиратися іншим процесом
+        if name in retained or (name not in complete and name > newest):
+            continue
+        # У Windows директорія, відкрита іншим процесом, видалиться при наступному прибиранні
+        shutil.rmtree(version_dir(name, root), ignore_errors=True)
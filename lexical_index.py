@@ -0,0 +1,144 @@
+import os
+import json
+import math
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+from langchain.schema import Document
+from text_utils import STOP_WORDS, words, stem
+
+# Файл лексичного індексу (поруч із векторною базою), оновлюється build_vector_store
+LEXICAL_INDEX_FILE = "lexical_index.json"
+
+# Параметри BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def index_terms(text: str) -> List[str]:
+    """Терміни для лексичного індексу: основи слів без службових слів"""
+    return [stem(word) for word in words(text) if word not in STOP_WORDS]
+
+
+class LexicalIndex:
+    """Інвертований індекс BM25 над тими самими чанками, що й у векторній базі
+
+    Зберігає текст і метадані чанків за їхніми ID у Chroma, тож знайдені
+    документи повертаються без звернення до векторної бази. Оновлюється
+    інкрементально разом з базою (add/remove) і зберігається у db/lexical_index.json.
+    """
+
+    def __init__(self):
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None):
+        """Додає (або замінює) чанк в індексі"""
+        if doc_id in self._docs:
+            self.remove([doc_id])
+        self._docs[doc_id] = {"text": text, "metadata": dict(metadata or {})}
+        terms = Counter(index_terms(text))
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = frequency
+        length = sum(terms.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+
+    def remove(self, doc_ids: Iterable[str]):
+        """Видаляє чанки з індексу"""
+        for doc_id in doc_ids:
+            doc = self._docs.pop(doc_id, None)
+            if doc is None:
+                continue
+            for term in set(index_terms(doc["text"])):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+            self._total_length -= self._lengths.pop(doc_id, 0)
+
+    def clear(self):
+        """Видаляє всі чанки з індексу"""
+        self._docs.clear()
+        self._postings.clear()
+        self._lengths.clear()
+        self._total_length = 0
+
+    def document_frequency(self, term: str) -> int:
+        """У скількох чанках зустрічається термін"""
+        return len(self._postings.get(term, ()))
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[str, float]]:
+        """BM25-пошук
+
+        Returns:
+            До k пар (ID чанка, оцінка) у порядку спадання оцінки
+        """
+        if not self._docs:
+            return []
+        count = len(self._docs)
+        average_length = self._total_length / count or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(index_terms(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def has_term(self, doc_id: str, term: str) -> bool:
+        """Чи містить чанк термін (основу слова, див. index_terms)"""
+        return doc_id in self._postings.get(term, ())
+
+    def get_document(self, doc_id: str) -> Document:
+        doc = self._docs[doc_id]
+        return Document(page_content=doc["text"], metadata=dict(doc["metadata"]))
+
+    def save(self, persist_directory: str):
+        """Атомарно зберігає індекс (постінги відновлюються при завантаженні)"""
+        os.makedirs(persist_directory, exist_ok=True)
+        index_path = os.path.join(persist_directory, LEXICAL_INDEX_FILE)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"docs": self._docs}, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, persist_directory: str) -> "LexicalIndex":
+        """Завантажує індекс з диска; якщо файлу немає — повертає порожній"""
+        index = cls()
+        try:
+            with open(os.path.join(persist_directory, LEXICAL_INDEX_FILE), "r", encoding="utf-8") as f:
+                docs = json.load(f)["docs"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return index
+        for doc_id, doc in docs.items():
+            index.add(doc_id, doc["text"], doc["metadata"])
+        return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = 60) -> List[Document]:
+    """Об'єднує кілька ранжованих списків документів методом RRF
+
+    Документ отримує суму 1 / (k + позиція) за всіма списками, у яких він є;
+    однакові чанки розпізнаються за джерелом і текстом.
+    """
+    scores: Dict[Tuple[str, str], float] = {}
+    documents: Dict[Tuple[str, str], Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            key = (doc.metadata.get("source", ""), doc.page_content)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
@@ -1,25 +1,102 @@
 import os
 import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Iterator, Tuple, Optional
+from langchain.schema import Document
 from langchain_community.document_loaders import TextLoader, PyMuPDFLoader
-from langchain.text_splitter import CharacterTextSplitter
+from chunkers import split_documents
 
 # Увімкнути UTF-8 у Windows-терміналі (для кирилиці)
 if sys.platform.startswith('win'):
     os.system('chcp 65001')
 
-def load_documents(path: str):
-    docs = []
+# Кількість процесів для розбору файлів (0 — за кількістю ядер, 1 — без окремих процесів)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+
+# Скільки файлів може оброблятися одночасно на кожен процес (обмежує використання пам'яті)
+INGEST_IN_FLIGHT_PER_WORKER = 2
+
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+
+
+def list_files(path: str) -> List[str]:
+    """Повертає шляхи до підтримуваних файлів у директорії"""
+    return [
+        os.path.join(path, filename)
+        for filename in sorted(os.listdir(path))
+        if filename.endswith(SUPPORTED_EXTENSIONS)
+    ]
+
+
+def load_file(full_path: str) -> List[Document]:
+    """Завантажує один файл і розбиває його на чанки
+
+    Сторінки читаються по одній і одразу передаються чанкеру, тож у пам'яті
+    не тримається весь документ. Виконується в окремому процесі.
+    """
+    if full_path.endswith(".txt"):
+        loader = TextLoader(full_path, encoding='utf-8')
+    else:
+        loader = PyMuPDFLoader(full_path)
+    return split_documents(loader.lazy_load(), os.path.basename(full_path))
 
-    for filename in os.listdir(path):
-        full_path = os.path.join(path, filename)
 
-        if filename.endswith(".txt"):
-            loader = TextLoader(full_path, encoding='utf-8')
-            docs.extend(loader.load())
+def iter_documents(path: str, workers: int = INGEST_WORKERS) -> Iterator[Tuple[str, Optional[List[Document]]]]:
+    """Паралельно розбирає файли директорії і віддає чанки по одному файлу
 
-        elif filename.endswith(".pdf"):
-            loader = PyMuPDFLoader(full_path)
-            docs.extend(loader.load())
+    Одночасно в обробці не більше workers * INGEST_IN_FLIGHT_PER_WORKER файлів,
+    тож пам'ять не залежить від кількості файлів у директорії.
 
-    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    return splitter.split_documents(docs)
+    Yields:
+        (шлях до файлу, чанки файлу) у порядку завершення обробки;
+        None замість чанків, якщо файл не вдалося розібрати
+    """
+    files = list_files(path)
+
+    if workers <= 1 or len(files) <= 1:
+        for full_path in files:
+            try:
+                yield full_path, load_file(full_path)
+            except Exception as e:
+                print(f"Не вдалося обробити {full_path}: {e}")
+                yield full_path, None
+        return
+
+    # spawn замість fork: збирання запускається і з багатопотокових процесів (бот, адмін-панель)
+    context = multiprocessing.get_context("spawn")
+    max_in_flight = workers * INGEST_IN_FLIGHT_PER_WORKER
+    pending_files = iter(files)
+    with ProcessPoolExecutor(max_workers=min(workers, len(files)), mp_context=context) as executor:
+        in_flight = {}
+
+        def submit_next() -> bool:
+            full_path = next(pending_files, None)
+            if full_path is None:
+                return False
+            in_flight[executor.submit(load_file, full_path)] = full_path
+            return True
+
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                full_path = in_flight.pop(future)
+                try:
+                    chunks = future.result()
+                except Exception as e:
+                    print(f"Не вдалося обробити {full_path}: {e}")
+                    chunks = None
+                submit_next()
+                yield full_path, chunks
+
+
+def load_documents(path: str) -> List[Document]:
+    """Завантажує і розбиває на чанки всі документи директорії"""
+    docs = []
+    for _, chunks in iter_documents(path):
+        if chunks:
+            docs.extend(chunks)
+    return docs
@@ -0,0 +1,403 @@
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import datetime
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from typing import List, Dict, Any, Optional
+
+# Токен фейкового бота (формат як у справжнього, щоб пройти перевірку telebot)
+FAKE_BOT_TOKEN = "123456789:LOADTEST"
+
+# Журнал запитів для відтворення: JSONL-лог бота або старий JSON-масив
+LOADTEST_SOURCE = os.getenv("LOADTEST_SOURCE", "logs/queries.jsonl")
+
+# Директорія з результатами (спільна з benchmark.py)
+LOADTEST_OUTPUT_DIR = "benchmarks"
+
+# Курсор потокової відповіді (див. telegram_bot.reply_streaming): редагування з ним — проміжні
+STREAM_CURSOR = " ▌"
+
+# Текст заглушки, яку бот надсилає перед потоковою відповіддю
+PLACEHOLDER_TEXT = "✍️ ..."
+
+
+def load_recorded_queries(path: str) -> List[Dict[str, Any]]:
+    """Читає записані запити клієнтів (лише з Telegram) у хронологічному порядку
+
+    Підтримуються і JSONL-лог (з архівами logs/queries.*.jsonl), і старий
+    JSON-масив logs/queries.json.
+    """
+    paths = [path]
+    if path.endswith(".jsonl"):
+        paths = sorted(glob.glob(path.replace(".jsonl", ".*.jsonl"))) + [path]
+        if not os.path.exists(path):
+            # Лог ще не перенесено у JSONL
+            paths = paths[:-1] + [path.replace(".jsonl", ".json")]
+
+    records = []
+    for current in paths:
+        if not os.path.exists(current):
+            continue
+        with open(current, "r", encoding="utf-8") as f:
+            if current.endswith(".json"):
+                try:
+                    records.extend(json.load(f))
+                except json.JSONDecodeError:
+                    continue
+            else:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+
+    records = [
+        record for record in records
+        if record.get("query") and record.get("source", "telegram") == "telegram" and not record["query"].startswith("/")
+    ]
+    records.sort(key=lambda record: record.get("timestamp", ""))
+    return records
+
+
+class FakeTelegramAPI:
+    """Локальний HTTP-сервер з мінімальним Telegram Bot API (sendMessage, editMessageText)
+
+    telebot надсилає запити сюди замість api.telegram.org (apihelper.API_URL).
+    Для кожного вхідного повідомлення фіксується час заглушки, першого
+    фрагмента відповіді і фінальної відповіді.
+    """
+
+    def __init__(self, api_latency: float = 0.0):
+        self.api_latency = api_latency
+        self._lock = threading.Lock()
+        self._next_message_id = 10 ** 9
+        # ID відповіді бота -> ID повідомлення клієнта, на яке вона відповідає
+        self._reply_to: Dict[int, int] = {}
+        # ID повідомлення клієнта -> моменти подій
+        self.events: Dict[int, Dict[str, float]] = {}
+        self.calls: Dict[str, int] = {}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-telegram", daemon=True)
+
+    @property
+    def api_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/bot{{0}}/{{1}}"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _mark(self, message_id: Optional[int], event: str):
+        if message_id is None:
+            return
+        with self._lock:
+            self.events.setdefault(message_id, {}).setdefault(event, time.perf_counter())
+
+    def _handle(self, method: str, params: Dict[str, Any]) -> Any:
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        chat_id = int(params.get("chat_id", 0))
+        text = params.get("text", "")
+
+        if method == "sendMessage":
+            reply_to = params.get("reply_to_message_id")
+            if reply_to is None and params.get("reply_parameters"):
+                reply_to = json.loads(params["reply_parameters"]).get("message_id")
+            with self._lock:
+                self._next_message_id += 1
+                message_id = self._next_message_id
+                if reply_to is not None:
+                    self._reply_to[message_id] = int(reply_to)
+            original = int(reply_to) if reply_to is not None else None
+            self._mark(original, "placeholder" if text == PLACEHOLDER_TEXT else "done")
+        elif method == "editMessageText":
+            message_id = int(params.get("message_id", 0))
+            with self._lock:
+                original = self._reply_to.get(message_id)
+            self._mark(original, "first_token")
+            if not text.endswith(STREAM_CURSOR):
+                self._mark(original, "done")
+        else:
+            return True
+
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": int(FAKE_BOT_TOKEN.split(":")[0]), "is_bot": True, "first_name": "ESTHEIQUE"},
+            "text": text,
+        }
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                url = urlparse(self.path)
+                method = url.path.rsplit("/", 1)[-1]
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    body = self.rfile.read(length).decode("utf-8", errors="replace")
+                    if self.headers.get("Content-Type", "").startswith("application/json"):
+                        params.update(json.loads(body))
+                    else:
+                        params.update({key: values[-1] for key, values in parse_qs(body).items()})
+                if api.api_latency > 0:
+                    time.sleep(api.api_latency)
+                payload = json.dumps({"ok": True, "result": api._handle(method, params)}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _respond
+            do_POST = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def make_update(update_id: int, message_id: int, user_id: int, username: str, text: str) -> Dict[str, Any]:
+    """Оновлення Telegram з текстовим повідомленням клієнта"""
+    user = {"id": user_id, "is_bot": False, "first_name": username, "username": username}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "username": username},
+            "from": user,
+            "text": text,
+        },
+    }
+
+
+def run_load(options: argparse.Namespace, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Відтворює запити через обробник повідомлень бота в поточній (тимчасовій) директорії"""
+    # Налаштування, які модулі бота читають при імпорті
+    os.environ["TELEGRAM_BOT_TOKEN"] = FAKE_BOT_TOKEN
+    os.environ["RAGAS_SAMPLE_RATE"] = "0"  # оцінка RAGAS звертається до OpenAI
+    os.environ["BOT_WORKERS"] = str(options.workers)
+
+    import telebot
+    from benchmark import make_corpus, latency_stats
+    from build_vectorstore import build_vector_store
+    from embedding_cache import CachedEmbeddings
+    from fake_models import FakeEmbeddings, FakeChatModel, FAKE_EMBEDDING_MODEL
+    from update_dispatcher import KeyedExecutor
+    import rag_service
+
+    api = FakeTelegramAPI(api_latency=options.telegram_latency_ms / 1000)
+    api.start()
+    telebot.apihelper.API_URL = api.api_url
+
+    embeddings = FakeEmbeddings(call_latency=options.embed_latency_ms / 1000)
+    make_corpus(options.data, "data", 1)
+    build_vector_store(embeddings=embeddings)
+    rag_service.set_rag_service(rag_service.RAGService(
+        embeddings=CachedEmbeddings(embeddings, model_name=FAKE_EMBEDDING_MODEL),
+        chat_factory=lambda model_name, temperature: FakeChatModel(
+            model_name,
+            first_token_latency=options.llm_first_token_ms / 1000,
+            token_latency=options.llm_token_ms / 1000,
+        ),
+    ))
+
+    import telegram_bot
+
+    started_handling: Dict[int, float] = {}
+
+    class TimedExecutor(KeyedExecutor):
+        """Пул обробки бота, що фіксує, коли повідомлення дочекалося обробки"""
+
+        def submit(self, key: str, fn, *args):
+            update = args[0]
+
+            def timed(*fn_args):
+                started_handling[update.message_id] = time.perf_counter()
+                fn(*fn_args)
+
+            super().submit(key, timed, *args)
+
+    telegram_bot.dispatcher = TimedExecutor(options.workers)
+    telegram_bot.get_rag_service().warm_up(embed=False)
+
+    # Користувачі з логу зберігають свої ID, тож історія діалогу кожного накопичується як у житті
+    user_ids: Dict[str, int] = {}
+    sent_at: Dict[int, float] = {}
+    queue_samples: List[int] = []
+    in_flight = threading.Semaphore(options.concurrency) if options.concurrency else None
+
+    def completed(message_id: int) -> bool:
+        return "done" in api.events.get(message_id, {})
+
+    def sample_queue(stop: threading.Event):
+        while not stop.is_set():
+            queue_samples.append(telegram_bot.dispatcher.stats()["queued_updates"])
+            stop.wait(0.1)
+
+    stop_sampling = threading.Event()
+    sampler = threading.Thread(target=sample_queue, args=(stop_sampling,), daemon=True)
+    sampler.start()
+
+    def release_when_done(message_id: int):
+        while not completed(message_id) and time.perf_counter() - sent_at[message_id] < options.timeout:
+            time.sleep(0.01)
+        in_flight.release()
+
+    previous_timestamp = None
+    replay_started = time.perf_counter()
+    for number, record in enumerate(records, 1):
+        # Інтервали між повідомленнями з логу, стиснуті у speed разів (speed 0 — без пауз);
+        # довгі перерви (ніч, вихідні) обмежуються max_gap
+        if options.speed > 0 and record.get("timestamp"):
+            timestamp = datetime.datetime.fromisoformat(record["timestamp"]).timestamp()
+            if previous_timestamp is not None and timestamp > previous_timestamp:
+                time.sleep(min((timestamp - previous_timestamp) / options.speed, options.max_gap))
+            previous_timestamp = timestamp
+
+        if in_flight is not None:
+            in_flight.acquire()
+        user_key = str(record.get("user_id") or record.get("username") or "anonymous")
+        user_id = user_ids.setdefault(user_key, 1000 + len(user_ids))
+        message_id = number
+        update = telebot.types.Update.de_json(
+            make_update(number, message_id, user_id, record.get("username") or f"user_{user_id}", record["query"])
+        )
+        sent_at[message_id] = time.perf_counter()
+        telegram_bot.bot.process_new_updates([update])
+        if in_flight is not None:
+            threading.Thread(target=release_when_done, args=(message_id,), daemon=True).start()
+
+    # Чекаємо фінальних відповідей на всі повідомлення
+    deadline = time.perf_counter() + options.timeout
+    while time.perf_counter() < deadline and not all(completed(message_id) for message_id in sent_at):
+        time.sleep(0.05)
+    finished = time.perf_counter()
+    stop_sampling.set()
+    api.stop()
+
+    done = [message_id for message_id in sent_at if completed(message_id)]
+    last_done = max((api.events[message_id]["done"] for message_id in done), default=finished)
+    duration = last_done - replay_started
+
+    def delays(event: str, since: Dict[int, float]) -> List[float]:
+        return [
+            api.events[message_id][event] - since[message_id]
+            for message_id in sent_at
+            if event in api.events.get(message_id, {}) and message_id in since
+        ]
+
+    return {
+        "messages": len(sent_at),
+        "completed": len(done),
+        "timed_out": len(sent_at) - len(done),
+        "users": len(user_ids),
+        "duration_seconds": round(duration, 3),
+        "throughput_per_second": round(len(done) / duration, 2) if duration > 0 else None,
+        # Очікування в черзі пулу (зайняті воркери або попереднє повідомлення того ж клієнта)
+        "queue_delay": latency_stats([
+            started_handling[message_id] - sent_at[message_id] for message_id in sent_at if message_id in started_handling
+        ]),
+        "queued_updates": {
+            "max": max(queue_samples, default=0),
+            "mean": round(sum(queue_samples) / len(queue_samples), 2) if queue_samples else 0,
+        },
+        "placeholder": latency_stats(delays("placeholder", sent_at)),
+        "first_token": latency_stats(delays("first_token", sent_at)),
+        "reply": latency_stats(delays("done", sent_at)),
+        "telegram_calls": dict(api.calls),
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Відтворення записаних запитів через обробник бота з фейковими Telegram і LLM")
+    parser.add_argument("--source", default=LOADTEST_SOURCE, help="лог запитів (JSONL або старий JSON-масив)")
+    parser.add_argument("--limit", type=int, default=0, help="скільки запитів відтворити (0 — всі)")
+    parser.add_argument("--repeat", type=int, default=1, help="скільки разів повторити лог (нові користувачі в кожному повторі)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="стиснення інтервалів між повідомленнями (1 — як у житті, 60 — у 60 разів швидше, 0 — без пауз)")
+    parser.add_argument("--max-gap", type=float, default=5.0, help="найбільша пауза між повідомленнями, секунд")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="скільки повідомлень одночасно чекають відповіді (0 — без обмеження, відкрите навантаження)")
+    parser.add_argument("--workers", type=int, default=16, help="потоків обробки бота (BOT_WORKERS)")
+    parser.add_argument("--embed-latency-ms", type=float, default=150.0, help="затримка фейкових ембеддингів")
+    parser.add_argument("--llm-first-token-ms", type=float, default=800.0, help="затримка до першого токена фейкової LLM")
+    parser.add_argument("--llm-token-ms", type=float, default=30.0, help="затримка між токенами фейкової LLM")
+    parser.add_argument("--telegram-latency-ms", type=float, default=50.0, help="затримка фейкового Telegram API")
+    parser.add_argument("--timeout", type=float, default=120.0, help="скільки чекати відповіді на повідомлення, секунд")
+    parser.add_argument("--data", default="data", help="корпус для бази")
+    parser.add_argument("--output", default=None, help="файл результатів (за замовчуванням benchmarks/loadtest_<час>.json)")
+    parser.add_argument("--keep", action="store_true", help="не видаляти тимчасову директорію")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    options = parse_args(argv)
+    records = load_recorded_queries(options.source)
+    if options.limit:
+        records = records[:options.limit]
+    if not records:
+        print(f"У {options.source} немає запитів для відтворення")
+        return
+    replayed = []
+    for repeat in range(options.repeat):
+        # Кожен повтор — окремі клієнти, що приходять після попередніх
+        replayed.extend(
+            dict(record, user_id=f"{record.get('user_id')}:{repeat}" if repeat else record.get("user_id"))
+            for record in records
+        )
+
+    output = os.path.abspath(options.output or os.path.join(
+        LOADTEST_OUTPUT_DIR, f"loadtest_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    ))
+    options.data = os.path.abspath(options.data)
+
+    # База, логи й історія діалогів навантажувального тесту — у тимчасовій директорії
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    original_cwd = os.getcwd()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    try:
+        result = run_load(options, replayed)
+    finally:
+        os.chdir(original_cwd)
+        if not options.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "started_at": datetime.datetime.now().isoformat(),
+        "config": {key: value for key, value in vars(options).items() if key not in ("output", "keep")},
+        "result": result,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(
+        f"Відповідей: {result['completed']}/{result['messages']} за {result['duration_seconds']} с "
+        f"({result['throughput_per_second']} за секунду), користувачів: {result['users']}"
+    )
+    for name in ("queue_delay", "placeholder", "first_token", "reply"):
+        stats = result[name]
+        if stats.get("count"):
+            print(f"  {name}: p50 {stats['p50_ms']} мс, p95 {stats['p95_ms']} мс, p99 {stats['p99_ms']} мс")
+    print(f"Результати збережено у {output}")
+
+
+if __name__ == "__main__":
+    main()
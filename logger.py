@@ -1,22 +1,161 @@
 import os
+import glob
 import json
+import time
 import datetime
-from collections import Counter
-from typing import List, Dict, Any, Optional
+import threading
+from contextlib import contextmanager
+from collections import Counter, deque
+from typing import List, Dict, Any, Optional, Iterator
+
+# Шлях до активного файлу з логами (один JSON-запис на рядок)
+LOG_FILE = "logs/queries.jsonl"
+
+# Старий формат логів (JSON-масив), який один раз переноситься у JSONL
+LEGACY_LOG_FILE = "logs/queries.json"
+
+# Файл блокування для запису з кількох процесів
+LOCK_FILE = "logs/queries.lock"
+
+# Ротація: максимальний розмір активного файлу та щоденна ротація
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_DAILY = os.getenv("LOG_ROTATE_DAILY", "1") == "1"
+
+# Знімок агрегованої статистики (щоб не перечитувати весь лог після перезапуску)
+STATS_SNAPSHOT_FILE = "logs/stats_snapshot.json"
+STATS_SNAPSHOT_EVERY = 50
+
+# Скільки найпопулярніших запитів і останніх записів тримати в пам'яті
+TOP_QUERIES_CAPACITY = 100
+RECENT_QUERIES_CAPACITY = 1000
+
+# Скільки різних запитів з лічильниками тримати (рідкісні витісняються, коли їх стає в півтора раза більше)
+QUERY_COUNTS_CAPACITY = int(os.getenv("QUERY_COUNTS_CAPACITY", "5000"))
+
+_thread_lock = threading.Lock()
+_initialized = False
+
+try:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def _log_lock():
+    """Блокування логу між потоками і процесами"""
+    with _thread_lock:
+        with open(LOCK_FILE, "a+") as lock:
+            _lock_file(lock)
+            try:
+                yield
+            finally:
+                _unlock_file(lock)
 
-# Шлях до файлу з логами
-LOG_FILE = "logs/queries.json"
 
 def ensure_log_directory():
-    """Перевіряє наявність директорії для логів і створює її при необхідності"""
+    """Перевіряє наявність директорії для логів і один раз переносить старий JSON-лог"""
+    global _initialized
+    if _initialized:
+        return
     os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-    if not os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, ensure_ascii=False)
+    migrate_legacy_log()
+    _initialized = True
+
+
+def migrate_legacy_log() -> int:
+    """Переносить записи зі старого logs/queries.json у JSONL-формат
+
+    Записи ставляться перед уже наявними у JSONL, старий файл перейменовується
+    на queries.json.migrated, тож повторний запуск нічого не робить.
+
+    Returns:
+        Кількість перенесених записів
+    """
+    if not os.path.exists(LEGACY_LOG_FILE):
+        return 0
+
+    with _log_lock():
+        if not os.path.exists(LEGACY_LOG_FILE):
+            return 0
+        try:
+            with open(LEGACY_LOG_FILE, "r", encoding="utf-8") as f:
+                legacy_logs = json.load(f)
+        except json.JSONDecodeError:
+            legacy_logs = []
+
+        tmp_path = LOG_FILE + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            for record in legacy_logs:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if os.path.exists(LOG_FILE):
+                with open(LOG_FILE, "r", encoding="utf-8") as current:
+                    for line in current:
+                        out.write(line)
+        os.replace(tmp_path, LOG_FILE)
+        os.replace(LEGACY_LOG_FILE, LEGACY_LOG_FILE + ".migrated")
+
+    print(f"Перенесено {len(legacy_logs)} записів з {LEGACY_LOG_FILE} у {LOG_FILE}")
+    return len(legacy_logs)
+
+
+def _rotate_if_needed():
+    """Архівує активний файл, якщо він завеликий або з попереднього дня (під блокуванням)"""
+    try:
+        stat = os.stat(LOG_FILE)
+    except FileNotFoundError:
+        return
+
+    too_big = stat.st_size >= LOG_MAX_BYTES
+    modified = datetime.datetime.fromtimestamp(stat.st_mtime)
+    stale = LOG_ROTATE_DAILY and stat.st_size > 0 and modified.date() != datetime.date.today()
+    if too_big or stale:
+        suffix = modified.strftime("%Y%m%d-%H%M%S-%f")
+        os.replace(LOG_FILE, LOG_FILE.replace(".jsonl", f".{suffix}.jsonl"))
+
+
+def log_files() -> List[str]:
+    """Повертає файли логів у хронологічному порядку (архіви, потім активний)"""
+    archives = sorted(glob.glob(LOG_FILE.replace(".jsonl", ".*.jsonl")))
+    return archives + ([LOG_FILE] if os.path.exists(LOG_FILE) else [])
+
+
+def iter_logs() -> Iterator[Dict[str, Any]]:
+    """Послідовно повертає всі записи логу, пропускаючи пошкоджені рядки"""
+    ensure_log_directory()
+    for path in log_files():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            # Файл могли заархівувати під час читання
+            continue
+
 
 def log_query(query: str, user_id: Optional[str] = None, username: Optional[str] = None, source: str = "telegram"):
-    """Логує запит користувача у файл JSON
-    
+    """Логує запит користувача, дописуючи один рядок у JSONL-файл
+
     Args:
         query: текст запиту
         user_id: ідентифікатор користувача (опціонально)
@@ -24,91 +163,294 @@ def log_query(query: str, user_id: Optional[str] = None, username: Optional[str]
         source: джерело запиту (telegram, admin_panel, тощо)
     """
     ensure_log_directory()
-    
-    # Читаємо існуючі логи
-    try:
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            logs = json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        logs = []
-    
-    # Додаємо новий запис
-    logs.append({
+
+    line = json.dumps({
         "timestamp": datetime.datetime.now().isoformat(),
         "query": query,
         "user_id": user_id,
         "username": username,
         "source": source
-    })
-    
-    # Зберігаємо оновлені логи
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(logs, f, ensure_ascii=False, indent=2)
+    }, ensure_ascii=False) + "\n"
+
+    # Дописуємо один рядок: час запису не залежить від розміру логу
+    with _log_lock():
+        _rotate_if_needed()
+        with open(LOG_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    # Оновлюємо лічильники статистики одразу після запису
+    get_aggregator()
+
+def _file_key(stat: os.stat_result) -> str:
+    """Ідентифікатор файлу, що не змінюється при перейменуванні (пристрій:inode)"""
+    return f"{stat.st_dev}:{stat.st_ino}"
+
+
+class StatsAggregator:
+    """Інкрементальний агрегатор статистики запитів
+
+    Дочитує з файлів логу лише нові рядки (позиції зберігаються для кожного
+    файлу), оновлює лічильники та зберігає знімок стану на диск, тож
+    статистика не залежить від розміру логу.
+
+    Лічильники зберігаються щонайбільше для QUERY_COUNTS_CAPACITY * 1.5
+    різних запитів: коли їх стає більше, залишаються counts_capacity
+    запитів з найбільшими лічильниками, тож пам'ять і розмір знімка
+    обмежені. Після такого витіснення статистика наближена: витіснений
+    запит, що повторився, рахується заново з 1 (його лічильник і місце в
+    топі занижені), а кількість унікальних запитів стає оцінкою зверху
+    (stats()["unique_queries_approximate"]).
+    """
+
+    SNAPSHOT_VERSION = 2
+
+    def __init__(self, snapshot_file: str = STATS_SNAPSHOT_FILE,
+                 top_capacity: int = TOP_QUERIES_CAPACITY,
+                 recent_capacity: int = RECENT_QUERIES_CAPACITY,
+                 counts_capacity: int = QUERY_COUNTS_CAPACITY):
+        self.snapshot_file = snapshot_file
+        self.top_capacity = top_capacity
+        self.recent_capacity = recent_capacity
+        self.counts_capacity = max(counts_capacity, top_capacity)
+        self._lock = threading.Lock()
+        self._reset()
+        self._load_snapshot()
+        self._unsaved = 0
+        self._last_save = time.time()
+
+    def _reset(self):
+        self.total = 0
+        self.unique_queries = 0
+        # Чи витіснялися лічильники (тоді unique_queries — оцінка зверху)
+        self.pruned = False
+        # запит (у нижньому регістрі) -> [кількість, порядковий номер першої появи]
+        self.query_counts: Dict[str, List[int]] = {}
+        self.user_counts: Counter = Counter()
+        self.source_counts: Counter = Counter()
+        self.top: List[str] = []
+        self.recent: deque = deque(maxlen=self.recent_capacity)
+        # ідентифікатор файлу (пристрій:inode) -> позиція після останнього прочитаного рядка
+        self.offsets: Dict[str, int] = {}
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_file, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot.get("version") != self.SNAPSHOT_VERSION:
+                return
+            self.total = snapshot["total"]
+            self.unique_queries = snapshot["unique_queries"]
+            self.pruned = snapshot.get("pruned", False)
+            self.query_counts = snapshot["query_counts"]
+            self.user_counts = Counter(snapshot["user_counts"])
+            self.source_counts = Counter(snapshot["source_counts"])
+            self.top = snapshot["top"][:self.top_capacity]
+            self.recent = deque(snapshot["recent"], maxlen=self.recent_capacity)
+            self.offsets = snapshot["offsets"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            self._reset()
+
+    def _save_snapshot(self):
+        snapshot = {
+            "version": self.SNAPSHOT_VERSION,
+            "total": self.total,
+            "unique_queries": self.unique_queries,
+            "pruned": self.pruned,
+            "query_counts": self.query_counts,
+            "user_counts": self.user_counts,
+            "source_counts": self.source_counts,
+            "top": self.top,
+            "recent": list(self.recent),
+            "offsets": self.offsets,
+        }
+        tmp_path = f"{self.snapshot_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_file)
+        except OSError as e:
+            print(f"Не вдалося зберегти знімок статистики: {e}")
+        self._unsaved = 0
+        self._last_save = time.time()
+
+    def _top_key(self, query: str):
+        count, order = self.query_counts[query]
+        return -count, order
+
+    def _add(self, record: Dict[str, Any]):
+        query = record.get("query", "").lower()
+        entry = self.query_counts.get(query)
+        if entry is None:
+            entry = self.query_counts[query] = [0, self.unique_queries]
+            self.unique_queries += 1
+        entry[0] += 1
+
+        # Лічильники лише зростають, тож точний топ-K підтримується заміною найслабшого елемента
+        if query in self.top:
+            self.top.sort(key=self._top_key)
+        elif len(self.top) < self.top_capacity:
+            self.top.append(query)
+            self.top.sort(key=self._top_key)
+        elif self._top_key(query) < self._top_key(self.top[-1]):
+            self.top[-1] = query
+            self.top.sort(key=self._top_key)
+
+        self.total += 1
+        if record.get("user_id"):
+            self.user_counts[record["user_id"]] += 1
+        self.source_counts[record.get("source")] += 1
+        self.recent.append(record)
+        self._unsaved += 1
+
+        if len(self.query_counts) > self.counts_capacity * 3 // 2:
+            self._prune_counts()
+
+    def _prune_counts(self):
+        """Залишає лічильники counts_capacity найпопулярніших запитів (топ-K серед них)"""
+        keep = sorted(self.query_counts, key=self._top_key)[:self.counts_capacity]
+        self.query_counts = {query: self.query_counts[query] for query in keep}
+        self.pruned = True
+
+    def _prune_offsets(self):
+        """Забуває позиції файлів логу, яких більше немає (видалені архіви)
+
+        Виконується під блокуванням логу, щоб ротація не перейменувала файл
+        між переліком і перевіркою; інакше inode видаленого файлу, зайнятий
+        новим файлом, продовжив би читання з чужої позиції.
+        """
+        with _log_lock():
+            live = set()
+            for path in log_files():
+                try:
+                    live.add(_file_key(os.stat(path)))
+                except FileNotFoundError:
+                    continue
+        self.offsets = {key: offset for key, offset in self.offsets.items() if key in live}
+
+    def refresh(self):
+        """Дочитує нові записи з усіх файлів логу"""
+        ensure_log_directory()
+        with self._lock:
+            files = log_files()
+            for path in files:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                file_key = _file_key(stat)
+                offset = self.offsets.get(file_key, 0)
+                if stat.st_size <= offset:
+                    continue
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read()
+                # Обробляємо лише завершені рядки — останній може ще дописуватися
+                complete = data[:data.rfind(b"\n") + 1]
+                for line in complete.decode("utf-8", errors="replace").splitlines():
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self._add(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+                self.offsets[file_key] = offset + len(complete)
+
+            if len(self.offsets) > len(files):
+                self._prune_offsets()
+
+            if self._unsaved >= STATS_SNAPSHOT_EVERY or (self._unsaved and time.time() - self._last_save > 30):
+                self._save_snapshot()
+
+    def top_queries(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            if limit <= len(self.top) or len(self.top) == len(self.query_counts):
+                queries = self.top[:limit]
+            else:
+                queries = sorted(self.query_counts, key=self._top_key)[:limit]
+            return [{"query": query, "count": self.query_counts[query][0]} for query in queries]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            if not self.total:
+                return {"total_queries": 0, "unique_queries": 0, "unique_queries_approximate": False, "users": 0}
+            return {
+                "total_queries": self.total,
+                "unique_queries": self.unique_queries,
+                "unique_queries_approximate": self.pruned,
+                "users": len(self.user_counts),
+                "sources": dict(self.source_counts)
+            }
+
+    def user_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.user_counts)
+
+    def recent_queries(self, limit: int) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            if limit > self.recent_capacity and self.total > len(self.recent):
+                return None
+            recent = sorted(self.recent, key=lambda x: x.get("timestamp", ""), reverse=True)
+            return recent[:limit]
+
+
+_aggregator: Optional[StatsAggregator] = None
+_aggregator_lock = threading.Lock()
+
+
+def get_aggregator() -> StatsAggregator:
+    """Повертає спільний для процесу агрегатор статистики з дочитаними записами"""
+    global _aggregator
+    if _aggregator is None:
+        with _aggregator_lock:
+            if _aggregator is None:
+                _aggregator = StatsAggregator()
+    _aggregator.refresh()
+    return _aggregator
 
 def get_top_queries(limit: int = 10) -> List[Dict[str, Any]]:
     """Повертає найпопулярніші запити
-    
+
     Args:
         limit: максимальна кількість запитів для повернення
-        
+
     Returns:
         Список словників {query: str, count: int} з популярними запитами
     """
-    ensure_log_directory()
-    
-    try:
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            logs = json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
-    
-    # Рахуємо кількість запитів
-    queries = [log["query"].lower() for log in logs]
-    counter = Counter(queries)
-    
-    # Повертаємо найпопулярніші
-    return [{"query": query, "count": count} 
-            for query, count in counter.most_common(limit)]
+    return get_aggregator().top_queries(limit)
 
 def get_stats() -> Dict[str, Any]:
     """Повертає базову статистику запитів"""
-    ensure_log_directory()
-    
-    try:
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            logs = json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return {"total_queries": 0, "unique_queries": 0, "users": 0}
-    
-    queries = [log["query"].lower() for log in logs]
-    users = set(log["user_id"] for log in logs if log["user_id"])
-    
-    return {
-        "total_queries": len(logs),
-        "unique_queries": len(set(queries)),
-        "users": len(users),
-        "sources": dict(Counter(log["source"] for log in logs))
-    }
+    return get_aggregator().stats()
+
+def format_unique_queries(stats: Dict[str, Any]) -> str:
+    """Кількість унікальних запитів для показу (з позначкою, якщо це оцінка)"""
+    if stats.get("unique_queries_approximate"):
+        return f"≈{stats['unique_queries']} (оцінка зверху)"
+    return str(stats["unique_queries"])
+
+def get_user_stats() -> Dict[str, int]:
+    """Повертає кількість запитів кожного користувача"""
+    return get_aggregator().user_stats()
 
 def get_recent_queries(limit: int = 100) -> List[Dict[str, Any]]:
     """Повертає останні запити
-    
+
     Args:
         limit: максимальна кількість запитів для повернення
-        
+
     Returns:
         Список словників з інформацією про останні запити
     """
-    ensure_log_directory()
-    
-    try:
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            logs = json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
-    
+    recent = get_aggregator().recent_queries(limit)
+    if recent is not None:
+        return recent
+
+    # Запитано більше, ніж зберігає кільцевий буфер — повне читання логу
+    logs = list(iter_logs())
+
     # Сортуємо за часом (від найновіших до найстаріших)
     logs.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-    
+
     # Повертаємо обмежену кількість
-    return logs[:limit] 
\ No newline at end of file
+    return logs[:limit]
@@ -0,0 +1,299 @@
+import os
+import glob
+import json
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+
+# Файл з вимірами затримок (один запит — один JSON-рядок зі стадіями в мілісекундах)
+METRICS_FILE = "logs/metrics.jsonl"
+
+# Чи записувати виміри
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Розмір файлу, після якого він архівується як logs/metrics.<час>.jsonl
+METRICS_MAX_BYTES = int(os.getenv("METRICS_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# Скільки днів зберігати архіви метрик (старіші видаляються під час архівації)
+METRICS_RETAIN_DAYS = float(os.getenv("METRICS_RETAIN_DAYS", "30"))
+
+# Формат часу архівації в назві архіву
+ARCHIVE_TIME_FORMAT = "%Y%m%d-%H%M%S-%f"
+
+# Перцентилі у зведенні
+METRICS_PERCENTILES = (50, 90, 95, 99)
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+class Trace:
+    """Виміри одного запиту: тривалість кожної стадії обробки
+
+    Стадії з однаковою назвою підсумовуються (наприклад, кілька редагувань
+    повідомлення в Telegram), тож у записі — загальний час стадії в запиті.
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.spans: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._finished = False
+
+    def record(self, stage: str, seconds: float):
+        """Додає тривалість стадії"""
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds * 1000
+
+    @contextmanager
+    def span(self, stage: str):
+        """Вимірює тривалість блоку коду як стадію"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def finish(self, **attributes):
+        """Записує виміри у файл метрик (один раз)"""
+        if self._finished:
+            return
+        self._finished = True
+        self.attributes.update(attributes)
+        write_record({
+            "timestamp": datetime.datetime.now().isoformat(),
+            "trace": self.name,
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 2),
+            "spans": {stage: round(ms, 2) for stage, ms in self.spans.items()},
+            **self.attributes,
+        })
+
+
+def current_trace() -> Optional[Trace]:
+    """Виміри запиту, що обробляється в поточному потоці"""
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Trace]:
+    """Вимірює обробку запиту в поточному потоці
+
+    Стадії, виміряні всередині блоку через span/record (зокрема в
+    RAGService), потрапляють у цей запис.
+
+    Args:
+        name: джерело запитів (telegram, app, query_rag ...)
+        **attributes: додаткові поля запису
+    """
+    current = Trace(name, **attributes)
+    previous = current_trace()
+    _local.trace = current
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        _local.trace = previous
+        current.finish()
+
+
+@contextmanager
+def span(stage: str):
+    """Вимірює стадію поточного запиту; поза trace нічого не робить"""
+    current = current_trace()
+    if current is None:
+        yield
+        return
+    with current.span(stage):
+        yield
+
+
+def record(stage: str, seconds: float):
+    """Додає тривалість стадії до поточного запиту (якщо він вимірюється)"""
+    current = current_trace()
+    if current is not None:
+        current.record(stage, seconds)
+
+
+def annotate(**attributes):
+    """Додає поля до запису поточного запиту (наприклад, яким шляхом отримано відповідь)"""
+    current = current_trace()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def timed_stream(items: Iterable, first_stage: str, total_stage: str) -> Iterator:
+    """Обгортає потік (токени LLM), вимірюючи час до першого елемента і загальний час очікування
+
+    Час, який споживач витрачає між елементами (наприклад, редагування
+    повідомлення в Telegram), у total_stage не входить.
+    """
+    current = current_trace()
+    if current is None:
+        return iter(items)
+
+    def generate():
+        started = time.perf_counter()
+        waited = 0.0
+        first = True
+        iterator = iter(items)
+        while True:
+            before = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                waited += time.perf_counter() - before
+                break
+            waited += time.perf_counter() - before
+            if first:
+                current.record(first_stage, time.perf_counter() - started)
+                first = False
+            yield item
+        current.record(total_stage, waited)
+
+    return generate()
+
+
+def write_record(record: Dict[str, Any]):
+    """Дописує запис у файл метрик (з архівацією завеликого файлу)"""
+    if not METRICS_ENABLED:
+        return
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        os.makedirs(os.path.dirname(METRICS_FILE), exist_ok=True)
+        with _write_lock:
+            try:
+                if os.path.getsize(METRICS_FILE) >= METRICS_MAX_BYTES:
+                    suffix = datetime.datetime.now().strftime(ARCHIVE_TIME_FORMAT)
+                    os.replace(METRICS_FILE, METRICS_FILE.replace(".jsonl", f".{suffix}.jsonl"))
+                    prune_archives()
+            except FileNotFoundError:
+                pass
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"Не вдалося записати метрики: {e}")
+
+
+def record_trace(name: str, spans: Dict[str, float], total_seconds: float, **attributes):
+    """Записує вже виміряні стадії (у секундах) одним записом, наприклад для фонової RAGAS-оцінки"""
+    current = Trace(name, **attributes)
+    current._started = time.perf_counter() - total_seconds
+    for stage, seconds in spans.items():
+        current.record(stage, seconds)
+    current.finish()
+
+
+def archive_time(path: str) -> Optional[datetime.datetime]:
+    """Час архівації з назви архіву (пізніших записів в архіві немає) або None"""
+    suffix = os.path.basename(path)[len(os.path.basename(METRICS_FILE).replace(".jsonl", ".")):-len(".jsonl")]
+    try:
+        return datetime.datetime.strptime(suffix, ARCHIVE_TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def metrics_files(since: Optional[datetime.datetime] = None) -> List[str]:
+    """Файли метрик у хронологічному порядку (архіви, потім активний)
+
+    Args:
+        since: пропустити архіви, заархівовані раніше за цей момент
+    """
+    archives = sorted(glob.glob(METRICS_FILE.replace(".jsonl", ".*.jsonl")))
+    if since is not None:
+        archives = [path for path in archives if (archive_time(path) or since) >= since]
+    return archives + ([METRICS_FILE] if os.path.exists(METRICS_FILE) else [])
+
+
+def prune_archives(retain_days: float = METRICS_RETAIN_DAYS):
+    """Видаляє архіви метрик, старіші за retain_days днів"""
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=retain_days)
+    for path in metrics_files():
+        archived = archive_time(path)
+        if archived is not None and archived < cutoff:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Не вдалося видалити архів метрик {path}: {e}")
+
+
+def load_metrics(since: Optional[datetime.datetime] = None) -> List[Dict[str, Any]]:
+    """Читає записи метрик, пропускаючи пошкоджені рядки
+
+    Args:
+        since: лише записи, новіші за цей момент
+    """
+    since_text = since.isoformat() if since else ""
+    records = []
+    for path in metrics_files(since):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if record.get("timestamp", "") >= since_text:
+                        records.append(record)
+        except FileNotFoundError:
+            continue
+    return records
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Перцентиль методом найближчого рангу"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[min(int(rank), len(sorted_values)) - 1]
+
+
+def summarize(records: List[Dict[str, Any]], group_by: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Перцентилі тривалості кожної стадії, окремо для кожного джерела запитів
+
+    Args:
+        records: записи метрик
+        group_by: поле запису, за яким джерело додатково ділиться на групи
+            (наприклад, "route": "telegram/fast", "telegram/large"); записи без поля — у групі джерела
+
+    Returns:
+        {джерело: {стадія: {"count", "mean", "p50", "p90", "p95", "p99"}}};
+        стадія "total" — повний час обробки запиту, мс
+    """
+    values: Dict[str, Dict[str, List[float]]] = {}
+    for record in records:
+        name = record.get("trace", "")
+        if group_by and record.get(group_by):
+            name = f"{name}/{record[group_by]}"
+        stages = values.setdefault(name, {})
+        stages.setdefault("total", []).append(record.get("total_ms", 0.0))
+        for stage, ms in record.get("spans", {}).items():
+            stages.setdefault(stage, []).append(ms)
+
+    summary: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name, stages in values.items():
+        summary[name] = {}
+        for stage, stage_values in stages.items():
+            stage_values.sort()
+            summary[name][stage] = {
+                "count": len(stage_values),
+                "mean": round(sum(stage_values) / len(stage_values), 1),
+                **{f"p{p}": round(percentile(stage_values, p), 1) for p in METRICS_PERCENTILES},
+            }
+    return summary
+
+
+if __name__ == "__main__":
+    # Зведення за останню добу, окремо для швидкої і великої моделі: python metrics.py
+    day_ago = datetime.datetime.now() - datetime.timedelta(days=1)
+    for name, stages in summarize(load_metrics(since=day_ago), group_by="route").items():
+        print(f"\n{name}")
+        print(f"{'стадія':<22}{'к-сть':>8}{'сер.':>10}" + "".join(f"{'p' + str(p):>10}" for p in METRICS_PERCENTILES))
+        for stage, stats in sorted(stages.items(), key=lambda item: -item[1]["p50"]):
+            print(
+                f"{stage:<22}{stats['count']:>8}{stats['mean']:>10}"
+                + "".join(f"{stats['p' + str(p)]:>10}" for p in METRICS_PERCENTILES)
+            )
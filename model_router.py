@@ -0,0 +1,96 @@
+import os
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+from text_utils import words
+from reranker import query_terms, term_coverage
+
+load_dotenv()
+
+# Чи вибирати модель для кожного запиту (інакше завжди велика модель)
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "1") == "1"
+
+# Швидка дешева модель для простих запитів з упевненим контекстом
+ROUTER_FAST_MODEL = os.getenv("ROUTER_FAST_MODEL", "gpt-4o-mini")
+
+# Велика модель для складних запитів (порожньо — модель, яку задає бот)
+ROUTER_LARGE_MODEL = os.getenv("ROUTER_LARGE_MODEL", "")
+
+# Мінімальна оцінка найкращого чанка (0..1, переранжувальник), з якою запит іде на швидку модель.
+# Для RERANKER=lexical оцінка — 0.5 * косинусна схожість + 0.5 * частка слів запиту в чанку; косинусна
+# схожість ембеддингів OpenAI навіть для непов'язаних текстів близько 0.7, тож без жодного спільного
+# слова оцінка сягає ~0.35–0.45 — пороги мають бути помітно вищими
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.7"))
+
+# Для типових довідкових питань (графік, адреса, запис) достатньо нижчої впевненості
+ROUTER_FAQ_MIN_CONFIDENCE = float(os.getenv("ROUTER_FAQ_MIN_CONFIDENCE", "0.6"))
+
+# Мінімальна частка значущих слів запиту, знайдених у найкращому чанку (незалежно від переранжувальника)
+ROUTER_MIN_TERM_COVERAGE = float(os.getenv("ROUTER_MIN_TERM_COVERAGE", "0.5"))
+
+# Довші запити (у словах) вважаються складними
+ROUTER_MAX_FAST_WORDS = int(os.getenv("ROUTER_MAX_FAST_WORDS", "20"))
+
+# Початки слів довідкових питань
+FAQ_MARKERS = (
+    "графік", "розклад", "годин", "працює", "відчин", "адрес", "знаходит", "телефон", "контакт",
+    "запис", "парков", "оплат", "карт", "вихідн",
+)
+
+# Початки слів, що вказують на питання, яке потребує міркувань або обережності
+COMPLEX_MARKERS = (
+    "чому", "порад", "рекоменд", "краще", "різниц", "порівн", "протипоказ", "алерг", "вагітн", "годуван",
+    "шкір", "чутлив", "подразн", "почервон", "безпечн", "шкідлив", "проблем", "хвороб", "ліки",
+)
+
+
+def classify_intent(query: str) -> str:
+    """Тип запиту за ключовими словами: complex, faq або general"""
+    query_words = words(query)
+    if any(word.startswith(COMPLEX_MARKERS) for word in query_words):
+        return "complex"
+    if any(word.startswith(FAQ_MARKERS) for word in query_words):
+        return "faq"
+    return "general"
+
+
+def route_query(query: str, confidence: Optional[float], context: str, large_model: str,
+                exact: bool = False) -> Dict[str, Any]:
+    """Вибирає чат-модель для запиту
+
+    Запит іде на швидку модель, якщо він короткий, не містить ознак
+    складного питання (порада, протипоказання, стан шкіри), найкращий
+    знайдений чанк містить щонайменше ROUTER_MIN_TERM_COVERAGE слів запиту
+    і його оцінка переранжувальником не нижча за поріг. Для точного
+    збігу BM25 (exact) оцінки немає — достатньо перевірки слів запиту.
+    Без оцінки (RERANKER=none) запит іде на велику модель.
+
+    Args:
+        query: запит клієнта
+        confidence: оцінка найкращого чанка (0..1) або None
+        context: текст найкращого чанка
+        large_model: велика модель бота (якщо не задано ROUTER_LARGE_MODEL)
+        exact: контекст знайдено точним збігом рідкісних термінів (BM25)
+
+    Returns:
+        {"model": назва моделі, "route": "fast" або "large", "reason": причина, "intent": тип запиту}
+    """
+    large_model = ROUTER_LARGE_MODEL or large_model
+    intent = classify_intent(query)
+
+    if not ROUTER_ENABLED:
+        reason = "disabled"
+    elif intent == "complex":
+        reason = "intent"
+    elif len(words(query)) > ROUTER_MAX_FAST_WORDS:
+        reason = "length"
+    elif term_coverage(query_terms(query), context) < ROUTER_MIN_TERM_COVERAGE:
+        reason = "low_coverage"
+    elif exact:
+        return {"model": ROUTER_FAST_MODEL, "route": "fast", "reason": "exact", "intent": intent}
+    elif confidence is None:
+        reason = "no_confidence"
+    elif confidence < (ROUTER_FAQ_MIN_CONFIDENCE if intent == "faq" else ROUTER_MIN_CONFIDENCE):
+        reason = "low_confidence"
+    else:
+        return {"model": ROUTER_FAST_MODEL, "route": "fast", "reason": "confident", "intent": intent}
+    return {"model": large_model, "route": "large", "reason": reason, "intent": intent}
@@ -0,0 +1,171 @@
+import os
+import json
+import glob
+import datetime
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+# Опис індексу: ID, тексти, метадані чанків і назва файлу з матрицею векторів
+NUMPY_INDEX_FILE = "vectors.json"
+
+# Префікс файлів з матрицями (кожна перебудова пише новий файл, старі видаляються)
+NUMPY_MATRIX_PREFIX = "vectors_"
+
+# Скільки векторів читається з Chroma за один запит при експорті
+EXPORT_PAGE_SIZE = 1000
+
+
+class NumpyVectorStore:
+    """Векторне сховище в пам'яті: усі ембеддинги в одній матриці float32
+
+    Матриця відкривається через memory-map, тож старт майже миттєвий, а
+    пошук — точний top-k одним множенням матриці на вектор запиту (косинусна
+    схожість нормалізованих векторів). Для невеликих корпусів це швидше за
+    HNSW і дає детерміновані результати.
+    """
+
+    def __init__(self, matrix: np.ndarray, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]],
+                 embedding_function: Optional[Embeddings] = None):
+        self.matrix = matrix
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.embeddings = embedding_function
+        self._positions: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def load(cls, persist_directory: str, embedding_function: Optional[Embeddings] = None) -> "NumpyVectorStore":
+        """Відкриває індекс з диска
+
+        Raises:
+            RuntimeError: якщо індексу немає (база зібрана до появи NumPy-сховища) —
+                порожнє сховище мовчки повертало б запитам нульовий контекст
+        """
+        for attempt in range(2):
+            try:
+                with open(os.path.join(persist_directory, NUMPY_INDEX_FILE), "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except FileNotFoundError:
+                raise RuntimeError(
+                    f"NumPy-індекс векторної бази не знайдено ({os.path.join(persist_directory, NUMPY_INDEX_FILE)}). "
+                    "Перебудуйте базу: python build_vectorstore.py"
+                )
+            try:
+                matrix = np.load(os.path.join(persist_directory, index["matrix_file"]), mmap_mode="r")
+            except FileNotFoundError:
+                # Опис прочитано перед самою заміною індексу — перечитуємо новий
+                if attempt:
+                    raise
+                continue
+            return cls(matrix, index["ids"], index["texts"], index["metadatas"], embedding_function)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get_vectors(self, ids: List[str]) -> List[Optional[np.ndarray]]:
+        """Збережені (нормалізовані) вектори чанків за ID; None для ID, яких немає в індексі"""
+        if self._positions is None:
+            self._positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        positions = [self._positions.get(doc_id) for doc_id in ids]
+        return [None if i is None else np.asarray(self.matrix[i]) for i in positions]
+
+    def _mask(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Булева маска чанків, метадані яких збігаються з усіма полями фільтра"""
+        if not filter:
+            return None
+        return np.array([
+            all(metadata.get(key) == value for key, value in filter.items())
+            for metadata in self.metadatas
+        ], dtype=bool)
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 3,
+                                               filter: Optional[Dict[str, Any]] = None
+                                               ) -> List[Tuple[Document, float]]:
+        """Точний top-k за косинусною схожістю
+
+        Args:
+            embedding: ембеддинг запиту
+            k: кількість результатів
+            filter: точний збіг полів метаданих, наприклад {"chunk_type": "faq"}
+        """
+        if not self.ids:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.matrix @ query
+
+        mask = self._mask(filter)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        k = min(k, len(self.ids))
+        if k <= 0:
+            return []
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        # Стабільне сортування: при однакових оцінках порядок визначає позиція в індексі
+        top = top[np.lexsort((top, -scores[top]))]
+        return [
+            (Document(page_content=self.texts[i], metadata=dict(self.metadatas[i])), float(scores[i]))
+            for i in top
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 3,
+                                    filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search(self, query: str, k: int = 3, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k, filter)
+
+
+def export_from_chroma(vectorstore, persist_directory: str) -> int:
+    """Вивантажує вектори з Chroma у NumPy-індекс
+
+    Вектори пишуться сторінками напряму у файл .npy (пам'ять не залежить від
+    розміру бази). Опис індексу замінюється атомарно, тож процеси, що читають
+    базу, бачать або старий, або новий індекс повністю.
+
+    Returns:
+        Кількість векторів в індексі
+    """
+    count = vectorstore._collection.count()
+    version = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    matrix_file = f"{NUMPY_MATRIX_PREFIX}{version}.npy"
+    matrix_path = os.path.join(persist_directory, matrix_file)
+
+    ids, texts, metadatas = [], [], []
+    matrix = None
+    for offset in range(0, count, EXPORT_PAGE_SIZE):
+        page = vectorstore.get(include=["embeddings", "documents", "metadatas"], limit=EXPORT_PAGE_SIZE, offset=offset)
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(matrix_path, mode="w+", dtype=np.float32, shape=(count, vectors.shape[1]))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        matrix[offset:offset + len(vectors)] = vectors / np.where(norms == 0, 1, norms)
+        ids.extend(page["ids"])
+        texts.extend(page["documents"])
+        metadatas.extend(metadata or {} for metadata in page["metadatas"])
+    if matrix is None:
+        np.save(matrix_path, np.zeros((0, 0), dtype=np.float32))
+    else:
+        matrix.flush()
+        del matrix
+
+    index_path = os.path.join(persist_directory, NUMPY_INDEX_FILE)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"matrix_file": matrix_file, "ids": ids, "texts": texts, "metadatas": metadatas}, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+
+    # Старі матриці більше не потрібні; у Windows файл, відкритий іншим процесом, видалиться наступного разу
+    for old_path in glob.glob(os.path.join(persist_directory, f"{NUMPY_MATRIX_PREFIX}*.npy")):
+        if os.path.basename(old_path) != matrix_file:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+    return len(ids)
@@ -0,0 +1,257 @@
+import os
+import re
+import json
+import threading
+from typing import List, Dict, Any, Optional
+from index_versions import DB_DIR, index_dir
+from text_utils import STOP_WORDS, words, stem, tokenize, tokens_match
+
+# Файл індексу цін (поруч із векторною базою), створюється build_vector_store
+PRICE_INDEX_FILE = "price_index.json"
+
+# Чи відповідати на питання про ціни напряму з індексу, без пошуку та GPT
+PRICE_FAST_PATH_ENABLED = os.getenv("PRICE_FAST_PATH_ENABLED", "1") == "1"
+
+# Максимальна кількість позицій у відповіді; якщо збігів більше — запит іде через RAG
+PRICE_ANSWER_MAX_ITEMS = int(os.getenv("PRICE_ANSWER_MAX_ITEMS", "10"))
+
+# Ознаки питання про ціну
+PRICE_QUESTION = re.compile(r"(скільки\s+(?:кошту|варту|буде)|цін|вартіст|кошту|почому|почім|прайс)", re.IGNORECASE)
+
+# Префікс резервних копій прайс-листа (data/backup_<час>.pdf), які не є чинним прайсом
+BACKUP_PREFIX = "backup_"
+
+# Тривалість у назві послуги: "1 хвилина", "1 година/1 людина"
+DURATION = re.compile(r"\d+\s*(?:хв|хвилин|годин)\w*", re.IGNORECASE)
+
+# Слова, що не описують послугу
+PRICE_STOP_WORDS = STOP_WORDS | {
+    "скільки", "коштує", "коштуватиме", "коштують", "вартує", "вартість", "вартості", "буде", "ціна", "ціни",
+    "ціну", "ціною", "цін", "ціні", "прайс", "почому", "почім", "дізнатися", "послуга", "послуги", "послугу",
+    "процедура", "процедури", "процедуру", "салоні", "салон", "грн", "гривень",
+}
+
+
+def is_price_question(query: str) -> bool:
+    """Чи питає клієнт про ціну"""
+    return bool(PRICE_QUESTION.search(query))
+
+
+def service_terms(query: str) -> List[str]:
+    """Слова запиту, що описують послугу"""
+    return [
+        stem(word) for word in words(query)
+        if word not in PRICE_STOP_WORDS and not PRICE_QUESTION.match(word) and len(word) > 2
+    ]
+
+
+def is_backup_source(source: str) -> bool:
+    """Чи є файл резервною копією старого прайс-листа"""
+    return os.path.basename(source).startswith(BACKUP_PREFIX)
+
+
+def make_entry(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Позиція індексу з метаданих чанка прайс-листа (див. chunkers.price_list_chunker)"""
+    duration = DURATION.search(metadata["service"])
+    return {
+        "service": metadata["service"],
+        "price": metadata["price"],
+        "duration": duration.group(0) if duration else None,
+        "category": metadata.get("category", ""),
+        "source": metadata.get("source", ""),
+    }
+
+
+def note_text(text: str) -> str:
+    """Текст примітки розділу прайсу з чанка price_note (без рядка з назвою розділу)"""
+    return text.partition("\n")[2].strip()
+
+
+def _load_index(persist_directory: str, key: str) -> Dict[str, Any]:
+    """Розділ файлу індексу цін, згрупований за файлом-джерелом
+
+    Резервні копії пропускаються (також в індексах, зібраних до їх
+    виключення): інакше після оновлення прайсу відповідь містила б
+    стару і нову ціну поруч.
+    """
+    try:
+        with open(os.path.join(persist_directory, PRICE_INDEX_FILE), "r", encoding="utf-8") as f:
+            sources = json.load(f).get(key, {})
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        return {}
+    return {source: value for source, value in sources.items() if not is_backup_source(source)}
+
+
+def load_price_entries(persist_directory: str = DB_DIR) -> Dict[str, List[Dict[str, Any]]]:
+    """Завантажує позиції індексу, згруповані за файлом-джерелом"""
+    return _load_index(persist_directory, "sources")
+
+
+def load_price_notes(persist_directory: str = DB_DIR) -> Dict[str, Dict[str, List[str]]]:
+    """Завантажує примітки розділів прайсу: файл-джерело -> розділ -> тексти приміток"""
+    return _load_index(persist_directory, "notes")
+
+
+def save_price_index(sources: Dict[str, List[Dict[str, Any]]], persist_directory: str = DB_DIR,
+                     notes: Optional[Dict[str, Dict[str, List[str]]]] = None):
+    """Атомарно зберігає індекс цін
+
+    Args:
+        sources: файл-джерело -> позиції прайсу (make_entry)
+        persist_directory: директорія версії індексу
+        notes: файл-джерело -> розділ -> тексти приміток розділу (note_text)
+    """
+    os.makedirs(persist_directory, exist_ok=True)
+    index_path = os.path.join(persist_directory, PRICE_INDEX_FILE)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"sources": sources, "notes": notes or {}}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, index_path)
+
+
+def _price_text(price: str) -> str:
+    return price if "грн" in price.lower() else f"{price} грн"
+
+
+def format_entry(entry: Dict[str, Any]) -> str:
+    """Рядок прайсу для відповіді та контексту"""
+    return f"{entry['service']} — {_price_text(entry['price'])}"
+
+
+class PriceIndex:
+    """Індекс цін для точних відповідей на питання про вартість послуг
+
+    Збудований з прайс-листів під час індексації; перечитується з диска,
+    коли після перебудови бази активується нова версія індексу.
+    """
+
+    def __init__(self, persist_directory: str = DB_DIR):
+        self.persist_directory = persist_directory
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._entries: List[Dict[str, Any]] = []
+        self._notes: Dict[str, List[str]] = {}
+        self.hits = 0
+        self.fallbacks = 0
+
+    def _refresh(self):
+        try:
+            path = index_dir(self.persist_directory)
+        except RuntimeError:
+            # Активна версія недоступна — залишаємо останні завантажені ціни
+            return
+        try:
+            mtime = (path, os.stat(os.path.join(path, PRICE_INDEX_FILE)).st_mtime_ns)
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            entries, seen = [], set()
+            # Однакові позиції з кількох прайсів показуємо один раз
+            for source_entries in load_price_entries(path).values():
+                for entry in source_entries:
+                    key = (entry["category"], entry["service"], entry["price"])
+                    if key not in seen:
+                        seen.add(key)
+                        entries.append(dict(
+                            entry,
+                            tokens=tokenize(entry["service"]),
+                            section_tokens=tokenize(entry["category"].split(" / ")[-1]),
+                        ))
+            notes: Dict[str, List[str]] = {}
+            for source_notes in load_price_notes(path).values():
+                for category, texts in source_notes.items():
+                    category_notes = notes.setdefault(category, [])
+                    category_notes.extend(text for text in texts if text not in category_notes)
+            self._entries = entries
+            self._notes = notes
+            self._mtime = mtime
+
+    def find(self, query: str) -> List[Dict[str, Any]]:
+        """Позиції, що відповідають усім словам запиту
+
+        Спершу шукаються послуги, назва яких починається зі слова запиту
+        ("Манікюр комбінований" для "манікюр", але не "Парафінотерапія (..., масаж)").
+        Якщо таких немає — позиції розділу прайсу, названого словом запиту ("сауна").
+        """
+        self._refresh()
+        terms = service_terms(query)
+        if not terms:
+            return []
+
+        def covers(tokens: List[str]) -> bool:
+            return all(any(tokens_match(term, token) for token in tokens) for term in terms)
+
+        def mentions(tokens: List[str]) -> bool:
+            return any(tokens_match(term, token) for term in terms for token in tokens)
+
+        entries = self._entries
+        by_service = [
+            entry for entry in entries
+            if entry["tokens"] and mentions(entry["tokens"][:1]) and covers(entry["tokens"])
+        ]
+        if by_service:
+            return by_service
+        return [
+            entry for entry in entries
+            if mentions(entry["section_tokens"]) and covers(entry["tokens"] + entry["section_tokens"])
+        ]
+
+    def answer(self, query: str) -> Optional[Dict[str, Any]]:
+        """Відповідь на питання про ціну напряму з індексу
+
+        Returns:
+            {"answer": текст, "contexts": [рядки прайсу], "entries": [...]} або None,
+            якщо питання не про ціну чи послугу не розпізнано (тоді — звичайний RAG)
+        """
+        if not PRICE_FAST_PATH_ENABLED or not is_price_question(query):
+            return None
+        entries = self.find(query)
+        if not entries or len(entries) > PRICE_ANSWER_MAX_ITEMS:
+            with self._lock:
+                self.fallbacks += 1
+            return None
+
+        # Групуємо позиції за розділами прайсу, зберігаючи порядок
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in entries:
+            grouped.setdefault(entry["category"], []).append(entry)
+
+        lines = ["Ціни за прайсом салону «ESTHEIQUE»:"]
+        contexts = []
+        for category, category_entries in grouped.items():
+            # Примітки розділу з прайсу ("Кінцеву ціну визначає майстер...", що входить у вартість)
+            notes = self._notes.get(category, [])
+            lines.append(f"\n{category}:" if category else "")
+            for entry in category_entries:
+                lines.append(f"• {format_entry(entry)}")
+            lines.extend(notes)
+            contexts.append("\n".join([category] + [format_entry(entry) for entry in category_entries] + notes))
+
+        with self._lock:
+            self.hits += 1
+        public_entries = [{k: v for k, v in entry.items() if not k.endswith("tokens")} for entry in entries]
+        return {"answer": "\n".join(lines), "contexts": contexts, "entries": public_entries}
+
+    def stats(self) -> Dict[str, int]:
+        """Кількість позицій та відповідей з індексу"""
+        self._refresh()
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "fallbacks": self.fallbacks}
+
+
+_price_index: Optional[PriceIndex] = None
+_price_index_lock = threading.Lock()
+
+
+def get_price_index() -> PriceIndex:
+    """Повертає спільний для процесу індекс цін"""
+    global _price_index
+    if _price_index is None:
+        with _price_index_lock:
+            if _price_index is None:
+                _price_index = PriceIndex()
+    return _price_index
@@ -0,0 +1,138 @@
+import os
+from typing import List, Dict, Any, Optional
+from langchain.schema import HumanMessage, SystemMessage, BaseMessage
+from token_counter import count_tokens, truncate_to_tokens, TOKENIZER_MODEL
+
+# Максимальна кількість вхідних токенів промпту (системне повідомлення, історія, запит)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2500"))
+
+# Скільки токенів контексту гарантується: заради них відкидаються найстаріші повідомлення історії
+PROMPT_MIN_CONTEXT_TOKENS = int(os.getenv("PROMPT_MIN_CONTEXT_TOKENS", "600"))
+
+# Чанк, для якого лишилося менше токенів, не обрізається, а відкидається
+PROMPT_MIN_CHUNK_TOKENS = int(os.getenv("PROMPT_MIN_CHUNK_TOKENS", "40"))
+
+# Мінімальна довжина спільного фрагмента, який вважається перекриттям сусідніх чанків (символів)
+PROMPT_MIN_OVERLAP_CHARS = 20
+
+# Службові токени на кожне повідомлення чату (роль, розмітка)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Роздільник чанків у контексті
+CONTEXT_SEPARATOR = "\n---\n"
+
+
+def _overlap(left: str, right: str) -> int:
+    """Довжина найдовшого кінця left, з якого починається right"""
+    for size in range(min(len(left), len(right)), PROMPT_MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def dedupe_chunks(texts: List[str]) -> List[str]:
+    """Прибирає повтори з контексту, зберігаючи порядок релевантності
+
+    Сусідні чанки одного документа повторюють спільний фрагмент
+    (chunk_overlap розбивача): у менш релевантного чанка він вирізається.
+    Чанки, що повністю містяться в уже взятих, відкидаються.
+    """
+    kept: List[str] = []
+    for text in texts:
+        text = text.strip()
+        for previous in kept:
+            if text in previous:
+                text = ""
+                break
+            # Початок чанка повторює кінець уже взятого або навпаки
+            text = text[_overlap(previous, text):]
+            cut = _overlap(text, previous)
+            if cut:
+                text = text[:-cut]
+            text = text.strip()
+        if text:
+            kept.append(text)
+    return kept
+
+
+def compress_chunk(text: str, max_tokens: int, model_name: str = TOKENIZER_MODEL) -> str:
+    """Скорочує чанк до max_tokens, обрізаючи по межі речення або рядка, якщо вона є"""
+    if count_tokens(text, model_name) <= max_tokens:
+        return text
+    # Один токен лишається на позначку скорочення
+    truncated = truncate_to_tokens(text, max(max_tokens - 1, 1), model_name)
+    boundary = max(truncated.rfind(mark) for mark in (". ", "\n", "! ", "? "))
+    if boundary > len(truncated) // 2:
+        truncated = truncated[:boundary + 1]
+    return truncated.rstrip() + " …"
+
+
+def message_tokens(message: BaseMessage, model_name: str = TOKENIZER_MODEL) -> int:
+    return count_tokens(message.content, model_name) + MESSAGE_OVERHEAD_TOKENS
+
+
+def build_prompt(system_template: str, contexts: List[str], query: str,
+                 history: Optional[List[BaseMessage]] = None,
+                 budget: int = PROMPT_TOKEN_BUDGET, model_name: str = TOKENIZER_MODEL) -> Dict[str, Any]:
+    """Складає повідомлення для чат-моделі в межах бюджету вхідних токенів
+
+    Контекст очищується від повторів, далі чанки додаються в порядку
+    релевантності, доки вистачає бюджету; чанк, що не вміщується повністю,
+    скорочується, решта відкидається. Якщо історія діалогу не лишає
+    PROMPT_MIN_CONTEXT_TOKENS для контексту, відкидаються найстаріші її
+    повідомлення (стислий підсумок історії зберігається до останнього).
+
+    Args:
+        system_template: системний промпт з місцем для контексту "{context}"
+        contexts: тексти чанків від найрелевантнішого
+        query: запит клієнта
+        history: попередні повідомлення діалогу
+        budget: максимальна кількість вхідних токенів
+        model_name: модель, за токенізатором якої рахується бюджет
+
+    Returns:
+        {"messages": повідомлення для моделі, "contexts": чанки, що потрапили в промпт,
+         "tokens": вхідних токенів, "dropped_chunks": кількість, "dropped_history": кількість}
+    """
+    history = list(history or [])
+    query_message = HumanMessage(content=query)
+    fixed = (
+        count_tokens(system_template.replace("{context}", ""), model_name)
+        + MESSAGE_OVERHEAD_TOKENS
+        + message_tokens(query_message, model_name)
+    )
+
+    history_costs = [message_tokens(message, model_name) for message in history]
+    dropped_history = 0
+    # Спершу відкидаються найстаріші звичайні повідомлення, підсумок (SystemMessage) — останнім
+    while history and fixed + sum(history_costs) > budget - PROMPT_MIN_CONTEXT_TOKENS:
+        index = next((i for i, message in enumerate(history) if not isinstance(message, SystemMessage)), 0)
+        history.pop(index)
+        history_costs.pop(index)
+        dropped_history += 1
+
+    available = budget - fixed - sum(history_costs)
+    chunks = dedupe_chunks(contexts)
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR, model_name)
+    selected: List[str] = []
+    for text in chunks:
+        cost = count_tokens(text, model_name) + (separator_tokens if selected else 0)
+        if cost <= available:
+            selected.append(text)
+            available -= cost
+            continue
+        room = available - (separator_tokens if selected else 0)
+        # Найрелевантніший чанк потрапляє в промпт завжди, хоча б скороченим
+        if room >= PROMPT_MIN_CHUNK_TOKENS or not selected:
+            selected.append(compress_chunk(text, max(room, PROMPT_MIN_CHUNK_TOKENS), model_name))
+        break
+
+    system_message = SystemMessage(content=system_template.replace("{context}", CONTEXT_SEPARATOR.join(selected)))
+    messages = [system_message] + history + [query_message]
+    return {
+        "messages": messages,
+        "contexts": selected,
+        "tokens": sum(message_tokens(message, model_name) for message in messages),
+        "dropped_chunks": len(contexts) - len(selected),
+        "dropped_history": dropped_history,
+    }
@@ -1,39 +1,109 @@
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
 from dotenv import load_dotenv
 import os
+import time
+from typing import Iterator, List, Tuple
 from logger import log_query
+from rag_service import get_rag_service
+from answer_cache import SemanticAnswerCache
+from price_index import get_price_index
+from prompt_builder import build_prompt
+from model_router import route_query
+import metrics
 
 load_dotenv()
 
-def query_bot(user_query: str):
-    db = Chroma(persist_directory="db", embedding_function=OpenAIEmbeddings())
-    results = db.similarity_search(user_query, k=3)
-    context = "\n---\n".join([doc.page_content for doc in results])
-    retrieved_contexts = [doc.page_content for doc in results]
+# Кеш відповідей на схожі запити (скидається після перебудови бази)
+answer_cache = SemanticAnswerCache("query_rag")
 
-    system_prompt = f"""
+def query_bot_stream(user_query: str, use_cache: bool = True) -> Tuple[Iterator[str], List[str]]:
+    """Повертає генератор фрагментів відповіді (по мірі генерації) та контекст
+
+    Args:
+        user_query: запит клієнта
+        use_cache: чи використовувати кеш відповідей (дослідження і бенчмарки вимикають його,
+            щоб оцінювати й вимірювати справжню генерацію)
+    """
+    started = time.time()
+
+    # Питання про ціну відомої послуги — точна відповідь з індексу цін
+    with metrics.span("price_lookup"):
+        priced = get_price_index().answer(user_query)
+    if priced:
+        metrics.annotate(path="price")
+        return iter([priced["answer"]]), priced["contexts"]
+
+    service = get_rag_service()
+    service.get_vectorstore()  # перевідкриває базу, якщо її перебудували
+
+    # Запит з точною назвою процедури знаходиться BM25 без обчислення ембеддингу
+    query_vector = None
+    with metrics.span("exact_match"):
+        results = service.exact_match_search(user_query, k=3)
+    if results is None:
+        with metrics.span("embed_query"):
+            query_vector = service.embeddings.embed_query(user_query)
+
+        cached = None
+        if use_cache:
+            with metrics.span("answer_cache"):
+                cached = answer_cache.lookup(query_vector, service.index_version)
+        if cached:
+            metrics.annotate(path="cache")
+            return iter([cached["answer"]]), cached["contexts"]
+
+        results, confidence = service.retrieve_scored(user_query, k=3, query_vector=query_vector)
+        metrics.annotate(path="hybrid")
+    else:
+        # Точний збіг BM25 не оцінюється переранжувальником (для цього потрібен ембеддинг запиту)
+        confidence = None
+        metrics.annotate(path="exact")
+    prompt_started = time.perf_counter()
+    system_template = """
 Ти — ввічливий асистент салону краси. Використовуй лише контекст нижче для відповіді на запит.
 
 Контекст:
 {context}
 """
 
-    chat = ChatOpenAI(temperature=0.3, model_name="gpt-4o")
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=user_query)
-    ]
-    response = chat.invoke(messages)
-    return response.content, retrieved_contexts
+    # Прості запити з релевантним контекстом — швидкій моделі, складні — великій
+    route = route_query(user_query, confidence, results[0].page_content if results else "",
+                        large_model="gpt-4o", exact=query_vector is None)
+    metrics.annotate(model=route["model"], route=route["route"], route_reason=route["reason"],
+                     intent=route["intent"], confidence=None if confidence is None else round(confidence, 3))
+    chat = service.get_chat(route["model"], 0.3)
+    prompt = build_prompt(system_template, [doc.page_content for doc in results], user_query, model_name=route["model"])
+    messages = prompt["messages"]
+    retrieved_contexts = prompt["contexts"]
+    metrics.record("prompt", time.perf_counter() - prompt_started)
+    metrics.annotate(context_chunks=len(retrieved_contexts), prompt_tokens=prompt["tokens"],
+                     dropped_chunks=prompt["dropped_chunks"])
+
+    def generate():
+        parts = []
+        for chunk in metrics.timed_stream(chat.stream(messages), "llm_first_token", "llm_total"):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+        if use_cache and query_vector is not None:
+            answer_cache.store(user_query, query_vector, "".join(parts), retrieved_contexts,
+                               time.time() - started, service.index_version)
+
+    return generate(), retrieved_contexts
+
+def query_bot(user_query: str, use_cache: bool = True):
+    with metrics.trace("query_rag"):
+        tokens, retrieved_contexts = query_bot_stream(user_query, use_cache=use_cache)
+        return "".join(tokens), retrieved_contexts
 
 if __name__ == "__main__":
+    get_rag_service().warm_up()
     while True:
         query = input("Клієнт: ")
         if query.lower() in ["вихід", "exit"]:
             break
         log_query(query, source="query_direct")
-        answer, contexts = query_bot(query)
-        print("Бот:", answer)
+        tokens, contexts = query_bot_stream(query)
+        print("Бот: ", end="", flush=True)
+        for token in tokens:
+            print(token, end="", flush=True)
+        print()
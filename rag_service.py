@@ -0,0 +1,304 @@
+import os
+import threading
+import httpx
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from dotenv import load_dotenv
+from langchain_community.vectorstores import Chroma
+from langchain_openai import ChatOpenAI
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from embedding_cache import get_embeddings
+from embedding_backends import embedding_model_tag
+from lexical_index import LexicalIndex, reciprocal_rank_fusion, index_terms
+from numpy_vectorstore import NumpyVectorStore
+from index_versions import DB_DIR, read_index_version, read_index_embedding_model, index_dir, chunk_hash, vector_id
+from reranker import RERANK_CANDIDATES, create_reranker, apply_cutoff
+import metrics
+
+load_dotenv()
+
+# Векторне сховище для пошуку: "chroma" (HNSW на диску) або "numpy" (точний пошук у матриці в пам'яті)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma").lower()
+
+# Налаштування пулу HTTP-з'єднань до OpenAI
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "10"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+
+# Скільки кандидатів бере кожен з пошуків (векторний і BM25) перед злиттям RRF
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+
+# Константа k у формулі reciprocal rank fusion
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Запит з рідкісними термінами (назва процедури, бренд) обслуговується лише BM25, без ембеддингу;
+# рідкісний — той, що зустрічається не більше ніж у цій частці чанків
+LEXICAL_EXACT_MAX_DF = float(os.getenv("LEXICAL_EXACT_MAX_DF", "0.05"))
+LEXICAL_SKIP_EMBEDDING = os.getenv("LEXICAL_SKIP_EMBEDDING", "1") == "1"
+
+
+class RAGService:
+    """Довгоживучий сервіс пошуку та генерації відповідей
+
+    Створюється один раз на процес і тримає відкриту векторну базу, клієнт
+    ембеддингів та чат-моделі зі спільним пулом HTTP-з'єднань. Після перебудови
+    бази (перемикання вказівника db/CURRENT на нову версію) сховище
+    автоматично перевідкривається.
+    """
+
+    def __init__(self, persist_directory: str = DB_DIR, embeddings: Optional[Embeddings] = None,
+                 chat_factory: Optional[Callable[[str, float], Any]] = None):
+        """
+        Args:
+            persist_directory: коренева директорія векторної бази
+            embeddings: модель ембеддингів замість налаштованої (наприклад, фейкова в бенчмарку)
+            chat_factory: функція (модель, температура) -> чат-модель замість ChatOpenAI
+        """
+        self.persist_directory = persist_directory
+        self._lock = threading.RLock()
+        self._http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            ),
+            timeout=OPENAI_TIMEOUT,
+        )
+        self._embeddings = embeddings
+        self._chat_factory = chat_factory
+        self._vectorstore = None
+        self._lexical_index = LexicalIndex()
+        self._index_version = None
+        self._failed_version = None
+        self._reranker = None
+        self._reranker_created = False
+        self._chats: Dict[Tuple[str, float], ChatOpenAI] = {}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Спільний клієнт ембеддингів з постійним кешем"""
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = get_embeddings(http_client=self._http_client)
+        return self._embeddings
+
+    @property
+    def reranker(self):
+        """Переранжувальник знайдених чанків (None, якщо RERANKER=none)"""
+        if not self._reranker_created:
+            with self._lock:
+                if not self._reranker_created:
+                    self._reranker = create_reranker(self.embeddings, vector_lookup=self.stored_vectors)
+                    self._reranker_created = True
+        return self._reranker
+
+    def get_chat(self, model_name: str, temperature: float) -> ChatOpenAI:
+        """Повертає закешований клієнт чат-моделі для пари (модель, температура)"""
+        key = (model_name, temperature)
+        chat = self._chats.get(key)
+        if chat is None:
+            with self._lock:
+                chat = self._chats.get(key)
+                if chat is None:
+                    if self._chat_factory is not None:
+                        chat = self._chat_factory(model_name, temperature)
+                    else:
+                        chat = ChatOpenAI(
+                            model_name=model_name,
+                            temperature=temperature,
+                            http_client=self._http_client,
+                        )
+                    self._chats[key] = chat
+        return chat
+
+    def get_vectorstore(self) -> Union[Chroma, NumpyVectorStore]:
+        """Повертає відкрите векторне сховище, перевідкриваючи його після перебудови"""
+        version = read_index_version(self.persist_directory)
+        if self._vectorstore is None or version != self._index_version:
+            with self._lock:
+                if self._vectorstore is None or version != self._index_version:
+                    try:
+                        with metrics.span("index_open"):
+                            self._open_vectorstore(version)
+                    except RuntimeError as e:
+                        # Нову версію неможливо відкрити — працюємо з останньою робочою
+                        if self._vectorstore is None:
+                            raise
+                        if version != self._failed_version:
+                            print(f"Не вдалося відкрити версію бази {version}, працюємо з {self._index_version}: {e}")
+                            self._failed_version = version
+        return self._vectorstore
+
+    def _open_vectorstore(self, version: Optional[str]):
+        path = index_dir(self.persist_directory, version)
+        # Вектори запиту і бази мають бути з однієї моделі — інакше пошук повертає випадкові чанки
+        index_model = read_index_embedding_model(path)
+        if index_model is not None and index_model != embedding_model_tag():
+            raise RuntimeError(
+                f"Векторну базу зібрано моделлю ембеддингів {index_model}, а налаштовано {embedding_model_tag()}. "
+                "Перебудуйте базу: python build_vectorstore.py"
+            )
+        if VECTOR_STORE_BACKEND == "numpy":
+            vectorstore = NumpyVectorStore.load(path, embedding_function=self.embeddings)
+        else:
+            vectorstore = Chroma(persist_directory=path, embedding_function=self.embeddings)
+        lexical_index = LexicalIndex.load(path)
+        # Підміна посилань атомарна: запити, що вже виконуються, дочитують старі екземпляри
+        self._vectorstore = vectorstore
+        self._lexical_index = lexical_index
+        self._index_version = version
+
+    def reload(self):
+        """Примусово перевідкриває векторне сховище (hot-swap після перебудови)"""
+        with self._lock:
+            self._open_vectorstore(read_index_version(self.persist_directory))
+
+    @property
+    def index_version(self) -> Optional[str]:
+        """Версія індексу, з якою зараз працює сервіс"""
+        return self._index_version
+
+    def similarity_search(self, query: str, k: int = 3, filter: Optional[Dict[str, Any]] = None) -> List:
+        """Пошук найближчих документів у векторній базі
+
+        Args:
+            filter: точний збіг полів метаданих чанків, наприклад {"chunk_type": "price"}
+        """
+        return self.get_vectorstore().similarity_search(query, k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 3,
+                                    filter: Optional[Dict[str, Any]] = None) -> List:
+        """Пошук за вже обчисленим ембеддингом запиту"""
+        return self.get_vectorstore().similarity_search_by_vector(embedding, k=k, filter=filter)
+
+    def stored_vectors(self, docs: List[Document]) -> List[Optional[List[float]]]:
+        """Ембеддинги чанків, збережені в активній версії бази
+
+        Чанки шукаються за стабільним ID (джерело + хеш тексту), тож вектори
+        не перераховуються моделлю ембеддингів.
+
+        Returns:
+            Вектори в порядку docs; None для чанків, яких немає в базі
+        """
+        vectorstore = self.get_vectorstore()
+        ids = [vector_id(doc.metadata.get("source", ""), chunk_hash(doc.page_content)) for doc in docs]
+        if isinstance(vectorstore, NumpyVectorStore):
+            return vectorstore.get_vectors(ids)
+        found = vectorstore.get(ids=list(dict.fromkeys(ids)), include=["embeddings"])
+        vectors = dict(zip(found["ids"], found["embeddings"]))
+        return [vectors.get(doc_id) for doc_id in ids]
+
+    def get_lexical_index(self) -> LexicalIndex:
+        """Повертає BM25-індекс поточної версії бази"""
+        self.get_vectorstore()
+        return self._lexical_index
+
+    def exact_match_search(self, query: str, k: int = 3) -> Optional[List[Document]]:
+        """Лексичний пошук для запитів, що точно називають рідкісні терміни
+
+        Якщо найкращий за BM25 чанк містить усі рідкісні терміни запиту
+        (назва процедури, бренд), ембеддинг запиту не потрібен.
+
+        Returns:
+            Знайдені документи або None, якщо потрібен гібридний пошук
+        """
+        if not LEXICAL_SKIP_EMBEDDING:
+            return None
+        index = self.get_lexical_index()
+        hits = index.search(query, k)
+        if not hits or (len(hits) > 1 and hits[0][1] == hits[1][1]):
+            return None
+
+        max_frequency = max(1, int(LEXICAL_EXACT_MAX_DF * len(index)))
+        rare_terms = [
+            term for term in set(index_terms(query))
+            if 0 < index.document_frequency(term) <= max_frequency
+        ]
+        top_id = hits[0][0]
+        if not rare_terms or not all(index.has_term(top_id, term) for term in rare_terms):
+            return None
+        return [index.get_document(doc_id) for doc_id, _ in hits]
+
+    def hybrid_search(self, query: str, k: int = 3, query_vector: Optional[List[float]] = None) -> List[Document]:
+        """Гібридний пошук: векторний і BM25, об'єднані методом RRF
+
+        Args:
+            query: текст запиту
+            k: кількість документів у результаті
+            query_vector: вже обчислений ембеддинг запиту (інакше обчислюється тут)
+        """
+        if query_vector is None:
+            with metrics.span("embed_query"):
+                query_vector = self.embeddings.embed_query(query)
+        candidates = max(HYBRID_CANDIDATES, k)
+        index = self.get_lexical_index()
+        with metrics.span("vector_search"):
+            vector_docs = self.similarity_search_by_vector(query_vector, k=candidates)
+        with metrics.span("lexical_search"):
+            lexical_docs = [index.get_document(doc_id) for doc_id, _ in index.search(query, candidates)]
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], k=RRF_K)[:k]
+
+    def retrieve(self, query: str, k: int = 3, query_vector: Optional[List[float]] = None) -> List[Document]:
+        """Контекст для відповіді: гібридний пошук з переранжуванням
+
+        Гібридний пошук повертає RERANK_CANDIDATES кандидатів, переранжувальник
+        оцінює кожен з них, і в контекст потрапляють до k чанків, що пройшли
+        поріг релевантності (див. reranker.apply_cutoff).
+        """
+        return self.retrieve_scored(query, k=k, query_vector=query_vector)[0]
+
+    def retrieve_scored(self, query: str, k: int = 3,
+                        query_vector: Optional[List[float]] = None) -> Tuple[List[Document], Optional[float]]:
+        """Те саме, що retrieve, плюс оцінка найкращого чанка (0..1)
+
+        Оцінка — впевненість у знайденому контексті для вибору моделі
+        (model_router); None, якщо переранжування вимкнено.
+        """
+        reranker = self.reranker
+        if reranker is None:
+            return self.hybrid_search(query, k=k, query_vector=query_vector), None
+        if query_vector is None:
+            with metrics.span("embed_query"):
+                query_vector = self.embeddings.embed_query(query)
+        candidates = self.hybrid_search(query, k=max(RERANK_CANDIDATES, k), query_vector=query_vector)
+        with metrics.span("rerank"):
+            scored = reranker.score(query, candidates, query_vector)
+            best = max((score for _, score in scored), default=None)
+            return apply_cutoff(scored, k), best
+
+    def warm_up(self, embed: bool = True):
+        """Відкриває базу та встановлює з'єднання з API до першого запиту клієнта
+
+        Args:
+            embed: чи робити пробний запит ембеддингу (прогріває TLS-з'єднання)
+        """
+        vectorstore = self.get_vectorstore()
+        if isinstance(vectorstore, NumpyVectorStore):
+            # Читання матриці підтягує сторінки memory-map у кеш ОС
+            vectorstore.matrix.sum()
+        else:
+            # Звернення до колекції завантажує сегменти індексу з диска
+            vectorstore._collection.count()
+        if embed:
+            self.embeddings.embed_query("манікюр")
+
+
+_service: Optional[RAGService] = None
+_service_lock = threading.Lock()
+
+
+def get_rag_service() -> RAGService:
+    """Повертає спільний для процесу екземпляр RAGService"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = RAGService()
+    return _service
+
+
+def set_rag_service(service: RAGService):
+    """Підміняє спільний екземпляр RAGService (бенчмарки, навантажувальні тести)"""
+    global _service
+    with _service_lock:
+        _service = service
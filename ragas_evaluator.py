@@ -1,6 +1,8 @@
 import os
+import time
 import asyncio
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 from ragas.metrics import (
     ResponseRelevancy,
@@ -10,17 +12,22 @@ from ragas.metrics import (
 from ragas import SingleTurnSample
 from ragas.llms import LangchainLLMWrapper
 from ragas.embeddings import LangchainEmbeddingsWrapper
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
+from embedding_cache import get_embeddings
 
 load_dotenv()
 
+# Максимальний час обчислення однієї метрики, секунд
+RAGAS_METRIC_TIMEOUT = float(os.getenv("RAGAS_METRIC_TIMEOUT", "60"))
+
 class RAGASEvaluator:
-    def __init__(self):
+    def __init__(self, metric_timeout: float = RAGAS_METRIC_TIMEOUT):
+        self.metric_timeout = metric_timeout
         self.llm = LangchainLLMWrapper(ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.1
         ))
-        self.embeddings = LangchainEmbeddingsWrapper(OpenAIEmbeddings())
+        self.embeddings = LangchainEmbeddingsWrapper(get_embeddings())
         
         self.response_relevancy = ResponseRelevancy(
             llm=self.llm,
@@ -29,43 +36,66 @@ class RAGASEvaluator:
         self.faithfulness = Faithfulness(llm=self.llm)
         self.context_precision = LLMContextPrecisionWithoutReference(llm=self.llm)
     
-    async def evaluate_response(
+    async def _score(self, name: str, metric, sample: SingleTurnSample) -> Tuple[float, float]:
+        """Обчислює одну метрику з тайм-аутом, повертає (оцінка, секунди)"""
+        started = time.perf_counter()
+        try:
+            score = await asyncio.wait_for(metric.single_turn_ascore(sample), timeout=self.metric_timeout)
+        except asyncio.TimeoutError:
+            print(f"Тайм-аут при обчисленні {name} ({self.metric_timeout:.0f} с)")
+            score = 0.0
+        except Exception as e:
+            print(f"Помилка при обчисленні {name}: {e}")
+            score = 0.0
+        return score, time.perf_counter() - started
+
+    async def evaluate_response_timed(
         self, 
         user_input: str, 
         response: str, 
         retrieved_contexts: List[str]
-    ) -> Dict[str, float]:
+    ) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """Обчислює всі метрики паралельно
+
+        Returns:
+            (метрики, час обчислення кожної метрики в секундах)
+        """
         sample = SingleTurnSample(
             user_input=user_input,
             response=response,
             retrieved_contexts=retrieved_contexts
         )
         
-        try:
-            response_relevancy_score = await self.response_relevancy.single_turn_ascore(sample)
-        except Exception as e:
-            print(f"Помилка при обчисленні Response Relevancy: {e}")
-            response_relevancy_score = 0.0
-        
-        try:
-            faithfulness_score = await self.faithfulness.single_turn_ascore(sample)
-        except Exception as e:
-            print(f"Помилка при обчисленні Faithfulness: {e}")
-            faithfulness_score = 0.0
-        
-        try:
-            context_precision_score = await self.context_precision.single_turn_ascore(sample)
-        except Exception as e:
-            print(f"Помилка при обчисленні Context Precision: {e}")
-            context_precision_score = 0.0
+        # Метрики незалежні, тож загальний час дорівнює часу найповільнішої з них
+        (relevancy, relevancy_time), (faithfulness, faithfulness_time), (precision, precision_time) = await asyncio.gather(
+            self._score("Response Relevancy", self.response_relevancy, sample),
+            self._score("Faithfulness", self.faithfulness, sample),
+            self._score("Context Precision", self.context_precision, sample),
+        )
         
-        return {
-            "response_relevancy": response_relevancy_score,
-            "faithfulness": faithfulness_score,
-            "context_precision": context_precision_score
+        metrics = {
+            "response_relevancy": relevancy,
+            "faithfulness": faithfulness,
+            "context_precision": precision
         }
+        latencies = {
+            "response_relevancy": relevancy_time,
+            "faithfulness": faithfulness_time,
+            "context_precision": precision_time
+        }
+        return metrics, latencies
+
+    async def evaluate_response(
+        self, 
+        user_input: str, 
+        response: str, 
+        retrieved_contexts: List[str]
+    ) -> Dict[str, float]:
+        metrics, _ = await self.evaluate_response_timed(user_input, response, retrieved_contexts)
+        return metrics
     
-    def print_metrics(self, metrics: Dict[str, float], user_input: str):
+    def print_metrics(self, metrics: Dict[str, float], user_input: str,
+                      latencies: Optional[Dict[str, float]] = None):
         print("\n" + "="*60)
         print("📊 RAGAS МЕТРИКИ ОЦІНКИ ВІДПОВІДІ")
         print("="*60)
@@ -81,6 +111,10 @@ class RAGASEvaluator:
         print(f"🔍 Context Precision: {metrics['context_precision']:.3f}")
         print("   (Якість отриманого контексту)")
         
+        if latencies:
+            print(f"⏱️ Час метрик: релевантність {latencies['response_relevancy']:.2f} с, "
+                  f"точність {latencies['faithfulness']:.2f} с, контекст {latencies['context_precision']:.2f} с")
+        
         avg_score = sum(metrics.values()) / len(metrics)
         print(f"\n📈 Середній бал: {avg_score:.3f}")
         
@@ -95,23 +129,61 @@ class RAGASEvaluator:
         
         print("="*60 + "\n")
 
-def evaluate_rag_response(user_input: str, response: str, retrieved_contexts: List[str]):
-    evaluator = RAGASEvaluator()
+class _EventLoopThread:
+    """Окремий потік з постійним циклом подій для асинхронних метрик RAGAS
+
+    Дає змогу викликати оцінку синхронно з будь-якого потоку без
+    nest_asyncio і без створення нового циклу подій на кожен запит.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="ragas-event-loop", daemon=True)
+        self._thread.start()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+_evaluator: Optional[RAGASEvaluator] = None
+_loop_thread: Optional[_EventLoopThread] = None
+_evaluator_lock = threading.Lock()
+
+
+def get_evaluator() -> RAGASEvaluator:
+    """Повертає спільний для процесу RAGASEvaluator"""
+    global _evaluator, _loop_thread
+    if _evaluator is None:
+        with _evaluator_lock:
+            if _evaluator is None:
+                _loop_thread = _EventLoopThread()
+                _evaluator = RAGASEvaluator()
+    return _evaluator
+
+
+def run_evaluation(coro):
+    """Виконує корутину оцінки у спільному циклі подій і повертає результат"""
+    get_evaluator()
+    return _loop_thread.run(coro)
+
+
+def evaluate_rag_response_timed(user_input: str, response: str, retrieved_contexts: List[str]):
+    """Оцінює відповідь і повертає (метрики, час кожної метрики) або (None, None)"""
+    evaluator = get_evaluator()
     
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            import nest_asyncio
-            nest_asyncio.apply()
-        
-        metrics = loop.run_until_complete(
-            evaluator.evaluate_response(user_input, response, retrieved_contexts)
+        metrics, latencies = run_evaluation(
+            evaluator.evaluate_response_timed(user_input, response, retrieved_contexts)
         )
-        evaluator.print_metrics(metrics, user_input)
-        return metrics
+        evaluator.print_metrics(metrics, user_input, latencies)
+        return metrics, latencies
     except Exception as e:
         print(f"Помилка при оцінці RAGAS метрик: {e}")
-        return None
+        return None, None
+
+def evaluate_rag_response(user_input: str, response: str, retrieved_contexts: List[str]):
+    metrics, _ = evaluate_rag_response_timed(user_input, response, retrieved_contexts)
+    return metrics
 
 if __name__ == "__main__":
     test_input = "Скільки коштує манікюр?"
@@ -0,0 +1,168 @@
+import os
+import math
+import threading
+from typing import Callable, List, Optional, Tuple
+from dotenv import load_dotenv
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from text_utils import STOP_WORDS, words, stem, tokenize, tokens_match
+
+load_dotenv()
+
+# Переранжування знайдених чанків: "lexical" (схожість ембеддингів + збіг слів, без додаткових моделей),
+# "cross-encoder" (локальна модель sentence-transformers на CPU) або "none" (порядок гібридного пошуку)
+RERANKER = os.getenv("RERANKER", "lexical").lower()
+
+# Скільки кандидатів гібридного пошуку переранжовується
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+
+# Мінімальна оцінка чанка (0..1), нижче якої він не потрапляє в контекст
+RERANK_MIN_SCORE = float(os.getenv("RERANK_MIN_SCORE", "0.2"))
+
+# Чанк потрапляє в контекст, лише якщо його оцінка не нижча за цю частку оцінки найкращого
+RERANK_RELATIVE_CUTOFF = float(os.getenv("RERANK_RELATIVE_CUTOFF", "0.75"))
+
+# Вага схожості ембеддингів в оцінці "lexical" (решта — частка слів запиту, знайдених у чанку)
+RERANK_SEMANTIC_WEIGHT = float(os.getenv("RERANK_SEMANTIC_WEIGHT", "0.5"))
+
+# Багатомовна модель cross-encoder (підтримує українську)
+CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+
+
+def query_terms(query: str) -> List[str]:
+    """Основи значущих слів запиту"""
+    return [stem(word) for word in words(query) if word not in STOP_WORDS and len(word) > 2]
+
+
+def term_coverage(terms: List[str], text: str) -> float:
+    """Частка слів запиту, що зустрічаються в тексті (з урахуванням різних форм слова)"""
+    if not terms:
+        return 0.0
+    tokens = set(tokenize(text))
+    return sum(any(tokens_match(term, token) for token in tokens) for term in terms) / len(terms)
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def apply_cutoff(scored: List[Tuple[Document, float]], k: int,
+                 min_score: float = RERANK_MIN_SCORE,
+                 relative_cutoff: float = RERANK_RELATIVE_CUTOFF) -> List[Document]:
+    """Залишає до k найкращих чанків, що пройшли поріг
+
+    Найкращий чанк залишається завжди, щоб модель могла відповісти хоча б
+    на його основі (або чесно сказати, що інформації немає).
+    """
+    scored = sorted(scored, key=lambda item: item[1], reverse=True)
+    if not scored:
+        return []
+    threshold = max(min_score, scored[0][1] * relative_cutoff)
+    return [scored[0][0]] + [doc for doc, score in scored[1:k] if score >= threshold]
+
+
+class LexicalSemanticReranker:
+    """Переранжування без додаткових моделей
+
+    Оцінка чанка — зважена сума косинусної схожості його ембеддингу з
+    ембеддингом запиту та частки слів запиту, знайдених у чанку. Ембеддинги
+    чанків читаються з векторної бази (vector_lookup), тож звернень до API
+    немає; моделлю ембеддингів рахуються лише чанки, яких у базі не знайшлося.
+    """
+
+    def __init__(self, embeddings: Embeddings, semantic_weight: float = RERANK_SEMANTIC_WEIGHT,
+                 vector_lookup: Optional[Callable[[List[Document]], List[Optional[List[float]]]]] = None):
+        """
+        Args:
+            embeddings: модель ембеддингів (для запиту і чанків, яких немає в базі)
+            semantic_weight: вага схожості ембеддингів в оцінці
+            vector_lookup: функція docs -> збережені вектори чанків (None для відсутніх)
+        """
+        self.embeddings = embeddings
+        self.semantic_weight = semantic_weight
+        self.vector_lookup = vector_lookup
+
+    def score(self, query: str, docs: List[Document],
+              query_vector: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+        if query_vector is None:
+            query_vector = self.embeddings.embed_query(query)
+        vectors = list(self.vector_lookup(docs)) if self.vector_lookup is not None else [None] * len(docs)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = self.embeddings.embed_documents([docs[i].page_content for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        terms = query_terms(query)
+        return [
+            (doc, self.semantic_weight * max(cosine(query_vector, vector), 0.0)
+             + (1 - self.semantic_weight) * term_coverage(terms, doc.page_content))
+            for doc, vector in zip(docs, vectors)
+        ]
+
+
+class CrossEncoderReranker:
+    """Переранжування локальною моделлю cross-encoder на CPU
+
+    Модель оцінює кожну пару (запит, чанк) разом і повертає ймовірність
+    релевантності. Завантажується при першому зверненні; потрібен пакет
+    sentence-transformers (pip install sentence-transformers).
+    """
+
+    def __init__(self, model_name: str = CROSS_ENCODER_MODEL):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    try:
+                        from sentence_transformers import CrossEncoder
+                    except ImportError as e:
+                        raise RuntimeError(
+                            "Для RERANKER=cross-encoder встановіть sentence-transformers: "
+                            "pip install sentence-transformers"
+                        ) from e
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def score(self, query: str, docs: List[Document],
+              query_vector: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+        # Моделі з одним виходом повертають сигмоїду — оцінку в діапазоні 0..1
+        scores = self.model.predict([(query, doc.page_content) for doc in docs], show_progress_bar=False)
+        return [(doc, float(score)) for doc, score in zip(docs, scores)]
+
+
+_cross_encoder: Optional[CrossEncoderReranker] = None
+_cross_encoder_lock = threading.Lock()
+
+
+def create_reranker(embeddings: Embeddings, kind: Optional[str] = None,
+                    vector_lookup: Optional[Callable[[List[Document]], List[Optional[List[float]]]]] = None):
+    """Створює переранжувальник вибраного типу
+
+    Args:
+        embeddings: модель ембеддингів з кешем (для "lexical")
+        kind: "lexical", "cross-encoder" або "none" (за замовчуванням — RERANKER)
+        vector_lookup: функція docs -> збережені у базі вектори чанків (для "lexical")
+
+    Returns:
+        Переранжувальник з методом score(query, docs, query_vector) або None для "none"
+    """
+    global _cross_encoder
+    kind = kind or RERANKER
+    if kind == "none":
+        return None
+    if kind == "lexical":
+        return LexicalSemanticReranker(embeddings, vector_lookup=vector_lookup)
+    if kind == "cross-encoder":
+        # Модель спільна для процесу (завантажується один раз)
+        with _cross_encoder_lock:
+            if _cross_encoder is None:
+                _cross_encoder = CrossEncoderReranker()
+            return _cross_encoder
+    raise ValueError(f"Невідомий RERANKER: {kind} (доступні: lexical, cross-encoder, none)")
@@ -2,8 +2,7 @@ import os
 import json
 from datetime import datetime
 from dotenv import load_dotenv
-from query_rag import query_bot
-from ragas_evaluator import evaluate_rag_response
+from batch_evaluation import run_batch, BATCH_CONCURRENCY
 
 load_dotenv()
 
@@ -24,59 +23,11 @@ class SimpleBeautySalonResearch:
             {"query": "Який номер телефону салону?", "expected": "present", "category": "contact"}
         ]
 
-    def run_single_test(self, test_item):
-        query = test_item["query"]
-        expected = test_item["expected"]
-        category = test_item["category"]
-        
-        print(f"\n{'='*60}")
-        print(f"🔍 Запит: {query}")
-        print(f"📝 Очікується: {'Є інформація' if expected == 'present' else 'Немає інформації'}")
-        print(f"🏷️ Категорія: {category}")
-        print('='*60)
-        
-        try:
-            answer, retrieved_contexts = query_bot(query)
-            print(f"💬 Відповідь: {answer}")
-            
-            ragas_metrics = None
-            try:
-                ragas_metrics = evaluate_rag_response(query, answer, retrieved_contexts)
-            except Exception as e:
-                print(f"⚠️ Помилка RAGAS: {e}")
-            
-            contains_apology = "На жаль" in answer or "наразі недоступна" in answer
-            is_correct = (expected == "present" and not contains_apology) or (expected == "absent" and contains_apology)
-            
-            result = {
-                "query": query,
-                "answer": answer,
-                "retrieved_contexts": retrieved_contexts,
-                "expected": expected,
-                "category": category,
-                "ragas_metrics": ragas_metrics,
-                "contains_apology": contains_apology,
-                "is_correct": is_correct,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            status = "✅ ПРАВИЛЬНО" if is_correct else "❌ НЕПРАВИЛЬНО"
-            print(f"📊 Результат: {status}")
-            
-            self.results.append(result)
-            return result
-            
-        except Exception as e:
-            print(f"❌ Помилка: {e}")
-            return None
-
     def run_research(self):
         print("🚀 СПРОЩЕНЕ ДОСЛІДЖЕННЯ AI-КОНСУЛЬТАНТА")
         print("="*70)
         
-        for i, test_item in enumerate(self.test_queries, 1):
-            print(f"\n[{i}/10]")
-            self.run_single_test(test_item)
+        self.results = run_batch(self.test_queries, concurrency=BATCH_CONCURRENCY)
         
         self.analyze_results()
 
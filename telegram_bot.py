@@ -1,15 +1,23 @@
 import os
 import telebot
 import datetime
+import time
 import shutil
+import functools
+from typing import Iterator
 from dotenv import load_dotenv
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
-from logger import log_query, get_stats, get_top_queries
+from logger import log_query, get_stats, get_top_queries, format_unique_queries
 from build_vectorstore import build_vector_store
-from ragas_evaluator import evaluate_rag_response
+from index_versions import IndexValidationError
+from evaluation_queue import get_evaluation_queue
+from rag_service import get_rag_service
+from answer_cache import SemanticAnswerCache
+from price_index import get_price_index
+from conversation_store import ConversationStore
+from prompt_builder import build_prompt
+from model_router import route_query
+from update_dispatcher import KeyedExecutor, BackgroundJobs, ThrottledProgress
+import metrics
 
 load_dotenv()
 
@@ -23,24 +31,97 @@ ADMIN_USER_IDS = [id.strip() for id in admin_ids_raw.split(",") if id.strip()]
 # Виводимо для діагностики
 print(f"Завантажені ID адміністраторів: {ADMIN_USER_IDS}")
 
-bot = telebot.TeleBot(bot_token)
+# Опитування Telegram лише розподіляє оновлення, обробка виконується в пулі воркерів
+bot = telebot.TeleBot(bot_token, threaded=False)
+
+# Пул обробки повідомлень: різні користувачі паралельно, один користувач — по черзі
+dispatcher = KeyedExecutor()
+
+# Фонові адміністративні завдання (перебудова векторної бази)
+jobs = BackgroundJobs()
 
 # Словник для зберігання станів користувачів у процесі оновлення прайс-листа
 user_states = {}
 
-# Словник для зберігання історії діалогів користувачів
-conversation_history = {}
-
 # Максимальна кількість повідомлень в історії для одного користувача
 MAX_HISTORY_LENGTH = 10
 
-def query_bot(user_query: str, user_id: str = None) -> tuple[str, list[str]]:
-    db = Chroma(persist_directory="db", embedding_function=OpenAIEmbeddings())
-    results = db.similarity_search(user_query, k=3)
-    context = "\n---\n".join([doc.page_content for doc in results])
-    retrieved_contexts = [doc.page_content for doc in results]
+# Історія діалогів: обмежена за кількістю користувачів, часом неактивності та токенами,
+# зберігається між перезапусками
+conversation_store = ConversationStore(max_messages=MAX_HISTORY_LENGTH * 2)  # *2 бо кожен обмін це 2 повідомлення
+
+# Кеш відповідей на схожі запити (скидається після перебудови бази)
+answer_cache = SemanticAnswerCache("telegram")
+
+# Потокові відповіді: повідомлення редагується по мірі генерації
+STREAM_REPLIES = os.getenv("STREAM_REPLIES", "1") == "1"
+
+# Мінімальний інтервал між редагуваннями повідомлення (ліміти Telegram API), секунд
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+
+# Максимальна довжина одного повідомлення Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+def per_user(handler):
+    """Виконує обробник у пулі воркерів, зберігаючи порядок оновлень кожного користувача"""
+    @functools.wraps(handler)
+    def wrapper(update):
+        dispatcher.submit(str(update.from_user.id), handler, update)
+    return wrapper
+
+def update_history(user_id: str, user_query: str, answer: str):
+    """Додає обмін повідомленнями до історії діалогу користувача"""
+    conversation_store.append(user_id, user_query, answer)
+
+def query_bot_stream(user_query: str, user_id: str = None) -> tuple[Iterator[str], list[str]]:
+    """Повертає генератор фрагментів відповіді (по мірі генерації) та контекст
+
+    Історія діалогу і кеш відповідей оновлюються, коли генератор вичерпано.
+    """
+    started = time.time()
+
+    # Питання про ціну відомої послуги — точна відповідь з індексу цін без пошуку та GPT
+    with metrics.span("price_lookup"):
+        priced = get_price_index().answer(user_query)
+    if priced:
+        metrics.annotate(path="price")
+        update_history(user_id, user_query, priced["answer"])
+        return iter([priced["answer"]]), priced["contexts"]
 
-    system_prompt = f"""
+    service = get_rag_service()
+    service.get_vectorstore()  # перевідкриває базу, якщо її перебудували
+
+    # Відповідь залежить від історії діалогу, тому кеш (спільний для всіх користувачів)
+    # використовується лише для першого питання розмови
+    history = conversation_store.get_messages(user_id)
+    use_cache = not history
+
+    # Запит з точною назвою процедури знаходиться BM25 без обчислення ембеддингу
+    query_vector = None
+    with metrics.span("exact_match"):
+        results = service.exact_match_search(user_query, k=3)
+    if results is None:
+        with metrics.span("embed_query"):
+            query_vector = service.embeddings.embed_query(user_query)
+
+        # Схожий запит уже відповідали на поточній версії бази — повертаємо збережену відповідь
+        cached = None
+        if use_cache:
+            with metrics.span("answer_cache"):
+                cached = answer_cache.lookup(query_vector, service.index_version)
+        if cached:
+            metrics.annotate(path="cache")
+            update_history(user_id, user_query, cached["answer"])
+            return iter([cached["answer"]]), cached["contexts"]
+
+        results, confidence = service.retrieve_scored(user_query, k=3, query_vector=query_vector)
+        metrics.annotate(path="hybrid")
+    else:
+        # Точний збіг BM25 не оцінюється переранжувальником (для цього потрібен ембеддинг запиту)
+        confidence = None
+        metrics.annotate(path="exact")
+    prompt_started = time.perf_counter()
+    system_template = """
 Ти — асистент салону краси «ESTHEIQUE». Відповідай клієнтам тільки на основі наведеного контексту.
 
 Якщо у контексті немає точної відповіді — скажи: "На жаль, ця інформація наразі недоступна."
@@ -49,43 +130,84 @@ def query_bot(user_query: str, user_id: str = None) -> tuple[str, list[str]]:
 {context}
 """
 
-    chat = ChatOpenAI(temperature=0.2, model_name="gpt-4")
-    
-    # Формуємо список повідомлень з історією
-    messages = [SystemMessage(content=system_prompt)]
-    
-    # Додаємо історію діалогу, якщо вона є
-    if user_id and user_id in conversation_history:
-        messages.extend(conversation_history[user_id])
+    # Прості запити з релевантним контекстом — швидкій моделі, складні — великій
+    route = route_query(user_query, confidence, results[0].page_content if results else "",
+                        large_model="gpt-4", exact=query_vector is None)
+    metrics.annotate(model=route["model"], route=route["route"], route_reason=route["reason"],
+                     intent=route["intent"], confidence=None if confidence is None else round(confidence, 3))
+    chat = service.get_chat(route["model"], 0.2)
+
+    # Контекст та історія діалогу в межах бюджету токенів: менш релевантне відкидається першим
+    prompt = build_prompt(
+        system_template,
+        [doc.page_content for doc in results],
+        user_query,
+        history=history,
+        model_name=route["model"],
+    )
+    messages = prompt["messages"]
+    retrieved_contexts = prompt["contexts"]
+    metrics.record("prompt", time.perf_counter() - prompt_started)
+    metrics.annotate(context_chunks=len(retrieved_contexts), prompt_tokens=prompt["tokens"],
+                     dropped_chunks=prompt["dropped_chunks"], dropped_history=prompt["dropped_history"])
     
-    # Додаємо поточний запит
-    messages.append(HumanMessage(content=user_query))
+    def generate():
+        # Отримуємо відповідь потоком токенів
+        parts = []
+        for chunk in metrics.timed_stream(chat.stream(messages), "llm_first_token", "llm_total"):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+        answer = "".join(parts)
+        
+        # Оновлюємо історію діалогу
+        update_history(user_id, user_query, answer)
+
+        if use_cache and query_vector is not None:
+            answer_cache.store(user_query, query_vector, answer, retrieved_contexts,
+                               time.time() - started, service.index_version)
     
-    # Отримуємо відповідь
-    response = chat.invoke(messages)
+    return generate(), retrieved_contexts
+
+def query_bot(user_query: str, user_id: str = None) -> tuple[str, list[str]]:
+    tokens, retrieved_contexts = query_bot_stream(user_query, user_id)
+    return "".join(tokens), retrieved_contexts
+
+def reply_streaming(message, tokens: Iterator[str]) -> str:
+    """Надсилає відповідь-заглушку і поступово редагує її по мірі надходження токенів
+
+    Returns:
+        Повний текст відповіді
+    """
+    with metrics.span("telegram_send"):
+        placeholder = bot.reply_to(message, "✍️ ...")
+
+    def edit(text: str):
+        with metrics.span("telegram_send"):
+            bot.edit_message_text(chat_id=placeholder.chat.id, message_id=placeholder.message_id, text=text)
+
+    progress = ThrottledProgress(edit, min_interval=STREAM_EDIT_INTERVAL)
     
-    # Оновлюємо історію діалогу
-    if user_id:
-        if user_id not in conversation_history:
-            conversation_history[user_id] = []
-        
-        # Додаємо нові повідомлення
-        conversation_history[user_id].extend([
-            HumanMessage(content=user_query),
-            AIMessage(content=response.content)
-        ])
-        
-        # Обмежуємо довжину історії
-        if len(conversation_history[user_id]) > MAX_HISTORY_LENGTH * 2:  # *2 бо кожен обмін це 2 повідомлення
-            conversation_history[user_id] = conversation_history[user_id][-MAX_HISTORY_LENGTH * 2:]
+    answer = ""
+    for token in tokens:
+        answer += token
+        if answer.strip():
+            progress(answer[:TELEGRAM_MESSAGE_LIMIT - 2] + " ▌")
     
-    return response.content, retrieved_contexts
+    # Фінальний текст без курсора; те, що не вмістилось в одне повідомлення, надсилаємо окремо
+    progress(answer[:TELEGRAM_MESSAGE_LIMIT] or "…", force=True)
+    for start in range(TELEGRAM_MESSAGE_LIMIT, len(answer), TELEGRAM_MESSAGE_LIMIT):
+        with metrics.span("telegram_send"):
+            bot.send_message(message.chat.id, answer[start:start + TELEGRAM_MESSAGE_LIMIT])
+    return answer
 
 @bot.message_handler(commands=['start'])
+@per_user
 def welcome(message):
     bot.reply_to(message, "Вітаємо у салоні краси «ESTHEIQUE». Напишіть ваше запитання.")
 
 @bot.message_handler(commands=['myid'])
+@per_user
 def show_id(message):
     """Показує ID користувача та перевіряє права адміністратора"""
     user_id = str(message.from_user.id)
@@ -95,6 +217,7 @@ def show_id(message):
     bot.reply_to(message, f"Ваш ID: `{user_id}`\n{admin_status}\n\nДоступні ID адміністраторів: `{ADMIN_USER_IDS}`", parse_mode="Markdown")
 
 @bot.message_handler(commands=['addadmin'])
+@per_user
 def add_admin(message):
     """Додає нового адміністратора"""
     user_id = str(message.from_user.id)
@@ -152,6 +275,7 @@ def add_admin(message):
         bot.reply_to(message, f"❌ Помилка при оновленні файлу .env: {e}")
 
 @bot.message_handler(commands=['updateprice'])
+@per_user
 def update_price_command(message):
     """Ініціює процес оновлення прайс-листа"""
     user_id = str(message.from_user.id)
@@ -174,6 +298,7 @@ def update_price_command(message):
     user_states[user_id] = "waiting_for_price_pdf"
 
 @bot.message_handler(commands=['cancel'])
+@per_user
 def cancel_operation(message):
     """Скасовує поточну операцію користувача"""
     user_id = str(message.from_user.id)
@@ -185,6 +310,7 @@ def cancel_operation(message):
         bot.reply_to(message, "ℹ️ Немає активних операцій для скасування.")
 
 @bot.message_handler(content_types=['document'])
+@per_user
 def handle_document(message):
     """Обробка надісланих документів"""
     user_id = str(message.from_user.id)
@@ -236,10 +362,40 @@ def handle_document(message):
             bot.reply_to(message, f"❌ Помилка при оновленні прайс-листа: {str(e)}")
             print(f"Помилка при оновленні прайс-листа: {e}")
 
+def rebuild_vector_store(chat_id: int, message_id: int):
+    """Перебудовує векторну базу у фоні, показуючи прогрес у повідомленні"""
+    progress = ThrottledProgress(
+        lambda text: bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=f"⏳ {text}")
+    )
+    try:
+        # Оновлюємо векторну базу
+        report = build_vector_store(progress=progress)
+        get_rag_service().reload()
+        progress("Готово", force=True)
+        
+        # Повідомляємо про успішне оновлення
+        bot.send_message(
+            chat_id,
+            f"✅ Векторна база успішно оновлена (версія {report['version']})!\n"
+            f"Нових чанків: {report['added']}, видалено: {report['deleted']}, "
+            f"без змін (ембеддинги не перераховувались): {report['skipped']}"
+        )
+    except IndexValidationError as e:
+        bot.send_message(chat_id, f"❌ Нова версія бази не пройшла перевірку, бот працює з попередньою: {str(e)}")
+        print(f"Нова версія векторної бази не пройшла перевірку: {e}")
+    except Exception as e:
+        bot.send_message(chat_id, f"❌ Помилка при оновленні векторної бази: {str(e)}")
+        print(f"Помилка при оновленні векторної бази: {e}")
+
 @bot.callback_query_handler(func=lambda call: call.data in ["update_vectorstore", "skip_update"])
+@per_user
 def callback_handler(call):
     """Обробка відповідей на питання про оновлення векторної бази"""
     if call.data == "update_vectorstore":
+        if jobs.is_running("rebuild"):
+            bot.send_message(call.message.chat.id, "ℹ️ Векторна база вже оновлюється, зачекайте завершення.")
+            return
+
         # Повідомляємо про початок оновлення
         bot.edit_message_text(
             chat_id=call.message.chat.id,
@@ -247,15 +403,9 @@ def callback_handler(call):
             text="⏳ Оновлюю векторну базу... Це може зайняти кілька хвилин."
         )
         
-        try:
-            # Оновлюємо векторну базу
-            build_vector_store()
-            
-            # Повідомляємо про успішне оновлення
-            bot.send_message(call.message.chat.id, "✅ Векторна база успішно оновлена!")
-        except Exception as e:
-            bot.send_message(call.message.chat.id, f"❌ Помилка при оновленні векторної бази: {str(e)}")
-            print(f"Помилка при оновленні векторної бази: {e}")
+        # Перебудова виконується у фоні, тож бот продовжує відповідати клієнтам
+        if not jobs.start("rebuild", rebuild_vector_store, call.message.chat.id, call.message.message_id):
+            bot.send_message(call.message.chat.id, "ℹ️ Векторна база вже оновлюється, зачекайте завершення.")
     else:  # skip_update
         bot.edit_message_text(
             chat_id=call.message.chat.id,
@@ -264,6 +414,7 @@ def callback_handler(call):
         )
 
 @bot.message_handler(commands=['stats'])
+@per_user
 def show_stats(message):
     """Показує статистику запитів (тільки для адміністраторів)"""
     user_id = str(message.from_user.id)
@@ -279,7 +430,7 @@ def show_stats(message):
     
     stats_text = f"📊 *Статистика запитів*\n\n"
     stats_text += f"Загальна кількість запитів: {stats['total_queries']}\n"
-    stats_text += f"Унікальних запитів: {stats['unique_queries']}\n"
+    stats_text += f"Унікальних запитів: {format_unique_queries(stats)}\n"
     stats_text += f"Користувачів: {stats['users']}\n\n"
     
     if top_queries:
@@ -287,19 +438,38 @@ def show_stats(message):
         for i, q in enumerate(top_queries, 1):
             stats_text += f"{i}. \"{q['query']}\" - {q['count']} разів\n"
     
+    cache_stats = answer_cache.stats()
+    stats_text += f"\n*Кеш відповідей:*\n"
+    stats_text += f"Влучань: {cache_stats['hits']} з {cache_stats['hits'] + cache_stats['misses']} ({cache_stats['hit_rate'] * 100:.1f}%)\n"
+    stats_text += f"Зекономлено часу: {cache_stats['saved_seconds']:.1f} с\n"
+    
+    price_stats = get_price_index().stats()
+    stats_text += f"\n*Індекс цін:*\n"
+    stats_text += f"Позицій: {price_stats['entries']}, відповідей без GPT: {price_stats['hits']}\n"
+    
+    dispatcher_stats = dispatcher.stats()
+    stats_text += f"\n*Обробка повідомлень:*\n"
+    stats_text += f"Користувачів в обробці: {dispatcher_stats['active_users']}, повідомлень у черзі: {dispatcher_stats['queued_updates']}\n"
+    
+    eval_stats = get_evaluation_queue().stats()
+    stats_text += f"\n*RAGAS-оцінка у фоні:*\n"
+    stats_text += f"Виконано: {eval_stats['completed']}, у черзі: {eval_stats['pending']}, "
+    stats_text += f"пропущено через переповнення: {eval_stats['dropped']}\n"
+    
     bot.reply_to(message, stats_text, parse_mode="Markdown")
 
 @bot.message_handler(commands=['clear'])
+@per_user
 def clear_history(message):
     """Очищає історію діалогу користувача"""
     user_id = str(message.from_user.id)
-    if user_id in conversation_history:
-        del conversation_history[user_id]
+    if conversation_store.clear(user_id):
         bot.reply_to(message, "✅ Історію діалогу очищено.")
     else:
         bot.reply_to(message, "ℹ️ У вас немає активної історії діалогу.")
 
 @bot.message_handler(func=lambda message: True)
+@per_user
 def handle_message(message):
     try:
         # Якщо користувач у процесі оновлення прайс-листа і написав текст
@@ -314,19 +484,26 @@ def handle_message(message):
         username = message.from_user.username or f"user_{user_id}"
         log_query(message.text, user_id=user_id, username=username)
         
-        # Обробляємо запит з передачею user_id для збереження контексту
-        answer, retrieved_contexts = query_bot(message.text, user_id)
-        bot.reply_to(message, answer)
+        # Обробляємо запит з передачею user_id для збереження контексту; тривалість стадій — у logs/metrics.jsonl
+        with metrics.trace("telegram", stream=STREAM_REPLIES):
+            if STREAM_REPLIES:
+                tokens, retrieved_contexts = query_bot_stream(message.text, user_id)
+                answer = reply_streaming(message, tokens)
+            else:
+                answer, retrieved_contexts = query_bot(message.text, user_id)
+                with metrics.span("telegram_send"):
+                    bot.reply_to(message, answer)
         
-        # Оцінюємо відповідь за допомогою RAGAS (виводиться в консоль)
-        try:
-            evaluate_rag_response(message.text, answer, retrieved_contexts)
-        except Exception as eval_error:
-            print(f"Помилка при оцінці RAGAS: {eval_error}")
+        # Ставимо відповідь у фонову чергу RAGAS-оцінки (результат — у консоль і logs/evaluations.jsonl)
+        get_evaluation_queue().submit(message.text, answer, retrieved_contexts, user_id=user_id, source="telegram")
             
     except Exception as e:
         print("Помилка:", e)
         bot.reply_to(message, "Вибачте, сталася помилка. Спробуйте ще раз пізніше.")
 
-print("Бот запущено")
-bot.infinity_polling()
+if __name__ == "__main__":
+    # Відкриваємо базу і з'єднання з API до першого повідомлення клієнта
+    get_rag_service().warm_up()
+
+    print("Бот запущено")
+    bot.infinity_polling()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import pytest
+from fake_models import FakeEmbeddings
+import build_vectorstore
+from build_vectorstore import build_vector_store, validate_index
+from index_versions import IndexValidationError, index_dir, list_versions
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Копія data/ у тимчасовій директорії: база збирається в tmp_path/db"""
+    shutil.copytree(DATA_DIR, tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_build_validates_and_publishes_version(workdir):
+    embeddings = FakeEmbeddings()
+    report = build_vector_store(workers=1, embeddings=embeddings)
+
+    assert report["added"] == report["total"] > 0
+    assert report["price_items"] == 122
+    assert [version["version"] for version in list_versions()] == [report["version"]]
+    # Перевірка вже зібраної версії проходить повторно
+    validate_index(index_dir(), report, embeddings)
+
+    # Без змін у data/ нова версія не створюється
+    assert build_vector_store(workers=1, embeddings=embeddings)["version"] == report["version"]
+
+
+def test_validation_fails_for_incomplete_or_unsearchable_index(workdir, monkeypatch):
+    embeddings = FakeEmbeddings()
+    report = build_vector_store(workers=1, embeddings=embeddings)
+
+    with pytest.raises(IndexValidationError):
+        validate_index(index_dir(), dict(report, total=report["total"] + 1), embeddings)
+
+    monkeypatch.setattr(build_vectorstore, "INDEX_SMOKE_QUERIES", ["щосьзовсімневідоме"])
+    with pytest.raises(IndexValidationError):
+        validate_index(index_dir(), report, embeddings)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import pytest
+from load_docs import load_file
+
+PRICE_LIST = "data/Прайс Березень 2025.pdf"
+
+
+@pytest.fixture(scope="module")
+def chunks():
+    return load_file(PRICE_LIST)
+
+
+def _prices(chunks):
+    return {
+        (chunk.metadata["category"], chunk.metadata["service"]): chunk.metadata["price"]
+        for chunk in chunks if chunk.metadata.get("chunk_type") == "price"
+    }
+
+
+def test_price_list_is_split_into_one_item_per_chunk(chunks):
+    types = [chunk.metadata.get("chunk_type") for chunk in chunks]
+    assert types.count("price") == 122
+    assert types.count("price_note") == 5
+    assert types.count("contacts") == 1
+    assert all(chunk.metadata["source"] == PRICE_LIST for chunk in chunks)
+
+
+def test_price_items(chunks):
+    prices = _prices(chunks)
+    expected = {
+        # Назва і ціна в окремих рядках
+        ("ЖІНОЧОГО МАНІКЮРУ ПОСЛУГИ / МАНІКЮР (як окрема процедура)", "Манікюр комбінований"): "600",
+        ("ЧОЛОВІЧОГО МАНІКЮРУ ПОСЛУГИ", "Манікюр класичний обрізний"): "500",
+        ("ЧОЛОВІЧІ ПЕРУКАРСЬКІ ПОСЛУГИ / СТРИЖКИ", "Стрижка під насадку"): "400",
+        # Кілька цін поспіль (варіанти послуги)
+        ("ЖІНОЧОГО МАНІКЮРУ ПОСЛУГИ / КОМПЛЕКСИ з МАНІКЮРА",
+         "Комплекс Гель-лак (зняття/ман/база/покриття/топ)/ + (з укріпленням гелем)"): "800 / 1000",
+        ("ФАРБУВАННЯ з СУШКОЮ", "Фарбування WELLA"): "1500 / 1800 / 2000 / 2500",
+        # "від" у ціні та ціна в одному рядку з назвою
+        ("ЖІНОЧІ ПЕРУКАРСЬКI ПОСЛУГИ / ЗАЧІСКИ", "Зачіска весільна"): "від 1500",
+        ("ТУРБОСОЛЯРІЙ TAN CAN 8000 / ІНФРАЧЕРВОНА САУНА", "1 година/1 людина"): "500",
+        ("ДЕПІЛЯЦІЯ ЖІНОЧА ВОСКОВА", "Пахви"): "300",
+    }
+    for key, price in expected.items():
+        assert prices.get(key) == price, key
+
+
+def test_price_chunk_text_and_contacts(chunks):
+    chunk = next(chunk for chunk in chunks if chunk.metadata.get("service") == "Стрижка під насадку")
+    assert chunk.page_content == "ЧОЛОВІЧІ ПЕРУКАРСЬКІ ПОСЛУГИ / СТРИЖКИ\nСтрижка під насадку: 400 грн"
+
+    contacts = next(chunk for chunk in chunks if chunk.metadata.get("chunk_type") == "contacts")
+    assert "вул. Голосіївська 7" in contacts.page_content
+    # Контакти з кожної сторінки не дублюються
+    lines = contacts.page_content.splitlines()
+    assert len(lines) == len(set(lines))
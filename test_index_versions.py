@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import os
+import pytest
+from embedding_backends import embedding_model_tag
+from index_versions import (
+    EMBEDDING_MODEL_FILE, IndexValidationError, activate_version, create_staging, current_version,
+    discard_staging, index_dir, list_versions, prune_versions, publish_version, version_dir,
+)
+
+
+def _build(root, text, model_tag=None):
+    """Збирає і публікує версію з одним файлом індексу"""
+    version, staging = create_staging(root)
+    with open(os.path.join(staging, "index.txt"), "w", encoding="utf-8") as f:
+        f.write(text)
+    with open(os.path.join(staging, EMBEDDING_MODEL_FILE), "w", encoding="utf-8") as f:
+        f.write(model_tag or embedding_model_tag())
+    publish_version(version, {"total": 1}, root)
+    return version
+
+
+def _read(path):
+    with open(os.path.join(path, "index.txt"), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_staging_copies_active_version_and_publish_switches_pointer(tmp_path):
+    root = str(tmp_path)
+    first = _build(root, "перша")
+    assert current_version(root) == first and _read(index_dir(root)) == "перша"
+
+    version, staging = create_staging(root)
+    # Нова версія починається з копії активної, яка сама не змінюється
+    assert _read(staging) == "перша"
+    discard_staging(staging)
+    assert not os.path.exists(staging) and current_version(root) == first
+
+    second = _build(root, "друга")
+    assert current_version(root) == second and _read(index_dir(root)) == "друга"
+    assert [(v["version"], v["is_current"]) for v in list_versions(root)] == [(second, True), (first, False)]
+
+
+def test_legacy_database_is_migrated_into_first_version(tmp_path):
+    root = str(tmp_path)
+    with open(tmp_path / "index.txt", "w", encoding="utf-8") as f:
+        f.write("стара база")
+    assert index_dir(root) == root
+
+    version, staging = create_staging(root)
+    assert _read(staging) == "стара база"
+    assert not os.path.exists(os.path.join(staging, "versions"))
+
+
+def test_prune_keeps_newest_and_current_versions(tmp_path):
+    root = str(tmp_path)
+    versions = [_build(root, str(i)) for i in range(3)]
+    activate_version(versions[0], root)
+    # Незавершене збирання, новіше за останню версію, може ще йти в іншому процесі
+    _, staging = create_staging(root)
+
+    prune_versions(root, keep=1)
+    assert sorted(v["version"] for v in list_versions(root)) == [versions[0], versions[2]]
+    assert os.path.isdir(staging)
+
+    # Після публікації зберігаються лише останні INDEX_RETAIN_VERSIONS версій і активна
+    newer = [_build(root, str(i)) for i in range(3)]
+    assert sorted(v["version"] for v in list_versions(root)) == newer
+
+
+def test_rollback(tmp_path):
+    root = str(tmp_path)
+    first = _build(root, "перша")
+    _build(root, "друга")
+    activate_version(first, root)
+    assert _read(index_dir(root)) == "перша"
+
+    with pytest.raises(IndexValidationError):
+        activate_version("20000101_000000_000000", root)
+
+    # Версія, зібрана іншою моделлю ембеддингів, не активується
+    other_model = _build(root, "третя")
+    with open(os.path.join(version_dir(other_model, root), EMBEDDING_MODEL_FILE), "w", encoding="utf-8") as f:
+        f.write("local:інша-модель")
+    activate_version(first, root)
+    with pytest.raises(IndexValidationError):
+        activate_version(other_model, root)
+    assert current_version(root) == first
+
+
+def test_missing_active_version_is_not_replaced_by_legacy_files(tmp_path):
+    root = str(tmp_path)
+    with open(tmp_path / "index.txt", "w", encoding="utf-8") as f:
+        f.write("стара база")
+    version = _build(root, "нова")
+    discard_staging(version_dir(version, root))
+
+    with pytest.raises(RuntimeError):
+        index_dir(root)
+    # Перебудова починається з нуля, а не з застарілих файлів у корені
+    _, staging = create_staging(root)
+    assert os.listdir(staging) == []
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+from langchain.schema import Document
+from lexical_index import reciprocal_rank_fusion
+
+
+def _doc(text: str, source: str = "data/faq.txt") -> Document:
+    return Document(page_content=text, metadata={"source": source})
+
+
+def _texts(docs):
+    return [doc.page_content for doc in docs]
+
+
+def test_documents_found_by_both_searches_rank_first():
+    a, b, c, d = _doc("a"), _doc("b"), _doc("c"), _doc("d")
+    fused = reciprocal_rank_fusion([[a, b, c], [d, c, b]])
+    assert _texts(fused) == ["b", "c", "a", "d"]
+
+
+def test_ties_keep_the_order_of_the_first_ranking():
+    a, b = _doc("a"), _doc("b")
+    assert _texts(reciprocal_rank_fusion([[a, b], [b, a]])) == ["a", "b"]
+    assert _texts(reciprocal_rank_fusion([[b, a], [a, b]])) == ["b", "a"]
+    # Однакові позиції в різних списках: рахунок рівний, перший список задає порядок
+    c, d = _doc("c"), _doc("d")
+    assert _texts(reciprocal_rank_fusion([[c], [d]])) == ["c", "d"]
+
+
+def test_same_chunk_from_both_searches_is_merged():
+    vector_hit = _doc("Манікюр — 600 грн.", "data/price.pdf")
+    lexical_hit = _doc("Манікюр — 600 грн.", "data/price.pdf")
+    other_source = _doc("Манікюр — 600 грн.", "data/backup.pdf")
+    fused = reciprocal_rank_fusion([[vector_hit, other_source], [lexical_hit]])
+    assert len(fused) == 2
+    assert fused[0] is vector_hit and fused[1] is other_source
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import os
+import pytest
+import logger
+from logger import StatsAggregator, format_unique_queries, log_files
+
+
+@pytest.fixture
+def logs(tmp_path, monkeypatch):
+    """Порожня директорія logs/ у тимчасовій директорії"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(logger, "_initialized", False)
+    logger.ensure_log_directory()
+    return tmp_path / "logs"
+
+
+def _write(path, queries):
+    with open(path, "a", encoding="utf-8") as f:
+        for query in queries:
+            f.write(f'{{"query": "{query}", "user_id": "1", "source": "test"}}\n')
+
+
+def test_unique_queries_become_approximate_after_pruning(logs):
+    _write(logger.LOG_FILE, ["манікюр"] * 5 + ["педикюр"] * 3)
+    aggregator = StatsAggregator(counts_capacity=2, top_capacity=2)
+    aggregator.refresh()
+    stats = aggregator.stats()
+    assert stats["unique_queries"] == 2 and not stats["unique_queries_approximate"]
+    assert format_unique_queries(stats) == "2"
+
+    _write(logger.LOG_FILE, ["запит 1", "запит 2"])
+    aggregator.refresh()
+    stats = aggregator.stats()
+    assert stats["unique_queries"] == 4 and stats["unique_queries_approximate"]
+    assert format_unique_queries(stats).startswith("≈4")
+    assert aggregator.top_queries(2) == [{"query": "манікюр", "count": 5}, {"query": "педикюр", "count": 3}]
+
+    # Позначка зберігається в знімку
+    aggregator._save_snapshot()
+    assert StatsAggregator(counts_capacity=2, top_capacity=2).stats()["unique_queries_approximate"]
+
+
+def test_offsets_of_deleted_log_files_are_forgotten(logs):
+    archive = logger.LOG_FILE.replace(".jsonl", ".20250101-000000-000000.jsonl")
+    _write(archive, ["манікюр"])
+    _write(logger.LOG_FILE, ["педикюр"])
+    aggregator = StatsAggregator()
+    aggregator.refresh()
+    assert len(aggregator.offsets) == 2
+
+    os.remove(archive)
+    _write(logger.LOG_FILE, ["стрижка"])
+    aggregator.refresh()
+    assert log_files() == [logger.LOG_FILE]
+    assert list(aggregator.offsets) == [logger._file_key(os.stat(logger.LOG_FILE))]
+    assert aggregator.stats()["total_queries"] == 3
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+from model_router import route_query, ROUTER_FAST_MODEL
+
+SCHEDULE = "Графік роботи салону: щодня з 9:00 до 20:00, без вихідних."
+UNRELATED = "Пілінг обличчя мигдальною кислотою — 900 грн."
+
+
+def test_faq_with_matching_context_goes_to_fast_model():
+    route = route_query("Який у вас графік роботи?", 0.8, SCHEDULE, large_model="gpt-4")
+    assert route["model"] == ROUTER_FAST_MODEL
+    assert route["intent"] == "faq"
+
+
+def test_irrelevant_context_escalates():
+    """Оцінка lexical-переранжувальника без жодного спільного слова (~0.4) не веде на швидку модель"""
+    route = route_query("Як записатися на масаж?", 0.4, UNRELATED, large_model="gpt-4")
+    assert route == {"model": "gpt-4", "route": "large", "reason": "low_coverage", "intent": "faq"}
+
+
+def test_complex_question_escalates():
+    route = route_query("Що краще для чутливої шкіри?", 0.95, UNRELATED, large_model="gpt-4o")
+    assert (route["model"], route["reason"]) == ("gpt-4o", "intent")
+
+
+def test_exact_match_is_routed_by_terms_only():
+    route = route_query("Графік роботи", None, SCHEDULE, large_model="gpt-4", exact=True)
+    assert (route["route"], route["reason"]) == ("fast", "exact")
+    route = route_query("Графік роботи", None, UNRELATED, large_model="gpt-4", exact=True)
+    assert (route["route"], route["reason"]) == ("large", "low_coverage")
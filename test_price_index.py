@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+from price_index import PriceIndex, save_price_index, make_entry, note_text
+
+
+def _entries(source, prices):
+    return [
+        make_entry({"service": service, "price": price, "category": "Манікюр", "source": source})
+        for service, price in prices.items()
+    ]
+
+
+def test_backup_price_list_is_ignored(tmp_path):
+    """Після оновлення прайсу відповідь містить лише чинну ціну, без ціни з резервної копії"""
+    current = "data/Прайс Березень 2025.pdf"
+    backup = "data/backup_20250301_120000.pdf"
+    save_price_index({
+        current: _entries(current, {"Манікюр комбінований": "400", "Манікюр класичний": "300"}),
+        backup: _entries(backup, {"Манікюр комбінований": "350", "Манікюр класичний": "300"}),
+    }, str(tmp_path))
+
+    index = PriceIndex(str(tmp_path))
+    answer = index.answer("Скільки коштує манікюр комбінований?")
+
+    assert answer is not None
+    assert [(entry["service"], entry["price"]) for entry in answer["entries"]] == [("Манікюр комбінований", "400")]
+    assert "350" not in answer["answer"]
+    assert {entry["source"] for entry in index.find("манікюр")} == {current}
+
+
+def test_answer_includes_only_notes_of_matched_categories(tmp_path):
+    source = "data/Прайс Березень 2025.pdf"
+    entries = [
+        make_entry({"service": "Педикюр комбінований", "price": "800", "category": "ЧОЛОВІЧИЙ ПЕДИКЮР", "source": source}),
+        make_entry({"service": "Солярій 1 хвилина", "price": "30", "category": "СОЛЯРІЙ", "source": source}),
+    ]
+    note = "Кінцеву ціну визначає майстер, залежно від складності роботи."
+    save_price_index({source: entries}, str(tmp_path), {source: {"ЧОЛОВІЧИЙ ПЕДИКЮР": [note_text(f"ЧОЛОВІЧИЙ ПЕДИКЮР\n{note}")]}})
+    index = PriceIndex(str(tmp_path))
+
+    pedicure = index.answer("Скільки коштує педикюр?")
+    assert pedicure["answer"].endswith(note)
+    assert note in pedicure["contexts"][0]
+    assert "майстер" not in index.answer("Скільки коштує солярій?")["answer"]
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+from langchain.schema import HumanMessage, SystemMessage, AIMessage
+import prompt_builder
+from prompt_builder import build_prompt, dedupe_chunks
+from token_counter import count_tokens
+
+TEMPLATE = "Відповідай лише за контекстом.\n\nКонтекст:\n{context}\n"
+
+
+def _text(label: str, sentences: int) -> str:
+    return " ".join(f"{label} речення номер {i} про послуги салону." for i in range(sentences))
+
+
+def test_overlap_between_neighbouring_chunks_is_trimmed():
+    first = "Манікюр класичний коштує 500 грн. Тривалість процедури 60 хвилин."
+    second = "Тривалість процедури 60 хвилин. Покриття гель-лаком додатково 300 грн."
+    assert dedupe_chunks([first, second]) == [first, "Покриття гель-лаком додатково 300 грн."]
+    # Менш релевантний чанк передує в документі: повтор вирізається з його кінця
+    assert dedupe_chunks([second, first]) == [second, "Манікюр класичний коштує 500 грн."]
+
+
+def test_contained_and_short_overlaps():
+    text = "Педикюр апаратний з покриттям — 900 грн."
+    assert dedupe_chunks([text, text[:25], "  " + text + "  "]) == [text]
+    # Збіг коротший за PROMPT_MIN_OVERLAP_CHARS не вважається перекриттям
+    assert dedupe_chunks(["Ціна 500 грн.", "500 грн. за годину"]) == ["Ціна 500 грн.", "500 грн. за годину"]
+
+
+def test_least_relevant_chunks_are_compressed_then_dropped():
+    chunks = [_text("Перше", 10), _text("Друге", 30), _text("Третє", 10)]
+    budget = count_tokens(TEMPLATE) + count_tokens(chunks[0]) + 80
+    prompt = build_prompt(TEMPLATE, chunks, "Скільки коштує?", budget=budget)
+
+    assert prompt["tokens"] <= budget
+    assert prompt["contexts"][0] == chunks[0]
+    assert len(prompt["contexts"]) == 2
+    assert prompt["contexts"][1].endswith("…") and chunks[1].startswith(prompt["contexts"][1][:-2].rstrip())
+    assert prompt["dropped_chunks"] == 1
+
+
+def test_most_relevant_chunk_is_kept_even_over_budget():
+    chunks = [_text("Перше", 100)]
+    prompt = build_prompt(TEMPLATE, chunks, "Скільки коштує?", budget=count_tokens(TEMPLATE) + 10)
+    assert len(prompt["contexts"]) == 1
+    assert prompt["contexts"][0].endswith("…")
+
+
+def test_oldest_history_is_dropped_first_and_summary_last(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "PROMPT_MIN_CONTEXT_TOKENS", 100)
+    summary = SystemMessage(content="Раніше клієнт питав про манікюр.")
+    history = [summary]
+    for i in range(4):
+        history += [HumanMessage(content=_text(f"Питання {i}", 5)), AIMessage(content=_text(f"Відповідь {i}", 5))]
+    query = "А скільки коштує педикюр?"
+    kept_tokens = sum(prompt_builder.message_tokens(message) for message in [summary] + history[-2:])
+    budget = (
+        count_tokens(TEMPLATE) + prompt_builder.MESSAGE_OVERHEAD_TOKENS
+        + prompt_builder.message_tokens(HumanMessage(content=query)) + kept_tokens + 100
+    )
+
+    prompt = build_prompt(TEMPLATE, ["Педикюр — 700 грн."], query, history=history, budget=budget)
+
+    messages = prompt["messages"]
+    assert messages[1:-1] == [summary] + history[-2:]
+    assert messages[-1].content == query
+    assert prompt["dropped_history"] == 6
+    assert prompt["contexts"] == ["Педикюр — 700 грн."]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import pytest
+from langchain.schema import Document
+from fake_models import FakeEmbeddings
+import rag_service
+from build_vectorstore import build_vector_store
+from rag_service import RAGService
+from reranker import LexicalSemanticReranker, apply_cutoff
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    """Фейкові ембеддинги, що рахують тексти, надіслані на обчислення"""
+
+    def __init__(self):
+        super().__init__()
+        self.documents = 0
+
+    def embed_documents(self, texts):
+        self.documents += len(texts)
+        return super().embed_documents(texts)
+
+
+def _doc(text: str) -> Document:
+    return Document(page_content=text, metadata={"source": "data/faq.txt"})
+
+
+def test_cutoff_keeps_best_chunk_and_those_close_to_it():
+    a, b, c, d = _doc("a"), _doc("b"), _doc("c"), _doc("d")
+    scored = [(c, 0.5), (a, 0.9), (b, 0.7), (d, 0.6)]
+    assert apply_cutoff(scored, k=3, min_score=0.2, relative_cutoff=0.75) == [a, b]
+    assert apply_cutoff(scored, k=2, min_score=0.2, relative_cutoff=0.5) == [a, b]
+    # Найкращий чанк залишається навіть нижче абсолютного порогу
+    assert apply_cutoff([(c, 0.1), (d, 0.05)], k=3, min_score=0.2, relative_cutoff=0.1) == [c]
+    assert apply_cutoff([], k=3) == []
+
+
+def test_scorer_uses_stored_vectors_and_embeds_only_missing_chunks():
+    embeddings = CountingEmbeddings()
+    hit = _doc("Манікюр класичний — 500 грн")
+    miss = _doc("Педикюр апаратний — 900 грн")
+    stored = {hit.page_content: embeddings._vector(hit.page_content)}
+    reranker = LexicalSemanticReranker(
+        embeddings, semantic_weight=0.5,
+        vector_lookup=lambda docs: [stored.get(doc.page_content) for doc in docs],
+    )
+
+    scored = dict((doc.page_content, score) for doc, score in reranker.score("манікюр класичний", [hit, miss]))
+    assert embeddings.documents == 1
+    query_vector = embeddings.embed_query("манікюр класичний")
+    similarity = sum(x * y for x, y in zip(query_vector, stored[hit.page_content]))
+    # Половина оцінки — схожість ембеддингів, половина — частка слів запиту в чанку (обидва слова є)
+    assert scored[hit.page_content] == pytest.approx(0.5 * max(similarity, 0.0) + 0.5)
+    assert scored[hit.page_content] > scored[miss.page_content]
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_retrieval_reads_chunk_vectors_from_the_index(tmp_path, monkeypatch, backend):
+    shutil.copytree(DATA_DIR, tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(rag_service, "VECTOR_STORE_BACKEND", backend)
+    embeddings = CountingEmbeddings()
+    build_vector_store(workers=1, embeddings=embeddings)
+    embeddings.documents = 0
+
+    service = RAGService(embeddings=embeddings)
+    candidates = service.hybrid_search("Скільки коштує манікюр?", k=20)
+    assert all(vector is not None for vector in service.stored_vectors(candidates))
+
+    docs, best = service.retrieve_scored("Скільки коштує манікюр?")
+    assert docs and 0 < best <= 1
+    assert embeddings.documents == 0
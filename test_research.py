@@ -1,10 +1,8 @@
 import os
 import json
-import asyncio
 from datetime import datetime
 from dotenv import load_dotenv
-from query_rag import query_bot
-from ragas_evaluator import evaluate_rag_response
+from batch_evaluation import run_batch, BATCH_CONCURRENCY
 
 load_dotenv()
 
@@ -53,39 +51,6 @@ class BeautySalonResearch:
             "Яка ціна лазерної епіляції?"
         ]
 
-    def run_single_test(self, query, test_type="present"):
-        print(f"\n{'='*80}")
-        print(f"🔍 ТЕСТУВАННЯ: {query}")
-        print(f"📝 Тип тесту: {'Інформація присутня' if test_type == 'present' else 'Інформація відсутня'}")
-        print('='*80)
-        
-        try:
-            answer, retrieved_contexts = query_bot(query)
-            print(f"💬 Відповідь системи: {answer}")
-            
-            ragas_metrics = None
-            try:
-                ragas_metrics = evaluate_rag_response(query, answer, retrieved_contexts)
-            except Exception as e:
-                print(f"⚠️ Помилка при обчисленні RAGAS метрик: {e}")
-            
-            result = {
-                "query": query,
-                "answer": answer,
-                "retrieved_contexts": retrieved_contexts,
-                "test_type": test_type,
-                "ragas_metrics": ragas_metrics,
-                "timestamp": datetime.now().isoformat(),
-                "answer_quality_assessment": self.assess_answer_quality(query, answer, test_type)
-            }
-            
-            self.results.append(result)
-            return result
-            
-        except Exception as e:
-            print(f"❌ Помилка при обробці запиту: {e}")
-            return None
-
     def assess_answer_quality(self, query, answer, test_type):
         assessment = {
             "contains_apology": "На жаль" in answer or "наразі недоступна" in answer,
@@ -105,17 +70,18 @@ class BeautySalonResearch:
         print("🚀 ПОЧАТОК ДОСЛІДЖЕННЯ СИСТЕМИ AI-КОНСУЛЬТАНТА САЛОНУ КРАСИ")
         print("="*100)
         
-        print("\n📋 ТЕСТУВАННЯ ЗАПИТІВ НА ПРИСУТНЮ ІНФОРМАЦІЮ")
-        print("-"*80)
-        for i, query in enumerate(self.test_queries, 1):
-            print(f"\n[{i}/25] Тестую запит...")
-            self.run_single_test(query, "present")
-        
-        print("\n\n📋 ТЕСТУВАННЯ ЗАПИТІВ НА ВІДСУТНЮ ІНФОРМАЦІЮ")
+        print(f"\n📋 ТЕСТУВАННЯ {len(self.test_queries)} ЗАПИТІВ НА ПРИСУТНЮ І {len(self.absent_info_queries)} НА ВІДСУТНЮ ІНФОРМАЦІЮ")
+        print(f"⚡ Паралельних запитів: {BATCH_CONCURRENCY}")
         print("-"*80)
-        for i, query in enumerate(self.absent_info_queries, 1):
-            print(f"\n[{i}/10] Тестую запит на відсутню інформацію...")
-            self.run_single_test(query, "absent")
+        items = ([{"query": query, "expected": "present"} for query in self.test_queries] +
+                 [{"query": query, "expected": "absent"} for query in self.absent_info_queries])
+        
+        for result in run_batch(items, concurrency=BATCH_CONCURRENCY):
+            result["test_type"] = result["expected"]
+            result["answer_quality_assessment"] = self.assess_answer_quality(
+                result["query"], result["answer"], result["test_type"]
+            )
+            self.results.append(result)
         
         self.save_results()
         self.generate_report()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import time
+import random
+import threading
+from update_dispatcher import KeyedExecutor
+
+
+def test_updates_of_one_user_run_in_order_and_users_run_concurrently():
+    executor = KeyedExecutor(workers=8)
+    lock = threading.Lock()
+    processed = {}
+    running = {}
+    max_per_key = {}
+    max_total = [0]
+    done = threading.Event()
+    users, messages = 6, 20
+    remaining = [users * messages]
+
+    def handle(user, number):
+        with lock:
+            running[user] = running.get(user, 0) + 1
+            max_per_key[user] = max(max_per_key.get(user, 0), running[user])
+            max_total[0] = max(max_total[0], sum(running.values()))
+        time.sleep(random.uniform(0, 0.003))
+        with lock:
+            running[user] -= 1
+            processed.setdefault(user, []).append(number)
+            remaining[0] -= 1
+            if not remaining[0]:
+                done.set()
+
+    for number in range(messages):
+        for user in range(users):
+            executor.submit(str(user), handle, user, number)
+
+    assert done.wait(10)
+    executor.shutdown()
+    assert processed == {user: list(range(messages)) for user in range(users)}
+    assert set(max_per_key.values()) == {1}
+    assert max_total[0] > 1
+    assert executor.stats() == {"active_users": 0, "queued_updates": 0}
+
+
+def test_failed_update_does_not_block_the_queue():
+    executor = KeyedExecutor(workers=2)
+    processed = []
+    done = threading.Event()
+
+    def fail():
+        raise ValueError("помилка обробки")
+
+    executor.submit("1", fail)
+    executor.submit("1", processed.append, "наступне")
+    executor.submit("1", done.set)
+
+    assert done.wait(5)
+    executor.shutdown()
+    assert processed == ["наступне"]
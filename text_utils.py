@@ -0,0 +1,49 @@
+import os
+import re
+from typing import List
+
+# Службові слова, що не впливають на пошук
+STOP_WORDS = {
+    "на", "у", "в", "є", "за", "а", "і", "й", "та", "що", "мені", "для", "це", "до", "з", "із", "зі", "по",
+    "як", "яка", "який", "які", "яку", "чи", "вас", "ваш", "ваша", "ваші", "ви", "я", "не", "або", "при",
+    "скажіть", "підкажіть", "будь", "ласка", "можна",
+}
+
+# Закінчення, що відкидаються для зіставлення різних форм слова (манікюр/манікюру/манікюром)
+ENDINGS = sorted([
+    "ування", "ювання", "ання", "ення", "ями", "ами", "ого", "ому", "ими", "іми", "ою", "ею", "ів", "їв",
+    "ий", "ій", "ої", "ом", "ем", "ам", "ям", "ах", "ях", "их", "іх", "у", "ю", "а", "я", "і", "и", "е",
+    "о", "ь", "ї", "й",
+], key=len, reverse=True)
+
+# Мінімальна довжина основи слова після відкидання закінчення
+MIN_STEM_LENGTH = 4
+
+WORD = re.compile(r"[a-zа-яіїєґ0-9']+")
+
+
+def words(text: str) -> List[str]:
+    """Слова тексту в нижньому регістрі"""
+    text = text.lower().replace("’", "'").replace("ʼ", "'")
+    return WORD.findall(text)
+
+
+def stem(word: str) -> str:
+    """Спрощена лематизація: відкидає найдовше відоме закінчення"""
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова тексту в нижньому регістрі, приведені до основи"""
+    return [stem(word) for word in words(text)]
+
+
+def tokens_match(query_token: str, token: str) -> bool:
+    """Нечітке зіставлення основ: однаковий початок без урахування останньої літери"""
+    if query_token == token:
+        return True
+    prefix = os.path.commonprefix([query_token, token])
+    return len(prefix) >= MIN_STEM_LENGTH and len(prefix) >= min(len(query_token), len(token)) - 1
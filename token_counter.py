@@ -0,0 +1,42 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # без tiktoken рахуємо приблизно
+    tiktoken = None
+
+# Модель, за токенізатором якої рахуються токени
+TOKENIZER_MODEL = "gpt-4"
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name: str):
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model_name: str = TOKENIZER_MODEL) -> int:
+    """Повертає кількість токенів у тексті для заданої моделі
+
+    Якщо tiktoken недоступний, використовується оцінка ~4 символи на токен.
+    """
+    if not text:
+        return 0
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    return len(_get_encoding(model_name).encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str = TOKENIZER_MODEL) -> str:
+    """Обрізає текст до заданої кількості токенів"""
+    if max_tokens <= 0:
+        return ""
+    if tiktoken is None:
+        return text[:max_tokens * 4]
+    encoding = _get_encoding(model_name)
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+
+# Кількість потоків для обробки повідомлень
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "16"))
+
+
+class KeyedExecutor:
+    """Пул потоків, що виконує завдання різних ключів паралельно, а одного ключа — по черзі
+
+    Ключем є ID користувача: повідомлення різних клієнтів обробляються
+    одночасно, а повідомлення одного клієнта — строго в порядку надходження.
+    """
+
+    def __init__(self, workers: int = BOT_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot-worker")
+        self._lock = threading.Lock()
+        # ключ -> черга завдань, що чекають завершення поточного завдання цього ключа
+        self._pending: Dict[str, deque] = {}
+
+    def submit(self, key: str, fn: Callable, *args):
+        """Ставить завдання в чергу ключа"""
+        with self._lock:
+            queue = self._pending.get(key)
+            if queue is not None:
+                queue.append((fn, args))
+                return
+            self._pending[key] = deque()
+        self._executor.submit(self._drain, key, fn, args)
+
+    def _drain(self, key: str, fn: Callable, args: tuple):
+        while True:
+            try:
+                fn(*args)
+            except Exception:
+                print(f"Помилка при обробці оновлення користувача {key}:")
+                traceback.print_exc()
+            with self._lock:
+                queue = self._pending[key]
+                if not queue:
+                    del self._pending[key]
+                    return
+                fn, args = queue.popleft()
+
+    def stats(self) -> Dict[str, int]:
+        """Кількість користувачів в обробці та повідомлень у чергах"""
+        with self._lock:
+            return {
+                "active_users": len(self._pending),
+                "queued_updates": sum(len(queue) for queue in self._pending.values()),
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+class BackgroundJobs:
+    """Довгі адміністративні завдання (перебудова бази) в окремих потоках
+
+    Одночасно виконується не більше одного завдання з однаковою назвою.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running: Dict[str, threading.Thread] = {}
+
+    def start(self, name: str, fn: Callable, *args, **kwargs) -> bool:
+        """Запускає завдання, якщо завдання з такою назвою ще не виконується
+
+        Returns:
+            True, якщо завдання запущено
+        """
+        with self._lock:
+            if name in self._running:
+                return False
+            thread = threading.Thread(target=self._run, args=(name, fn, args, kwargs), name=f"job-{name}", daemon=True)
+            self._running[name] = thread
+        thread.start()
+        return True
+
+    def _run(self, name: str, fn: Callable, args: tuple, kwargs: Dict[str, Any]):
+        try:
+            fn(*args, **kwargs)
+        except Exception:
+            print(f"Помилка у фоновому завданні {name}:")
+            traceback.print_exc()
+        finally:
+            with self._lock:
+                self._running.pop(name, None)
+
+    def is_running(self, name: str) -> bool:
+        with self._lock:
+            return name in self._running
+
+
+class ThrottledProgress:
+    """Передає повідомлення про прогрес не частіше заданого інтервалу
+
+    Використовується для редагування повідомлення в Telegram без
+    перевищення лімітів API.
+    """
+
+    def __init__(self, send: Callable[[str], None], min_interval: float = 2.0):
+        self.send = send
+        self.min_interval = min_interval
+        self._last_sent = 0.0
+        self._last_text: Optional[str] = None
+
+    def __call__(self, text: str, force: bool = False):
+        now = time.monotonic()
+        if text == self._last_text or (not force and now - self._last_sent < self.min_interval):
+            return
+        try:
+            self.send(text)
+        except Exception as e:
+            print(f"Не вдалося оновити прогрес: {e}")
+        self._last_sent = now
+        self._last_text = text